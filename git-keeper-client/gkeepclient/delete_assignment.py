@@ -17,12 +17,21 @@
 
 import os
 import sys
+from shlex import quote
 from time import strftime
 
 from configuration import GraderConfiguration, ConfigurationError
-from repository import Repository
-from subprocess_commands import move_directory, CommandError, directory_exists,\
-    create_directory
+from subprocess_commands import run_command, CommandError
+
+
+# Deleting an assignment is done with two commands run on the server, no
+# matter how many students are in the class. The first only looks: it prints
+# the manifest of an interrupted deletion if there is one, and which of the
+# directories to be moved exist. Once the user confirms, the second writes the
+# manifest of every directory to be moved along with its destination in the
+# trash, and moves everything listed in it. The manifest is only removed from
+# its in-progress location once every move has succeeded, so an interrupted
+# deletion is resumed by running delete_assignment again.
 
 
 def trash_dest(trash_dir, source_path, timestamp, username=None):
@@ -37,6 +46,104 @@ def trash_dest(trash_dir, source_path, timestamp, username=None):
     return os.path.join(trash_dir, basename)
 
 
+def manifest_path(trash_dir, assignment):
+    return os.path.join(trash_dir, '.delete-{0}.manifest'.format(assignment))
+
+
+def build_plan_script(trash_dir, manifest, sources):
+    # The plan script prints the entries of an existing manifest as
+    # planned<TAB>source<TAB>dest lines, followed by an exists<TAB>source line
+    # for each of the sources which exists. Nothing is written besides the
+    # trash directory.
+    lines = ['mkdir -p {0} || exit 1'.format(quote(trash_dir)),
+             'if [ -f {0} ]; then'.format(quote(manifest)),
+             "  sed 's/^/planned\\t/' {0} || exit 1".format(quote(manifest)),
+             'fi']
+
+    for source in sources:
+        lines.append("[ -d {0} ] && printf 'exists\\t%s\\n' {0}"
+                     .format(quote(source)))
+
+    # the last test may fail without the script failing
+    lines.append('exit 0')
+
+    return '\n'.join(lines)
+
+
+def build_move_script(trash_dir, manifest, timestamp, assignment,
+                      paths_source_dest):
+    # Writes the manifest and then moves everything in it, printing one status
+    # line per entry. Entries whose source is already gone but whose
+    # destination exists were moved by an earlier, interrupted run.
+    #
+    # Student repositories borrow the base code objects from the assignment
+    # directory through git alternates. Before such a repository is moved its
+    # borrowed objects are copied into it, so it stays readable in the trash
+    # after the assignment directory is moved.
+    finished_manifest = os.path.join(trash_dir, '{0}-{1}.manifest'
+                                     .format(timestamp, assignment))
+    partial = quote(manifest + '.partial')
+
+    lines = [': > {0} || exit 1'.format(partial)]
+
+    for source, dest in paths_source_dest:
+        lines.append("printf '%s\\t%s\\n' {0} {1} >> {2} || exit 1"
+                     .format(quote(source), quote(dest), partial))
+
+    lines.extend(['mv {0} {1} || exit 1'.format(partial, quote(manifest)),
+                  'failed=0',
+                  "tab=$(printf '\\t')",
+                  'while IFS="$tab" read -r source dest; do',
+                  '  alternates="$source/objects/info/alternates"',
+                  '  if [ -f "$alternates" ]; then',
+                  '    git -C "$source" repack -a -d -q &&',
+                  '      rm -f "$alternates"',
+                  '  fi',
+                  '  if [ -f "$alternates" ]; then',
+                  '    failed=1',
+                  "    printf 'failed\\t%s\\t%s\\n' \"$source\" \"$dest\"",
+                  '  elif [ -e "$source" ]; then',
+                  '    if mv "$source" "$dest"; then',
+                  "      printf 'moved\\t%s\\t%s\\n' \"$source\" \"$dest\"",
+                  '    else',
+                  '      failed=1',
+                  "      printf 'failed\\t%s\\t%s\\n' \"$source\" \"$dest\"",
+                  '    fi',
+                  '  elif [ -e "$dest" ]; then',
+                  "    printf 'already\\t%s\\t%s\\n' \"$source\" \"$dest\"",
+                  '  else',
+                  "    printf 'missing\\t%s\\t%s\\n' \"$source\" \"$dest\"",
+                  '  fi',
+                  'done < {0}'.format(quote(manifest)),
+                  'if [ $failed -eq 0 ]; then',
+                  '  mv {0} {1}'.format(quote(manifest),
+                                        quote(finished_manifest)),
+                  'fi'])
+
+    return '\n'.join(lines)
+
+
+def run_script(script, ssh):
+    # over SSH the command is run by a shell on the server, which needs the
+    # script quoted as a single word. Locally bash is run directly.
+    if ssh is None:
+        return run_command(['bash', '-c', script])
+
+    return run_command(['bash', '-c', quote(script)], ssh=ssh)
+
+
+def parse_manifest(output):
+    # Parse tab separated lines from a script's output into tuples
+    entries = []
+
+    for line in output.splitlines():
+        line = line.rstrip('\r')
+        if '\t' in line:
+            entries.append(tuple(line.split('\t')))
+
+    return entries
+
+
 def delete_assignment(class_name, assignment):
 
     timestamp = strftime('%Y-%m-%d-%H:%M:%S-%Z')
@@ -53,37 +160,64 @@ def delete_assignment(class_name, assignment):
         sys.exit('assignment {0} not in class {1}'.format(assignment,
                                                           class_name))
 
-    paths_source_dest = []
-
     grader_assignment_path = os.path.join(config.home_dir, class_name,
                                           'assignments', assignment)
 
-    if not directory_exists(grader_assignment_path, ssh=config.ssh):
-        sys.exit('{0} does not exist'.format(grader_assignment_path))
-
     trash_dir = os.path.join(config.home_dir, class_name, 'trash')
 
-    if not directory_exists(trash_dir):
-        create_directory(trash_dir, ssh=config.ssh)
+    # the student repository paths are known from the student home
+    # directories, the server checks which of them actually exist
+    sources = [grader_assignment_path]
+    usernames_by_source = {}
+
+    for student in config.students_by_class[class_name]:
+        student_source = student.get_bare_repo_dir(class_name, assignment)
+        sources.append(student_source)
+        usernames_by_source[student_source] = student.username
 
-    grader_assignment_dest = trash_dest(trash_dir, grader_assignment_path,
-                                        timestamp)
+    manifest = manifest_path(trash_dir, assignment)
 
-    paths_source_dest.append((grader_assignment_path, grader_assignment_dest))
+    plan_script = build_plan_script(trash_dir, manifest, sources)
 
-    for student in config.students_by_class[class_name]:
-        student_repos = student.get_class_repositories(class_name)
+    try:
+        output = run_script(plan_script, config.ssh)
+    except CommandError as e:
+        sys.exit('Error checking directories to delete:\n{0}'.format(e))
+
+    planned_moves = []
+    existing_sources = []
+
+    for entry in parse_manifest(output):
+        if entry[0] == 'planned' and len(entry) == 3:
+            planned_moves.append((entry[1], entry[2]))
+        elif entry[0] == 'exists' and len(entry) == 2:
+            existing_sources.append(entry[1])
+
+    if len(planned_moves) > 0:
+        print('Resuming an interrupted deletion of {0}'.format(assignment))
+    elif grader_assignment_path not in existing_sources:
+        sys.exit('{0} does not exist'.format(grader_assignment_path))
+
+    for source, dest in planned_moves:
+        if assignment not in source:
+            sys.exit('Unexpected path in {0}: {1}'.format(manifest, source))
+
+    # directories which are not in the manifest of an interrupted deletion,
+    # such as the repositories of students added since, are moved as well
+    planned_sources = [source for source, dest in planned_moves]
 
-        for repo in student_repos:
-            assert isinstance(repo, Repository)
-            if repo.assignment == assignment:
-                student_source = repo.path
-                student_dest = trash_dest(trash_dir, repo.path, timestamp,
-                                          student.username)
-                paths_source_dest.append((student_source, student_dest))
+    for source in existing_sources:
+        if source not in planned_sources:
+            dest = trash_dest(trash_dir, source, timestamp,
+                              usernames_by_source.get(source))
+            planned_moves.append((source, dest))
+
+    # the assignment directory holds the objects which the student
+    # repositories borrow, so it is moved last
+    planned_moves.sort(key=lambda move: move[0] == grader_assignment_path)
 
     print('These directories will be moved to the trash:')
-    for source, dest in paths_source_dest:
+    for source, dest in planned_moves:
         print('{0} -> {1}'.format(source, dest))
 
     answer = input('Proceed? Type yes to continue: ')
@@ -93,11 +227,28 @@ def delete_assignment(class_name, assignment):
     if answer.lower() != 'yes':
         sys.exit('Aborting')
 
-    for source, dest in paths_source_dest:
-        assert assignment in source
-        try:
-            move_directory(source, dest, ssh=config.ssh)
-            print('moved {0}'.format(source))
-        except CommandError as e:
-            print('Error moving {0} to {1}:\n{2}'.format(source, dest, e))
+    move_script = build_move_script(trash_dir, manifest, timestamp, assignment,
+                                    planned_moves)
 
+    try:
+        output = run_script(move_script, config.ssh)
+    except CommandError as e:
+        sys.exit('Error moving directories:\n{0}\n'
+                 'Run delete_assignment again to resume'.format(e))
+
+    failure_count = 0
+
+    for status, source, dest in parse_manifest(output):
+        if status == 'moved':
+            print('moved {0}'.format(source))
+        elif status == 'already':
+            print('{0} was already moved'.format(source))
+        elif status == 'missing':
+            print('{0} no longer exists, skipping'.format(source))
+        else:
+            failure_count += 1
+            print('Error moving {0} to {1}'.format(source, dest))
+
+    if failure_count > 0:
+        sys.exit('{0} directories could not be moved. Run delete_assignment '
+                 'again to resume'.format(failure_count))
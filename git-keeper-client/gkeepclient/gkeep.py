@@ -27,6 +27,7 @@ import delete_assignment
 import fetch_submissions
 import initialize_class
 import populate_students
+import regrade_assignment
 import send_feedback
 import send_passwords
 import update_assignment_tests
@@ -165,6 +166,16 @@ def initialize_parser():
                                                         "tests to be pushed to the "
                                                         "grading server")
 
+    # Sub-command: Re-grading every submission for an Assignment
+    regrade_assignment_subparser = subparsers.add_parser("regrade_assignment",
+                                                         help="tests every student's latest "
+                                                              "submission for an assignment "
+                                                              "again")
+    add_class_name(regrade_assignment_subparser)
+    regrade_assignment_subparser.add_argument("assignment", metavar="<assignment name>",
+                                              type=str,
+                                              help="name of the assignment to be re-graded")
+
     # Sub-command: Upload handout
     upload_handout_subparser = subparsers.add_parser("upload_handout",
                                                      help="uploads a handout to the class")
@@ -216,6 +227,8 @@ def main():
         send_passwords.send_passwords(parsed_args.class_name, parsed_args.user_pass_file)
     elif action_name == 'update_assignment_tests':
         update_assignment_tests.update_assignment_tests(parsed_args.class_name, parsed_args.local_dir)
+    elif action_name == 'regrade_assignment':
+        regrade_assignment.regrade_assignment(parsed_args.class_name, parsed_args.assignment)
     elif action_name == 'upload_handout':
         upload_handout.upload_handout(parsed_args.class_name, parsed_args.local_handout_dir)
     else:
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import sys
+
+from gkeepclient.client_configuration import config, \
+    ClientConfigurationError
+from gkeepclient.server_interface import server_interface, \
+    ServerInterfaceError
+from gkeepclient.server_request import send_request, ServerRequestError
+
+
+# The re-grade is requested from gkeepd with a REGRADE request, see
+# request_handler.py in gkeepserver. gkeepd checks that the assignment exists
+# and responds with a message for the user.
+
+
+def regrade_assignment(class_name, assignment):
+
+    try:
+        config.parse()
+        server_interface.connect()
+    except (ClientConfigurationError, ServerInterfaceError) as e:
+        sys.exit(e)
+
+    try:
+        message = send_request('REGRADE', {'class_name': class_name,
+                                           'assignment': assignment})
+    except ServerRequestError as e:
+        sys.exit('Error requesting re-grade:\n{0}'.format(e))
+
+    print(message)
@@ -22,6 +22,7 @@ from threading import Thread
 
 from configuration import GraderConfiguration, ConfigurationError
 from email_sender import Email, EmailException, process_email_queue
+from roster import Roster
 from subprocess_commands import directory_exists
 
 from student import Student
@@ -57,6 +58,23 @@ def create_feedback_email(student: Student, assignment_name, directory):
     return email
 
 
+def student_from_directory_name(directory_name, class_name,
+                                roster: Roster):
+    # Student directories are named <last>_<first>_<username>, so try the
+    # whole name and then each suffix following an underscore as a username
+    candidate = directory_name
+
+    while True:
+        student = roster.get_class_student(class_name, candidate)
+        if student is not None:
+            return student
+
+        if '_' not in candidate:
+            return None
+
+        _, candidate = candidate.split('_', 1)
+
+
 def send_feedback(class_name, assignment_name, feedback_dir):
 
     if not directory_exists(feedback_dir):
@@ -79,16 +97,18 @@ def send_feedback(class_name, assignment_name, feedback_dir):
     subdirs = os.listdir(feedback_dir)
 
     for subdir in subdirs:
-        for student in config.students_by_class[class_name]:
-            if student.username in subdir:
-                try:
-                    email = create_feedback_email(student, assignment_name,
-                                                  os.path.join(feedback_dir,
-                                                  subdir))
-                    if email is not None:
-                        email_queue.put(email)
-                except EmailException as e:
-                    print('Error creating email:\n{0}'.format(e))
+        student = student_from_directory_name(subdir, class_name,
+                                              config.roster)
+        if student is None:
+            continue
+
+        try:
+            email = create_feedback_email(student, assignment_name,
+                                          os.path.join(feedback_dir, subdir))
+            if email is not None:
+                email_queue.put(email)
+        except EmailException as e:
+            print('Error creating email:\n{0}'.format(e))
 
     email_queue.put(None)
     email_thread.join()
@@ -47,11 +47,13 @@ Example usage:
 
 
 import os
-from paramiko import SSHClient, SSHException
+import tarfile
+from paramiko import SSHClient, SSHException, Channel
 from shlex import quote
 
 from gkeepclient.client_configuration import config
-from gkeepcore.path_utils import build_user_log_path
+from gkeepcore.path_utils import build_user_log_path, \
+    build_user_response_log_path
 
 
 class ServerInterfaceError(Exception):
@@ -131,6 +133,33 @@ class ServerInterface:
         # output is bytes, we want a utf-8 string
         return output.decode('utf-8')
 
+    def start_command(self, command) -> Channel:
+        """Starts a shell command on the server without waiting for it to
+        finish.
+
+        The command's output can be read from the returned channel as it is
+        produced. Close the channel to stop the command.
+
+        :param command: the command to be run as a single string or as a list
+         of string arguments
+        :return: a paramiko Channel running the command
+        """
+
+        # join the command into a single string if it is a list
+        if isinstance(command, list):
+            # quote all the arguments in case of special characters
+            command = ' '.join([quote(arg) for arg in command])
+
+        # no pty, so the output is passed through unchanged
+        try:
+            transport = self._ssh_client.get_transport()
+            channel = transport.open_session()
+            channel.exec_command(command)
+        except SSHException as e:
+            raise ServerInterfaceError(e)
+
+        return channel
+
     def list_directory(self, path: str) -> list:
         """Lists the contents of a directory on the server.
 
@@ -220,7 +249,8 @@ class ServerInterface:
         except SSHException as e:
             raise ServerInterfaceError(e)
 
-    def copy_directory(self, source_path: str, dest_path: str):
+    def copy_directory(self, source_path: str, dest_path: str,
+                       progress_callback=None):
         """Copies a local directory to the server.
 
         It is the responsibility of the caller to ensure that source_path
@@ -230,35 +260,61 @@ class ServerInterface:
         The dest_path is the full destination directory path. After a
         successful copy, source_path and dest_path have the same contents.
 
+        Rather than copying the files one at a time, which waits for a round
+        trip to the server for every file, the directory is sent as a single
+        tar stream over one channel and unpacked on the server. File
+        permissions are preserved.
+
         :param source_path: path to the local directory to copy
         :param dest_path: path of the copy on the server
+        :param progress_callback: optional function which is called after
+         each file is sent with the number of bytes sent so far and the total
+         number of bytes
         """
 
-        # we'll be replacing source_path with dest_path in strings later, so
-        # make sure neither have trailing slashes
         source_path = source_path.rstrip('/')
         dest_path = dest_path.rstrip('/')
 
+        # walk the tree first so the total size is known for progress
+        paths = []
+        total_bytes = 0
+
+        for dir_path, dir_names, file_names in os.walk(source_path):
+            dir_names.sort()
+            for name in dir_names + sorted(file_names):
+                local_path = os.path.join(dir_path, name)
+                paths.append(local_path)
+                if os.path.isfile(local_path):
+                    total_bytes += os.path.getsize(local_path)
+
+        command = 'mkdir {0} && tar -x -f - -C {0}'.format(quote(dest_path))
+        channel = self.start_command(command)
+
         try:
-            # create the top directory
-            self.create_directory(dest_path)
-
-            # paramiko will not copy entire directories, so we have to walk
-            # through the local directory tree, make the needed directories,
-            # and copy the files individually.
-            for dir_path, dir_names, file_names in os.walk(source_path):
-                for dir_name in dir_names:
-                    local_path = os.path.join(dir_path, dir_name)
-                    remote_path = local_path.replace(source_path, dest_path, 1)
-                    self.create_directory(remote_path)
-
-                for file_name in file_names:
-                    local_path = os.path.join(dir_path, file_name)
-                    remote_path = local_path.replace(source_path, dest_path, 1)
-                    self.copy_file(local_path, remote_path)
+            sent_bytes = 0
 
-        except SSHException as e:
+            with channel.makefile('wb') as channel_file, \
+                    tarfile.open(fileobj=channel_file, mode='w|') as tar:
+                for local_path in paths:
+                    arcname = os.path.relpath(local_path, source_path)
+                    tar.add(local_path, arcname, recursive=False)
+
+                    if progress_callback is not None and \
+                            os.path.isfile(local_path):
+                        sent_bytes += os.path.getsize(local_path)
+                        progress_callback(sent_bytes, total_bytes)
+
+            # let tar see the end of its input
+            channel.shutdown_write()
+
+            exit_status = channel.recv_exit_status()
+            if exit_status != 0:
+                error = channel.makefile_stderr('rb').read()
+                raise ServerCommandExitFailure(error.decode('utf-8'))
+        except (SSHException, OSError) as e:
             raise ServerInterfaceError(e)
+        finally:
+            channel.close()
 
     def get_file_byte_count(self, file_path: str) -> int:
         """Get the number of bytes in a file on the server.
@@ -271,7 +327,7 @@ class ServerInterface:
 
         try:
             count = self._sftp_client.stat(file_path).st_size
-        except SSHException as e:
+        except (SSHException, IOError) as e:
             raise ServerInterfaceError(e)
 
         return count
@@ -336,6 +392,18 @@ class ServerInterface:
 
         return log_path
 
+    def get_user_response_log_path(self, username) -> str:
+        """Builds the path to the log file on the server in which the server
+        responds to a student or faculty's requests.
+
+        :param username: username of the user
+        :return: the path to the user's response log file
+        """
+
+        home_dir = self.get_user_home_dir(username)
+
+        return build_user_response_log_path(home_dir, username)
+
 
 # Module-level interface instance. Someone must call connect() on this before
 # it is used
@@ -13,15 +13,33 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-"""Provides two classes for reading from and writing to log files on the
+"""Provides classes for reading from and writing to log files on the
 server.
 
 Thread-safe if the strings written to the log are <= 512 bytes.
 
+ServerLogFileReader is polled by a LogPollingThread, which costs a round trip
+to the server per poll. ServerLogTail instead runs tail -F on the server over
+a single SSH channel, and new lines are pushed to the client as soon as they
+are written.
+
+Example usage:
+
+    new_log_line_queue = Queue()
+    log_tail = ServerLogTail(log_path, new_log_line_queue)
+    log_tail.start()
+
+    log_file_path, log_line = new_log_line_queue.get(timeout=10)
+
+    log_tail.stop()
+
 See the gkeepcore.log_file module for more information.
 """
 
 
+from queue import Queue
+from threading import Thread
+
 from gkeepclient.server_interface import server_interface, ServerInterfaceError
 from gkeepcore.log_file import LogFileReader, LogFileWriter,\
     LogFileException
@@ -73,6 +91,105 @@ class ServerLogFileReader(LogFileReader):
         return byte_count
 
 
+class ServerLogTail(Thread):
+    """Streams lines appended to a log file on the server into a queue.
+
+    Lines are placed in the queue as (file_path, line) pairs, the same as a
+    LogPollingThread, so the queue can feed a LogEventParserThread.
+
+    The file does not need to exist yet, and it is followed if it is replaced.
+    """
+
+    # number of bytes received from the channel at a time
+    RECEIVE_SIZE = 32768
+
+    def __init__(self, file_path: str, new_log_line_queue: Queue,
+                 seek_position=0):
+        """
+        :param file_path: path to the log file on the server
+        :param new_log_line_queue: (file_path, line) pairs are placed in this
+         queue
+        :param seek_position: byte offset in the file at which to start
+        """
+
+        Thread.__init__(self, daemon=True)
+
+        self._file_path = file_path
+        self._new_log_line_queue = new_log_line_queue
+        self._byte_count = seek_position
+        self._channel = None
+
+    def start(self):
+        """Start tail on the server, and start the thread which reads from
+        it.
+
+        Raises LogFileException if tail cannot be started.
+        """
+
+        # tail counts bytes from 1
+        command = ['tail', '-F', '-c', '+{0}'.format(self._byte_count + 1),
+                   self._file_path]
+
+        try:
+            self._channel = server_interface.start_command(command)
+        except ServerInterfaceError as e:
+            raise LogFileException(e)
+
+        Thread.start(self)
+
+    def stop(self):
+        """Stop tail on the server and wait for the thread to finish."""
+
+        if self._channel is not None:
+            self._channel.close()
+
+        if self.is_alive():
+            self.join()
+
+    def get_file_path(self) -> str:
+        """Getter for the log file path
+
+        :return: the path to the log file
+        """
+
+        return self._file_path
+
+    def get_byte_count(self) -> int:
+        """Retrieve the offset in the file just past the last line placed in
+        the queue.
+
+        :return: number of bytes of the file which have been read
+        """
+
+        return self._byte_count
+
+    def run(self):
+        """Read from tail until the channel is closed.
+
+        This should not be called directly, call start() instead.
+        """
+
+        pending = b''
+
+        while True:
+            data = self._channel.recv(self.RECEIVE_SIZE)
+
+            # an empty read means the channel was closed
+            if len(data) == 0:
+                break
+
+            pending += data
+
+            # only whole lines are placed in the queue, a partial line waits
+            # for the rest of it
+            *lines, pending = pending.split(b'\n')
+
+            for line in lines:
+                self._byte_count += len(line) + 1
+                self._new_log_line_queue.put((self._file_path,
+                                              line.decode('utf-8')))
+
+
 class ServerLogFileWriter(LogFileWriter):
     """Allows writing to log files on the server."""
     def __init__(self, file_path):
@@ -88,3 +205,9 @@ class ServerLogFileWriter(LogFileWriter):
             server_interface.append_to_file(self._file_path, string)
         except ServerInterfaceError as e:
             raise LogFileException(e)
+
+    def _append_many(self, strings):
+        # Appends several strings to the log in one request to the server.
+        # Should not be called directly, use the inherited log_many() method
+        # instead.
+        self._append('\n'.join(strings))
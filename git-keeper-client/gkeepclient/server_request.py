@@ -0,0 +1,140 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides a function for making requests to the server through the event
+logs and waiting for the response.
+
+The request is logged in the user's log on the server, where gkeepd picks
+it up and handles it. The response log is tailed from its current end before
+the request is logged, so the response cannot be missed however quickly it
+arrives. See gkeepcore.request_log for the format of requests and responses.
+
+Example usage:
+
+    try:
+        message = send_request('REGRADE', {'class_name': class_name,
+                                           'assignment': assignment})
+    except ServerRequestError as e:
+        sys.exit(e)
+
+    print(message)
+"""
+
+
+from queue import Queue, Empty
+from time import time
+
+from gkeepclient.client_configuration import config
+from gkeepclient.server_interface import server_interface, \
+    ServerInterfaceError
+from gkeepclient.server_log_file import ServerLogFileWriter, ServerLogTail
+from gkeepcore.log_file import LogFileException
+from gkeepcore.request_log import new_request_id, format_request_payload, \
+    parse_response_line, REQUEST_EVENT_TYPE, OK
+
+
+# default number of seconds to wait for a response
+RESPONSE_TIMEOUT = 30
+
+
+class ServerRequestError(Exception):
+    """Raised when a request fails or is not answered in time."""
+    pass
+
+
+def send_request(request_type: str, arguments: dict,
+                 timeout=RESPONSE_TIMEOUT) -> str:
+    """Make a request to the server and wait for the response.
+
+    Raises ServerRequestError if the server responds with an error, or does
+    not respond within the timeout.
+
+    :param request_type: type of the request, such as REGRADE
+    :param arguments: arguments for the request, which must be serializable
+     as JSON
+    :param timeout: number of seconds to wait for the response
+    :return: the message from the server's response
+    """
+
+    request_id = new_request_id()
+
+    try:
+        log_path = server_interface.get_user_log_path(config.username)
+        response_log_path = \
+            server_interface.get_user_response_log_path(config.username)
+    except ServerInterfaceError as e:
+        raise ServerRequestError(e)
+
+    # the response log does not exist until the first response
+    try:
+        response_byte_count = \
+            server_interface.get_file_byte_count(response_log_path)
+    except ServerInterfaceError:
+        response_byte_count = 0
+
+    response_queue = Queue()
+    response_tail = ServerLogTail(response_log_path, response_queue,
+                                  response_byte_count)
+
+    try:
+        response_tail.start()
+    except LogFileException as e:
+        raise ServerRequestError('Error reading responses: {0}'.format(e))
+
+    try:
+        payload = format_request_payload(request_id, request_type, arguments)
+        ServerLogFileWriter(log_path).log(REQUEST_EVENT_TYPE, payload)
+
+        status, message = _wait_for_response(request_id, response_queue,
+                                             timeout)
+    except LogFileException as e:
+        raise ServerRequestError('Error sending request: {0}'.format(e))
+    finally:
+        response_tail.stop()
+
+    if status != OK:
+        raise ServerRequestError(message)
+
+    return message
+
+
+def _wait_for_response(request_id: str, response_queue: Queue,
+                       timeout) -> tuple:
+    # Get lines from the response log until the response to the request
+    # arrives. Responses to other requests are skipped.
+    #
+    # Raises ServerRequestError on timeout
+    #
+    # :return: a tuple containing the status and the message
+
+    deadline = time() + timeout
+
+    while True:
+        remaining = deadline - time()
+
+        try:
+            if remaining <= 0:
+                raise Empty()
+
+            log_path, line = response_queue.get(timeout=remaining)
+        except Empty:
+            raise ServerRequestError('No response from the server after {0} '
+                                     'seconds'.format(timeout))
+
+        response = parse_response_line(line)
+
+        if response is not None and response[0] == request_id:
+            return response[1], response[2]
@@ -16,15 +16,57 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import os
+import shutil
 import sys
-from tempfile import TemporaryDirectory
 
 from configuration import GraderConfiguration, ConfigurationError
 from paramiko.client import SSHClient
 from repository import Repository
 from subprocess_commands import CommandError, home_dir_from_username,\
     directory_exists
-from upload_assignment import copy_and_create_repo
+
+
+# A clone of each assignment's tests repository is kept here, under
+# <host>/<class>/<assignment>_tests. Each update only commits what changed
+# since the last one, so pushing it only sends the new objects.
+TESTS_MIRRORS_DIR = os.path.expanduser('~/.cache/git-keeper/tests_mirrors')
+
+
+def sync_directory_contents(source, dest):
+    # Make the contents of dest the same as the contents of source, leaving
+    # dest's .git directory alone
+
+    for name in os.listdir(dest):
+        if name == '.git':
+            continue
+        path = os.path.join(dest, name)
+        if os.path.isdir(path) and not os.path.islink(path):
+            shutil.rmtree(path)
+        else:
+            os.remove(path)
+
+    for name in os.listdir(source):
+        if name == '.git':
+            continue
+        source_path = os.path.join(source, name)
+        dest_path = os.path.join(dest, name)
+        if os.path.isdir(source_path) and not os.path.islink(source_path):
+            shutil.copytree(source_path, dest_path, symlinks=True)
+        else:
+            shutil.copy2(source_path, dest_path, follow_symlinks=False)
+
+
+def update_mirror(mirror, tests_bare_repo):
+    # Bring the mirror up to date with the tests repository on the server,
+    # cloning it if there is no mirror yet. Anything in the mirror that is not
+    # on the server, such as a commit whose push failed, is discarded.
+
+    if os.path.isdir(mirror.path) and mirror.is_initialized():
+        mirror.fetch_and_reset()
+    else:
+        shutil.rmtree(mirror.path, ignore_errors=True)
+        os.makedirs(os.path.dirname(mirror.path), exist_ok=True)
+        mirror.clone_from_remote(tests_bare_repo)
 
 
 def update_assignment_tests(class_name, local_assignment_dir):
@@ -59,16 +101,6 @@ def update_assignment_tests(class_name, local_assignment_dir):
     if class_name not in config.students_by_class:
         sys.exit('Class {0} does not exist'.format(class_name))
 
-    test_code_repo_tempdir = TemporaryDirectory()
-
-    try:
-        test_code_repo = copy_and_create_repo(test_code_dir,
-                                              test_code_repo_tempdir.name,
-                                              assignment)
-    except CommandError as e:
-        error = 'Error copying test code repo:\n{0}'.format(e)
-        sys.exit(error)
-
     try:
         remote_home_dir = home_dir_from_username(config.username, ssh=ssh)
 
@@ -93,13 +125,35 @@ def update_assignment_tests(class_name, local_assignment_dir):
                                  remote_host=config.host,
                                  remote_user=config.username)
 
+    mirror_path = os.path.join(TESTS_MIRRORS_DIR, config.host, class_name,
+                               '{0}_tests'.format(assignment))
+    mirror = Repository(mirror_path, assignment)
+
+    try:
+        update_mirror(mirror, tests_bare_repo)
+    except (CommandError, OSError) as e:
+        sys.exit('Error updating {0} from the server:\n{1}'
+                 .format(mirror_path, e))
+
     try:
-        test_code_repo.push(tests_bare_repo, force=True)
+        sync_directory_contents(test_code_dir, mirror_path)
+    except OSError as e:
+        sys.exit('Error copying tests to {0}:\n{1}'.format(mirror_path, e))
+
+    try:
+        if not mirror.has_changes():
+            print(assignment, 'tests are unchanged, nothing to update')
+            return
+
+        mirror.add_all_and_commit('update tests')
+        mirror.push(tests_bare_repo)
         print('Pushed tests to', tests_bare_repo_dir)
     except CommandError as e:
         sys.exit('Error pushing test repo:\n{0}'.format(e))
 
     print(assignment, 'tests updated successfully')
+    print('Existing submissions are not tested again until they are pushed. '
+          'Use regrade_assignment to test all of them now.')
 
 
 if __name__ == '__main__':
@@ -22,7 +22,8 @@ from tempfile import TemporaryDirectory
 from configuration import GraderConfiguration, ConfigurationError
 from repository import Repository, copy_and_create_repo
 from subprocess_commands import directory_exists, touch, CommandError,\
-    chmod_world_writable_recursive, home_dir_from_username, scp_file
+    chmod_world_writable_recursive, chmod_world_readable_recursive,\
+    world_traversable, home_dir_from_username, scp_file
 
 from student import Student
 
@@ -100,12 +101,24 @@ def upload_assignment(class_name, grader_project):
     reports_bare_repo_dir = os.path.join(remote_assignment_dir,
                                          '{0}_reports.git'.format(assignment))
 
+    # the base code objects are stored once here, and every student
+    # repository borrows them through git alternates instead of keeping its
+    # own copy. Students read the objects with their own accounts, so this is
+    # only done if other users can reach the assignment directory, which
+    # requires o+x on the faculty home directory and the directories in it.
+    # Otherwise each student repository gets its own copy of the objects.
+    base_bare_repo_dir = os.path.join(remote_assignment_dir,
+                                      '{0}_base.git'.format(assignment))
+
     if directory_exists(tests_bare_repo_dir, config.username, config.host):
         sys.exit('{0} already exists on {1}'.format(tests_bare_repo_dir,
                                                     config.host))
     if directory_exists(reports_bare_repo_dir, config.username, config.host):
         sys.exit('{0} already exists on {1}'.format(reports_bare_repo_dir,
                                                     config.host))
+    if directory_exists(base_bare_repo_dir, config.username, config.host):
+        sys.exit('{0} already exists on {1}'.format(base_bare_repo_dir,
+                                                    config.host))
 
     print('Uploading assignment', assignment)
 
@@ -115,6 +128,31 @@ def upload_assignment(class_name, grader_project):
     reports_repo = Repository(reports_repo_dir, assignment)
     reports_repo.init()
 
+    base_bare_repo = Repository(base_bare_repo_dir, assignment,
+                                is_local=False, is_bare=True,
+                                remote_user=config.username,
+                                remote_host=config.host)
+
+    try:
+        base_bare_repo.init()
+        base_code_repo.push(base_bare_repo)
+        chmod_world_readable_recursive(base_bare_repo.path,
+                                       remote_user=config.username,
+                                       remote_host=config.host)
+        share_base_objects = world_traversable(base_bare_repo.path,
+                                               remote_user=config.username,
+                                               remote_host=config.host)
+        print('Pushed base code to', base_bare_repo_dir)
+    except CommandError as e:
+        sys.exit('Error creating {0} on {1}:\n{2}'.format(base_bare_repo_dir,
+                                                          config.host, e))
+
+    if not share_base_objects:
+        print('Students cannot read {0}, so each student repository stores '
+              'its own copy of the base code. Make the directories above it '
+              'searchable by others (chmod o+x) to share it.'
+              .format(base_bare_repo_dir))
+
     for student in config.students_by_class[class_name]:
         assert isinstance(student, Student)
         bare_repo_dir = student.get_bare_repo_dir(class_name, assignment)
@@ -128,7 +166,10 @@ def upload_assignment(class_name, grader_project):
                                   student_username=student.username)
         try:
             student_repo.init()
+            if share_base_objects:
+                student_repo.add_alternate(base_bare_repo)
             student_repo.add_update_flag_hook(post_update_path)
+            # with shared objects only refs are sent
             base_code_repo.push(student_repo)
             chmod_world_writable_recursive(student_repo.path,
                                            remote_user=config.username,
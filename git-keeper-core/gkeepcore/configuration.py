@@ -21,7 +21,8 @@ from paramiko.client import SSHClient
 from subprocess_commands import home_dir_from_username, directory_exists,\
     list_directory, CommandError
 
-from student import Student
+from roster import Roster, RosterException
+from student import Student, StudentException
 
 
 class ConfigurationError(Exception):
@@ -104,9 +105,8 @@ class GraderConfiguration:
             raise ConfigurationError('Error connecting to {0} via SSH:\n{1}'
                                      .format(self.host, e))
 
-        self.students_by_class = {}
+        self.roster = Roster()
         self.students_csv_filenames_by_class = {}
-        self.students_by_username = {}
 
         for filename in os.listdir(self.config_dir):
             if not filename.endswith('.csv'):
@@ -123,29 +123,17 @@ class GraderConfiguration:
                 error += 'Class names may not contain spaces'
                 raise ConfigurationError(error)
 
-            self.students_by_class[class_name] = []
+            self.roster.add_class(class_name)
 
             filepath = os.path.join(self.config_dir, filename)
 
             self.students_csv_filenames_by_class[class_name] = filepath
 
-            try:
-                with open(filepath) as f:
-                    rows = list(csv.reader(f))
-            except OSError as e:
-                error = 'Error opening {0}:\n{1}'.format(filepath, e)
-                raise ConfigurationError(error)
-
-            for row in rows:
+            for student in self._read_students_csv(filepath):
                 try:
-                    student_row = row
-                    student = Student(*student_row, ssh=self.ssh)
-                    self.students_by_class[class_name].append(student)
-                    self.students_by_username[student.username] = student
-                except TypeError:
-                    row_str = ','.join(row)
-                    error = 'Error in {0} at this row:\n{1}'.format(filepath,
-                                                                    row_str)
+                    self.roster.add(class_name, student)
+                except RosterException as e:
+                    error = 'Error in {0}:\n{1}'.format(filepath, e)
                     raise ConfigurationError(error)
 
         if len(self.students_by_class) == 0:
@@ -156,6 +144,118 @@ class GraderConfiguration:
                 error = 'No students in {0}'.format(class_name)
                 raise ConfigurationError(error)
 
+    def _read_students_csv(self, filepath, existing_students=None) -> list:
+        # Create a Student for each row of a student CSV file.
+        #
+        # Students in existing_students whose email address appears in the
+        # file are reused rather than constructed again.
+        #
+        # :param filepath: path to the CSV file
+        # :param existing_students: optional dictionary mapping email
+        #  addresses to Student objects
+        # :return: list of Student objects
+
+        if existing_students is None:
+            existing_students = {}
+
+        try:
+            with open(filepath) as f:
+                rows = list(csv.reader(f))
+        except OSError as e:
+            error = 'Error opening {0}:\n{1}'.format(filepath, e)
+            raise ConfigurationError(error)
+
+        students = []
+
+        for row in rows:
+            if len(row) == 3 and row[2] in existing_students:
+                students.append(existing_students[row[2]])
+                continue
+
+            try:
+                student_row = row
+                students.append(Student(*student_row, ssh=self.ssh))
+            except TypeError:
+                row_str = ','.join(row)
+                error = 'Error in {0} at this row:\n{1}'.format(filepath,
+                                                                row_str)
+                raise ConfigurationError(error)
+            except (StudentException, CommandError) as e:
+                # an invalid email address, or a student whose home
+                # directory cannot be found on the server
+                row_str = ','.join(row)
+                error = 'Error in {0} at this row:\n{1}\n{2}'.format(
+                    filepath, row_str, e)
+                raise ConfigurationError(error)
+
+        return students
+
+    def reload_class(self, class_name) -> (list, list):
+        """Re-reads the student CSV file for a class and applies only the
+        differences to the roster.
+
+        A student whose email address changed is treated as removed and then
+        added. The roster is left unchanged if the file cannot be read, has
+        errors, or has no students.
+
+        :param class_name: name of the class to reload
+        :return: a tuple containing a list of the students that were added
+                 and a list of the students that were removed
+        """
+
+        if class_name not in self.students_csv_filenames_by_class:
+            raise ConfigurationError('No student CSV file for {0}'
+                                     .format(class_name))
+
+        filepath = self.students_csv_filenames_by_class[class_name]
+
+        current_students = {}
+        for student in self.roster.get_students(class_name):
+            current_students[student.email_address] = student
+
+        new_students = self._read_students_csv(filepath, current_students)
+
+        if len(new_students) == 0:
+            raise ConfigurationError('No students in {0}'.format(class_name))
+
+        new_emails = set(student.email_address for student in new_students)
+
+        removed = [student for email, student in current_students.items()
+                   if email not in new_emails]
+
+        for student in removed:
+            self.roster.remove(class_name, student.username)
+
+        added = []
+
+        for student in new_students:
+            if self.roster.is_member(class_name, student.username):
+                continue
+
+            try:
+                added.append(self.roster.add(class_name, student))
+            except RosterException as e:
+                # undo the changes so the roster is left as it was
+                for added_student in added:
+                    self.roster.remove(class_name, added_student.username)
+                for removed_student in removed:
+                    self.roster.add(class_name, removed_student)
+
+                error = 'Error in {0}:\n{1}'.format(filepath, e)
+                raise ConfigurationError(error)
+
+        return added, removed
+
+    @property
+    def students_by_class(self) -> dict:
+        """Dictionary mapping class names to lists of students"""
+        return self.roster.students_by_class
+
+    @property
+    def students_by_username(self) -> dict:
+        """Dictionary mapping usernames to students across all classes"""
+        return self.roster.students_by_username
+
     def get_assignments(self, class_name):
         assignments_dir = os.path.join(self.home_dir, class_name, 'assignments')
 
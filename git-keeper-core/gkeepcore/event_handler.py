@@ -16,6 +16,8 @@
 
 import abc
 
+from gkeepcore.tracing import new_trace_id
+
 
 class HandlerException(Exception):
     pass
@@ -42,6 +44,10 @@ class EventHandler(metaclass=abc.ABCMeta):
 
     The event type is not a parameter for the constructor, because each event
     type has its own EventHandler subclass.
+
+    Each handler is given a new trace ID when it is constructed. handle()
+    should pass it along to anything it does on behalf of the event, so the
+    spans recorded along the way are tied together in the trace log.
     """
 
     def __init__(self, log_path: str, timestamp: int, payload: str):
@@ -56,6 +62,8 @@ class EventHandler(metaclass=abc.ABCMeta):
         self._timestamp = timestamp
         self._payload = payload
 
+        self.trace_id = new_trace_id()
+
         self._parse()
 
     @abc.abstractmethod
@@ -0,0 +1,366 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides a central append-only journal of log events.
+
+Events are logged by students and faculty in their own log files, which is
+what lets each of them write events without being able to write anyone
+else's. Once the server has parsed an event it appends it to the journal, so
+there is one stream holding the history of every user, and an index by
+username and event type makes historical queries fast.
+
+The journal is a binary file of length-prefixed records. Each record is:
+
+    <body length> <CRC-32 of body> <body>
+
+The length and CRC are unsigned 32-bit big-endian integers. The body is:
+
+    <timestamp> <username length> <event type length> <username>
+    <event type> <payload>
+
+The timestamp is a signed 64-bit integer of seconds from the epoch, the
+lengths are unsigned 16-bit integers, and the strings are UTF-8. All integers
+are big-endian.
+
+The journal is opened with O_APPEND and every append is a single write()
+call, so records from several threads or processes are never interleaved.
+A record that is still being written when the journal is read is left for
+the next read, and a record whose CRC does not match raises an
+EventJournalException.
+
+Example usage:
+
+    journal = EventJournal('/path/to/events.journal')
+
+    journal.append(int(time()), 'student', 'SUBMISSION', repo_path)
+
+    for record in journal.query(username='student'):
+        print(record.timestamp, record.event_type, record.payload)
+
+    journal.close()
+
+This module can also be run to show the events in a journal:
+
+    python3 -m gkeepcore.event_journal <journal> [<username> [<event type>]]
+"""
+
+
+import os
+import struct
+import sys
+import zlib
+from collections import namedtuple
+from heapq import merge
+from threading import Lock
+from time import localtime, strftime
+
+
+_HEADER = struct.Struct('>II')
+_BODY_HEADER = struct.Struct('>qHH')
+
+# number of bytes read at a time when indexing the journal
+READ_SIZE = 1024 * 1024
+
+
+class EventJournalException(Exception):
+    pass
+
+
+# An event read from the journal. offset is the position of the record in the
+# journal.
+JournalRecord = namedtuple('JournalRecord', ['offset', 'timestamp',
+                                             'username', 'event_type',
+                                             'payload'])
+
+
+def encode_record(timestamp: int, username: str, event_type: str,
+                  payload: str) -> bytes:
+    """
+    Encode an event as a journal record.
+
+    Raises EventJournalException if the username or event type is too long.
+
+    :param timestamp: time of the event, in seconds from the epoch
+    :param username: user who logged the event
+    :param event_type: type of the event
+    :param payload: the rest of the event
+    :return: the record as bytes
+    """
+
+    username_bytes = username.encode('utf-8')
+    event_type_bytes = event_type.encode('utf-8')
+
+    if len(username_bytes) > 0xffff or len(event_type_bytes) > 0xffff:
+        raise EventJournalException('Username or event type is too long')
+
+    body = b''.join((_BODY_HEADER.pack(timestamp, len(username_bytes),
+                                       len(event_type_bytes)),
+                     username_bytes, event_type_bytes,
+                     payload.encode('utf-8')))
+
+    return _HEADER.pack(len(body), zlib.crc32(body)) + body
+
+
+def decode_records(data: bytes, base_offset=0) -> tuple:
+    """
+    Decode the complete records at the start of data.
+
+    Raises EventJournalException if a record is corrupt.
+
+    :param data: bytes read from the journal, starting at a record
+    :param base_offset: position in the journal that data was read from
+    :return: a tuple containing a list of JournalRecord objects and the
+     number of bytes they used. Bytes past that are an incomplete record.
+    """
+
+    records = []
+    position = 0
+
+    while position + _HEADER.size <= len(data):
+        body_length, crc = _HEADER.unpack_from(data, position)
+
+        body_start = position + _HEADER.size
+        body_end = body_start + body_length
+
+        if body_end > len(data):
+            break
+
+        body = data[body_start:body_end]
+
+        if zlib.crc32(body) != crc or body_length < _BODY_HEADER.size:
+            raise EventJournalException('Corrupt record at offset {0}'
+                                        .format(base_offset + position))
+
+        timestamp, username_length, event_type_length = \
+            _BODY_HEADER.unpack_from(body)
+
+        username_end = _BODY_HEADER.size + username_length
+        event_type_end = username_end + event_type_length
+
+        try:
+            username = body[_BODY_HEADER.size:username_end].decode('utf-8')
+            event_type = body[username_end:event_type_end].decode('utf-8')
+            payload = body[event_type_end:].decode('utf-8')
+        except UnicodeDecodeError:
+            raise EventJournalException('Corrupt record at offset {0}'
+                                        .format(base_offset + position))
+
+        records.append(JournalRecord(base_offset + position, timestamp,
+                                     username, event_type, payload))
+
+        position = body_end
+
+    return records, position
+
+
+class EventJournal:
+    """Appends events to a journal and queries them. Safe to use from any
+    thread.
+
+    The index is kept in memory. It is built the first time the journal is
+    queried and brought up to date with whatever has been appended, by this
+    or any other process, each time after that.
+    """
+
+    def __init__(self, journal_path: str, mode=0o600):
+        """
+        The journal is created if it does not exist.
+
+        :param journal_path: path to the journal
+        :param mode: permissions of the journal if it is created
+        """
+
+        self.path = journal_path
+
+        self._write_fd = os.open(journal_path,
+                                 os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                                 mode)
+        self._read_fd = os.open(journal_path, os.O_RDONLY)
+
+        # offsets of records indexed by (username, event type)
+        self._index = {}
+
+        # everything before this offset has been indexed
+        self._indexed_offset = 0
+
+        self._lock = Lock()
+
+    def close(self):
+        """Close the journal's file descriptors."""
+
+        os.close(self._write_fd)
+        os.close(self._read_fd)
+
+    def append(self, timestamp: int, username: str, event_type: str,
+               payload: str):
+        """
+        Append an event to the journal.
+
+        :param timestamp: time of the event, in seconds from the epoch
+        :param username: user who logged the event
+        :param event_type: type of the event
+        :param payload: the rest of the event
+        """
+
+        self._write(encode_record(timestamp, username, event_type, payload))
+
+    def append_many(self, events):
+        """
+        Append several events to the journal with a single write.
+
+        :param events: iterable of (timestamp, username, event type, payload)
+         tuples
+        """
+
+        data = b''.join(encode_record(*event) for event in events)
+
+        if len(data) > 0:
+            self._write(data)
+
+    def _write(self, data: bytes):
+        # Write data with a single call. A short write on a regular file means
+        # the disk is full, and leaves an incomplete record that readers will
+        # wait on forever, so it is an error.
+
+        try:
+            written = os.write(self._write_fd, data)
+        except OSError as e:
+            raise EventJournalException('Error writing to {0}: {1}'
+                                        .format(self.path, e))
+
+        if written != len(data):
+            raise EventJournalException('Short write to {0}'
+                                        .format(self.path))
+
+    def records(self, start_offset=0):
+        """
+        Generate the records in the journal in the order they were appended.
+
+        :param start_offset: offset of the first record to generate
+        :return: a generator of JournalRecord objects
+        """
+
+        for records, end_offset in self._scan(start_offset):
+            yield from records
+
+    def _scan(self, offset: int):
+        # Generate (records, end offset) pairs for each chunk read from
+        # offset to the end of the journal. The end offset is where the next
+        # scan should start, after the last complete record.
+
+        pending = b''
+
+        while True:
+            data = os.pread(self._read_fd, READ_SIZE, offset + len(pending))
+
+            if len(data) == 0:
+                return
+
+            pending += data
+            records, used = decode_records(pending, offset)
+
+            offset += used
+            pending = pending[used:]
+
+            yield records, offset
+
+    def query(self, username=None, event_type=None, since=None) -> list:
+        """
+        Get the records of matching events using the index.
+
+        :param username: only include events logged by this user
+        :param event_type: only include events of this type
+        :param since: only include events at or after this timestamp
+        :return: list of JournalRecord objects in the order they were appended
+        """
+
+        with self._lock:
+            self._update_index()
+
+            offset_lists = [offsets for (key_username, key_event_type),
+                            offsets in self._index.items()
+                            if username in (None, key_username) and
+                            event_type in (None, key_event_type)]
+
+            # copy the lists, appending to them would change the merge
+            offsets = list(merge(*[list(offsets)
+                                   for offsets in offset_lists]))
+
+        records = []
+
+        for offset in offsets:
+            record = self._read_record(offset)
+
+            if since is None or record.timestamp >= since:
+                records.append(record)
+
+        return records
+
+    def _update_index(self):
+        # Index records appended since the last update
+
+        for records, end_offset in self._scan(self._indexed_offset):
+            for record in records:
+                key = (record.username, record.event_type)
+                self._index.setdefault(key, []).append(record.offset)
+
+            self._indexed_offset = end_offset
+
+    def _read_record(self, offset: int) -> JournalRecord:
+        # Read a single record which is known to be complete
+
+        header = os.pread(self._read_fd, _HEADER.size, offset)
+        body_length, crc = _HEADER.unpack(header)
+
+        data = header + os.pread(self._read_fd, body_length,
+                                 offset + _HEADER.size)
+
+        records, used = decode_records(data, offset)
+
+        return records[0]
+
+
+def main():
+    """
+    Print the events in a journal, optionally only those of one user and one
+    event type.
+    """
+
+    if len(sys.argv) not in (2, 3, 4):
+        sys.exit('Usage: {0} <journal> [<username> [<event type>]]'
+                 .format(sys.argv[0]))
+
+    journal_path = sys.argv[1]
+    username = sys.argv[2] if len(sys.argv) > 2 else None
+    event_type = sys.argv[3] if len(sys.argv) > 3 else None
+
+    if not os.path.isfile(journal_path):
+        sys.exit('{0} does not exist'.format(journal_path))
+
+    try:
+        journal = EventJournal(journal_path)
+        records = journal.query(username, event_type)
+        journal.close()
+    except (OSError, EventJournalException) as e:
+        sys.exit('Error reading {0}: {1}'.format(journal_path, e))
+
+    for record in records:
+        print(strftime('%Y-%m-%d %H:%M:%S', localtime(record.timestamp)),
+              record.username, record.event_type, record.payload)
+
+
+if __name__ == '__main__':
+    main()
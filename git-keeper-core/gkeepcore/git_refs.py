@@ -0,0 +1,182 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Read git metadata directly from a local repository's files.
+
+Looking up a hash or listing refs with git itself costs a fork and exec for
+every call. The functions here read HEAD, loose refs and packed-refs from the
+git directory instead. They return None whenever the repository is laid out
+in a way they do not understand, in which case the caller should fall back to
+running git.
+"""
+
+
+import os
+import re
+
+
+# symbolic references are followed at most this many times
+MAX_SYMREF_DEPTH = 5
+
+_HASH_RE = re.compile(r'^[0-9a-f]{40}([0-9a-f]{24})?$')
+
+
+def find_git_dir(repo_path: str, is_bare=False):
+    """
+    Find the git directory of a local repository.
+
+    For a non-bare repository .git may be a directory or a file containing a
+    gitdir: line, as is the case for worktrees and submodules.
+
+    :param repo_path: path to the repository
+    :param is_bare: True if the repository is bare
+    :return: path to the git directory, or None if there isn't one
+    """
+
+    if is_bare:
+        if os.path.isfile(os.path.join(repo_path, 'HEAD')):
+            return repo_path
+        return None
+
+    dot_git = os.path.join(repo_path, '.git')
+
+    if os.path.isdir(dot_git):
+        return dot_git
+
+    try:
+        with open(dot_git) as f:
+            line = f.readline().strip()
+    except OSError:
+        return None
+
+    if not line.startswith('gitdir:'):
+        return None
+
+    git_dir = line[len('gitdir:'):].strip()
+
+    return os.path.normpath(os.path.join(repo_path, git_dir))
+
+
+def read_packed_refs(git_dir: str) -> dict:
+    """
+    Read the packed-refs file of a git directory.
+
+    :param git_dir: path to the git directory
+    :return: dictionary mapping ref names to hashes
+    """
+
+    refs = {}
+
+    try:
+        with open(os.path.join(git_dir, 'packed-refs')) as f:
+            for line in f:
+                # skip the header and the peeled hashes of annotated tags
+                if line.startswith('#') or line.startswith('^'):
+                    continue
+
+                fields = line.split()
+                if len(fields) == 2 and _HASH_RE.match(fields[0]):
+                    refs[fields[1]] = fields[0]
+    except OSError:
+        pass
+
+    return refs
+
+
+def _read_ref_file(git_dir, ref_name):
+    # returns the stripped contents of a loose ref, or None
+    try:
+        with open(os.path.join(git_dir, ref_name)) as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def resolve_ref(git_dir: str, ref_name: str):
+    """
+    Resolve a ref such as HEAD or refs/heads/master to a commit hash.
+
+    Symbolic refs are followed. Loose refs take precedence over packed refs,
+    as they do in git.
+
+    :param git_dir: path to the git directory
+    :param ref_name: name of the ref to resolve
+    :return: the hash, or None if the ref could not be resolved
+    """
+
+    for _ in range(MAX_SYMREF_DEPTH):
+        contents = _read_ref_file(git_dir, ref_name)
+
+        if contents is None:
+            return read_packed_refs(git_dir).get(ref_name)
+
+        if contents.startswith('ref:'):
+            ref_name = contents[len('ref:'):].strip()
+        elif _HASH_RE.match(contents):
+            return contents
+        else:
+            return None
+
+    return None
+
+
+def read_head_hash(repo_path: str, is_bare=False):
+    """
+    Get the hash of HEAD in a local repository without running git.
+
+    :param repo_path: path to the repository
+    :param is_bare: True if the repository is bare
+    :return: the hash, or None if it could not be determined
+    """
+
+    git_dir = find_git_dir(repo_path, is_bare)
+
+    if git_dir is None:
+        return None
+
+    return resolve_ref(git_dir, 'HEAD')
+
+
+def list_refs(repo_path: str, is_bare=False):
+    """
+    List the refs under refs/ in a local repository without running git.
+
+    :param repo_path: path to the repository
+    :param is_bare: True if the repository is bare
+    :return: dictionary mapping ref names to hashes, or None if the
+     repository could not be read
+    """
+
+    git_dir = find_git_dir(repo_path, is_bare)
+
+    if git_dir is None:
+        return None
+
+    refs = read_packed_refs(git_dir)
+
+    refs_dir = os.path.join(git_dir, 'refs')
+
+    for dir_path, dir_names, file_names in os.walk(refs_dir):
+        for file_name in file_names:
+            file_path = os.path.join(dir_path, file_name)
+            ref_name = os.path.relpath(file_path, git_dir).replace(os.sep, '/')
+
+            # loose refs override packed refs of the same name
+            ref_hash = resolve_ref(git_dir, ref_name)
+            if ref_hash is not None:
+                refs[ref_name] = ref_hash
+
+    return refs
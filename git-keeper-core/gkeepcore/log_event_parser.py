@@ -22,8 +22,26 @@ handle them.
 import re
 from queue import Queue
 from threading import Thread
+from time import time
 
 from gkeepcore.event_handler import EventHandler, HandlerException
+from gkeepcore.event_journal import EventJournal, EventJournalException
+from gkeepcore.metrics import registry
+from gkeepcore.path_utils import parse_user_log_path
+from gkeepcore.tracing import tracer
+
+
+_events = registry.counter('gkeep_log_events_total',
+                           'Number of log events parsed into handlers')
+_event_errors = registry.counter('gkeep_log_event_errors_total',
+                                 'Number of log lines that could not be '
+                                 'parsed into handlers')
+_event_delay_seconds = registry.histogram('gkeep_log_event_delay_seconds',
+                                          'Time from an event being logged '
+                                          'to its handler being created')
+_line_queue_depth = registry.gauge('gkeep_log_line_queue_depth',
+                                   'Number of log lines waiting to be '
+                                   'parsed')
 
 
 class LogEventParserException(Exception):
@@ -49,12 +67,15 @@ class LogEventParserThread(Thread):
     dictionary mapping <event type> strings to EventHandler subclasses is
     passed in to the constructor.
 
+    If a journal is passed to the constructor, each event that is parsed is
+    appended to it.
+
     Call the inherited start() method to start the thread, do not call run()
     directly.
     """
 
     def __init__(self, new_log_line_queue: Queue, event_handler_queue: Queue,
-                 event_handlers_by_type: dict):
+                 event_handlers_by_type: dict, journal: EventJournal=None):
         """
         :param new_log_line_queue: input queue. (<log file path>, <log line>)
          tuples arrive in this queue
@@ -62,6 +83,7 @@ class LogEventParserThread(Thread):
          placed in this queue after parsing
         :param event_handlers_by_type: dictionary mapping event type strings
          to EventHandler subclases
+        :param journal: optional EventJournal to append parsed events to
         """
 
         Thread.__init__(self)
@@ -69,6 +91,9 @@ class LogEventParserThread(Thread):
         self._event_handlers_by_type = event_handlers_by_type
         self._new_log_line_queue = new_log_line_queue
         self._event_handler_queue = event_handler_queue
+        self._journal = journal
+
+        _line_queue_depth.set_function(self._new_log_line_queue.qsize)
 
     def run(self):
         """Continually get new log lines from the input queue, parse them,
@@ -82,12 +107,13 @@ class LogEventParserThread(Thread):
             try:
                 handler = self._parse_event(log_path, log_line)
                 self._event_handler_queue.put(handler)
+                _events.inc()
             except LogEventParserException:
                 # FIXME - log this
-                pass
+                _event_errors.inc()
             except HandlerException:
                 # FIXME - log this
-                pass
+                _event_errors.inc()
 
     def _parse_event(self, log_path, log_line) -> EventHandler:
         # Parse the event. This is done in two stages:
@@ -122,4 +148,30 @@ class LogEventParserThread(Thread):
         # construct the handler from whatever class was selected
         handler = handler_class(log_path, int(timestamp), payload)
 
+        # timestamps are logged with a resolution of one second
+        parsed_time = time()
+        _event_delay_seconds.observe(max(parsed_time - int(timestamp), 0))
+
+        # the trace of the event starts when it was logged
+        tracer.record(handler.trace_id, 'log_event', int(timestamp),
+                      parsed_time, event_type=event_type, log_path=log_path)
+
+        if self._journal is not None:
+            self._journal_event(log_path, int(timestamp), event_type, payload)
+
         return handler
+
+    def _journal_event(self, log_path, timestamp, event_type, payload):
+        # Append a parsed event to the journal. The event is still handled if
+        # it cannot be journaled.
+
+        username = parse_user_log_path(log_path)
+
+        if username is None:
+            return
+
+        try:
+            self._journal.append(timestamp, username, event_type, payload)
+        except EventJournalException:
+            # FIXME - log this
+            pass
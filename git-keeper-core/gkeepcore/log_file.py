@@ -48,9 +48,29 @@ class LogFileWriter(metaclass=abc.ABCMeta):
         :param event_type: a string describing the event type
         :param text: the description of the event
         """
-        line = '{0} {1} {2}'.format(int(time()), event_type, text)
-        self._append(line)
+        self._append(self._format_line(int(time()), event_type, text))
+
+    def log_many(self, events):
+        """Log several events at once. Writers which can append several lines
+        with one write do so.
+
+        :param events: iterable of (event type, text) tuples
+        """
+        timestamp = int(time())
+        lines = [self._format_line(timestamp, event_type, text)
+                 for event_type, text in events]
+
+        if len(lines) > 0:
+            self._append_many(lines)
+
+    def _format_line(self, timestamp, event_type, text):
+        return '{0} {1} {2}'.format(timestamp, event_type, text)
 
     @abc.abstractmethod
     def _append(self, string):
         """Append the given string to the file"""
+
+    def _append_many(self, strings):
+        """Append each of the given strings to the file"""
+        for string in strings:
+            self._append(string)
@@ -18,6 +18,16 @@ from queue import Queue, Empty
 from time import time, sleep
 
 from gkeepcore.log_file import LogFileReader, LogFileException
+from gkeepcore.metrics import registry
+
+
+_poll_seconds = registry.histogram('gkeep_log_poll_seconds',
+                                   'Time taken to poll every watched log '
+                                   'file once')
+_new_lines = registry.counter('gkeep_log_lines_total',
+                              'Number of new lines read from log files')
+_watched_logs = registry.gauge('gkeep_watched_log_files',
+                               'Number of log files being polled')
 
 
 class LogPollingThread(Thread):
@@ -137,10 +147,13 @@ class LogPollingThread(Thread):
         log_files = list(self._log_byte_counts.keys())
 
         # for each file that we're watching, add any new lines to the queue
-        for log_file in log_files:
-            for line in self._get_new_lines(log_file):
-                self._new_log_line_queue.put((log_file.get_file_path(),
-                                              line))
+        with _poll_seconds.time():
+            for log_file in log_files:
+                lines = self._get_new_lines(log_file)
+                _new_lines.inc(len(lines))
+                for line in lines:
+                    self._new_log_line_queue.put((log_file.get_file_path(),
+                                                  line))
 
         # consume all new log files until the queue is empty
         try:
@@ -155,6 +168,8 @@ class LogPollingThread(Thread):
         except Empty:
             pass
 
+        _watched_logs.set(len(self._log_byte_counts))
+
         # each file should be polled on average once per polling_interval
         next_poll_time = self._last_poll_time + self._polling_interval
         sleep_time = next_poll_time - time()
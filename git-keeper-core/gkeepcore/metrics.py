@@ -0,0 +1,430 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides counters, gauges and histograms for measuring the server.
+
+Metrics are created through a MetricsRegistry and are safe to update from
+any thread. The registry renders every metric in the Prometheus text
+exposition format, and a MetricsWriterThread writes that text to a stats
+file periodically, so it can be read with cat or collected by the node
+exporter's textfile collector.
+
+This module stores a MetricsRegistry instance in the module-level variable
+named registry, which is shared by everything in the process.
+
+Example usage:
+
+    from gkeepcore.metrics import registry, MetricsWriterThread
+
+    clone_seconds = registry.histogram('gkeep_clone_seconds',
+                                       'Time taken to clone a repository')
+
+    with clone_seconds.time():
+        repo.clone_to(path)
+
+    writer = MetricsWriterThread(registry, '/path/to/stats.prom')
+    writer.start()
+"""
+
+
+import os
+from threading import Thread, Lock, Event
+from time import time
+
+
+# upper bounds of the histogram buckets in seconds, covering everything from
+# a quick git operation to an action.sh run that hits its timeout
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+                   30, 60, 120, 300, 600)
+
+
+class MetricsException(Exception):
+    pass
+
+
+def _format_value(value) -> str:
+    # Prometheus uses +Inf, -Inf and NaN for the special float values
+
+    if value == float('inf'):
+        return '+Inf'
+    elif value == float('-inf'):
+        return '-Inf'
+    elif value != value:
+        return 'NaN'
+    else:
+        return repr(value)
+
+
+class Counter:
+    """A value that only goes up, such as a number of events."""
+
+    type_name = 'counter'
+
+    def __init__(self, name: str, help_text: str):
+        """
+        :param name: name of the metric
+        :param help_text: one line describing the metric
+        """
+
+        self.name = name
+        self.help_text = help_text
+
+        self._value = 0
+        self._lock = Lock()
+
+    @property
+    def value(self):
+        """The current value of the counter"""
+        return self._value
+
+    def inc(self, amount=1):
+        """
+        Increase the counter.
+
+        :param amount: amount to increase the counter by, must not be
+         negative
+        """
+
+        if amount < 0:
+            raise MetricsException('Counter {0} cannot decrease'
+                                   .format(self.name))
+
+        with self._lock:
+            self._value += amount
+
+    def render_samples(self) -> list:
+        """Get the sample lines for the exposition format."""
+        return ['{0} {1}'.format(self.name, _format_value(self._value))]
+
+
+class Gauge:
+    """A value that goes up and down, such as the length of a queue.
+
+    The value is either set directly or read from a function each time the
+    gauge is rendered.
+    """
+
+    type_name = 'gauge'
+
+    def __init__(self, name: str, help_text: str, function=None):
+        """
+        :param name: name of the metric
+        :param help_text: one line describing the metric
+        :param function: optional function which returns the current value
+        """
+
+        self.name = name
+        self.help_text = help_text
+
+        self._value = 0
+        self._function = function
+
+    @property
+    def value(self):
+        """The current value of the gauge"""
+
+        if self._function is not None:
+            return self._function()
+
+        return self._value
+
+    def set(self, value):
+        """
+        Set the value of the gauge.
+
+        :param value: the new value
+        """
+
+        self._value = value
+
+    def set_function(self, function):
+        """
+        Read the value from a function from now on.
+
+        :param function: function which returns the current value
+        """
+
+        self._function = function
+
+    def render_samples(self) -> list:
+        """Get the sample lines for the exposition format."""
+        return ['{0} {1}'.format(self.name, _format_value(self.value))]
+
+
+class Histogram:
+    """Counts observed values, such as durations, in buckets."""
+
+    type_name = 'histogram'
+
+    def __init__(self, name: str, help_text: str, buckets=DEFAULT_BUCKETS):
+        """
+        :param name: name of the metric
+        :param help_text: one line describing the metric
+        :param buckets: increasing upper bounds of the buckets. A bucket for
+         infinity is always added.
+        """
+
+        self.name = name
+        self.help_text = help_text
+
+        self.buckets = tuple(sorted(buckets))
+        if len(self.buckets) == 0 or self.buckets[-1] != float('inf'):
+            self.buckets += (float('inf'),)
+
+        self._bucket_counts = [0] * len(self.buckets)
+        self._count = 0
+        self._sum = 0
+        self._lock = Lock()
+
+    @property
+    def count(self):
+        """Number of observed values"""
+        return self._count
+
+    @property
+    def sum(self):
+        """Sum of the observed values"""
+        return self._sum
+
+    def observe(self, value):
+        """
+        Record a value.
+
+        :param value: the value to record
+        """
+
+        with self._lock:
+            for i, upper_bound in enumerate(self.buckets):
+                if value <= upper_bound:
+                    self._bucket_counts[i] += 1
+                    break
+
+            self._count += 1
+            self._sum += value
+
+    def time(self):
+        """
+        Time a block of code and record its duration in seconds.
+
+        Usage:
+
+            with histogram.time():
+                # do something
+
+        :return: a context manager
+        """
+
+        return _Timer(self)
+
+    def render_samples(self) -> list:
+        """Get the sample lines for the exposition format."""
+
+        with self._lock:
+            bucket_counts = list(self._bucket_counts)
+            count = self._count
+            total = self._sum
+
+        lines = []
+
+        # buckets are cumulative in the exposition format
+        cumulative_count = 0
+        for upper_bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative_count += bucket_count
+            lines.append('{0}_bucket{{le="{1}"}} {2}'
+                         .format(self.name, _format_value(float(upper_bound)),
+                                 cumulative_count))
+
+        lines.append('{0}_sum {1}'.format(self.name, _format_value(total)))
+        lines.append('{0}_count {1}'.format(self.name, count))
+
+        return lines
+
+
+class _Timer:
+    # Context manager returned by Histogram.time()
+
+    def __init__(self, histogram: Histogram):
+        self._histogram = histogram
+        self._start_time = None
+
+    def __enter__(self):
+        self._start_time = time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self._histogram.observe(time() - self._start_time)
+        return False
+
+
+class MetricsRegistry:
+    """Creates metrics and renders all of them together."""
+
+    def __init__(self):
+        self._metrics_by_name = {}
+        self._lock = Lock()
+
+    def counter(self, name: str, help_text: str) -> Counter:
+        """
+        Get the counter with the given name, creating it if need be.
+
+        :param name: name of the metric
+        :param help_text: one line describing the metric
+        :return: the counter
+        """
+
+        return self._get_or_create(Counter, name, help_text)
+
+    def gauge(self, name: str, help_text: str, function=None) -> Gauge:
+        """
+        Get the gauge with the given name, creating it if need be.
+
+        :param name: name of the metric
+        :param help_text: one line describing the metric
+        :param function: optional function which returns the current value.
+         If the gauge already exists its function is replaced.
+        :return: the gauge
+        """
+
+        gauge = self._get_or_create(Gauge, name, help_text)
+
+        if function is not None:
+            gauge.set_function(function)
+
+        return gauge
+
+    def histogram(self, name: str, help_text: str,
+                  buckets=DEFAULT_BUCKETS) -> Histogram:
+        """
+        Get the histogram with the given name, creating it if need be.
+
+        :param name: name of the metric
+        :param help_text: one line describing the metric
+        :param buckets: upper bounds of the buckets, only used when the
+         histogram is created
+        :return: the histogram
+        """
+
+        return self._get_or_create(Histogram, name, help_text,
+                                   buckets=buckets)
+
+    def render(self) -> str:
+        """
+        Render every metric in the Prometheus text exposition format.
+
+        :return: the rendered metrics
+        """
+
+        with self._lock:
+            metrics = [self._metrics_by_name[name]
+                       for name in sorted(self._metrics_by_name)]
+
+        lines = []
+
+        for metric in metrics:
+            lines.append('# HELP {0} {1}'.format(metric.name,
+                                                 metric.help_text))
+            lines.append('# TYPE {0} {1}'.format(metric.name,
+                                                 metric.type_name))
+            try:
+                lines += metric.render_samples()
+            except Exception as e:
+                # a gauge function failing must not hide the other metrics
+                lines.append('# ERROR {0}'.format(e))
+
+        return '\n'.join(lines) + '\n'
+
+    def write(self, file_path: str):
+        """
+        Write the rendered metrics to a file.
+
+        The metrics are written to a temporary file which then replaces the
+        file, so readers never see a partially written file.
+
+        :param file_path: path to the stats file
+        """
+
+        temp_path = '{0}.{1}.tmp'.format(file_path, os.getpid())
+
+        with open(temp_path, 'w') as f:
+            f.write(self.render())
+
+        os.replace(temp_path, file_path)
+
+    def _get_or_create(self, metric_class, name, help_text, **kwargs):
+        # Get an existing metric, or create and store a new one. Raises
+        # MetricsException if the name is used by a different type of
+        # metric.
+
+        with self._lock:
+            metric = self._metrics_by_name.get(name)
+
+            if metric is None:
+                metric = metric_class(name, help_text, **kwargs)
+                self._metrics_by_name[name] = metric
+            elif not isinstance(metric, metric_class):
+                raise MetricsException('{0} is already a {1}'
+                                       .format(name, metric.type_name))
+
+        return metric
+
+
+class MetricsWriterThread(Thread):
+    """Writes a registry's metrics to a stats file periodically.
+
+    Call the inherited start() method to start the thread, and shutdown() to
+    stop it. The file is written one last time when the thread stops.
+    """
+
+    def __init__(self, metrics_registry: MetricsRegistry, file_path: str,
+                 interval=10):
+        """
+        :param metrics_registry: the registry to write
+        :param file_path: path to the stats file
+        :param interval: seconds between writes
+        """
+
+        Thread.__init__(self, daemon=True)
+
+        self._registry = metrics_registry
+        self._file_path = file_path
+        self._interval = interval
+        self._shutdown_event = Event()
+
+    def shutdown(self):
+        """Stop the thread after writing the file one more time."""
+        self._shutdown_event.set()
+
+    def run(self):
+        """Write the file every interval seconds until shutdown() is called.
+
+        This method should not be called directly. Call start() instead.
+        """
+
+        while True:
+            stopping = self._shutdown_event.wait(self._interval)
+
+            try:
+                self._registry.write(self._file_path)
+            except OSError as e:
+                print('Error writing metrics to {0}:\n{1}'
+                      .format(self._file_path, e))
+
+            if stopping:
+                return
+
+
+# the registry shared by everything in the process
+registry = MetricsRegistry()
@@ -18,10 +18,53 @@
 
 
 import os
+import re
+from collections import namedtuple
+from functools import lru_cache
 
 from subprocess_commands import home_dir_from_username
 
 
+# gkeepd watches this directory in the faculty home directory for re-grade
+# requests
+REGRADE_REQUESTS_DIRNAME = '.regrade_requests'
+
+# Kinds of paths recognized by route_path()
+USER_LOG = 'user_log'
+UPDATE_FLAG = 'update_flag'
+SUBMISSION_REPO = 'submission_repo'
+FACULTY_ASSIGNMENT = 'faculty_assignment'
+
+# The same few thousand paths show up over and over again, so parsing results
+# are cached
+PATH_CACHE_SIZE = 4096
+
+# Each route matches the trailing elements of a normalized path. Routes are
+# tried in order, so the more specific routes come first.
+#
+# <username>/git-keeper-<username>.log
+# <faculty>/<class>/<assignment>.git/update_flag
+# <faculty>/<class>/<assignment>.git
+# <class>/<assignment>
+_ROUTES = (
+    (USER_LOG, re.compile(r'(?:^|/)([^/]+)/git-keeper-\1\.log$')),
+    (UPDATE_FLAG,
+     re.compile(r'(?:^|/)([^/]+)/([^/]+)/([^/]+)\.git/update_flag$')),
+    (SUBMISSION_REPO, re.compile(r'(?:^|/)([^/]+)/([^/]+)/([^/]+)\.git$')),
+    (FACULTY_ASSIGNMENT, re.compile(r'(?:^|/)([^/]+)/([^/]+)$')),
+)
+
+_ROUTES_BY_KIND = dict(_ROUTES)
+
+_REPEATED_SLASHES = re.compile(r'/{2,}')
+
+
+# The result of routing a path. Fields that do not apply to the kind of path
+# are None.
+PathInfo = namedtuple('PathInfo', ['kind', 'username', 'faculty_username',
+                                   'class_name', 'assignment_name'])
+
+
 def path_to_list(path: str) -> list:
     """Constructs a list containing each element of a path.
 
@@ -33,18 +76,63 @@ def path_to_list(path: str) -> list:
     :return: a list containing each path element
     """
 
-    elements = []
+    # empty elements come from leading, trailing, and repeated slashes
+    return [element for element in path.split('/') if element != '']
+
+
+def _normalize_path(path: str) -> str:
+    # Remove leading, trailing, and repeated slashes
+    return _REPEATED_SLASHES.sub('/', path).strip('/')
+
+
+def _build_path_info(kind: str, groups: tuple) -> PathInfo:
+    # Build a PathInfo from the groups matched by the route for kind
+
+    if kind == USER_LOG:
+        return PathInfo(kind, groups[0], None, None, None)
+    elif kind == FACULTY_ASSIGNMENT:
+        return PathInfo(kind, None, None, groups[0], groups[1])
+    else:
+        return PathInfo(kind, None, groups[0], groups[1], groups[2])
 
-    # remove any slashes from the beginning and the end of the path
-    path = path.strip('/')
 
-    # continually split the path, which splits the last element in the path
-    # from the rest
-    while path != '':
-        path, basename = os.path.split(path)
-        elements.insert(0, basename)
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def _match_route(kind: str, path: str) -> PathInfo:
+    # Match a path against a single route, returning None if it does not match
 
-    return elements
+    match = _ROUTES_BY_KIND[kind].search(_normalize_path(path))
+
+    if match is None:
+        return None
+
+    return _build_path_info(kind, match.groups())
+
+
+@lru_cache(maxsize=PATH_CACHE_SIZE)
+def route_path(path: str) -> PathInfo:
+    """Classifies a git-keeper path and extracts the information in it.
+
+    The path is matched against these forms, in order:
+
+      <username>/git-keeper-<username>.log            USER_LOG
+      <faculty>/<class>/<assignment>.git/update_flag  UPDATE_FLAG
+      <faculty>/<class>/<assignment>.git              SUBMISSION_REPO
+      <class>/<assignment>                            FACULTY_ASSIGNMENT
+
+    Results are cached, so routing a path that has been seen before is a
+    dictionary lookup.
+
+    :param path: the path to classify
+    :return: a PathInfo tuple, or None if the path matches none of the forms
+    """
+
+    for kind, _ in _ROUTES:
+        path_info = _match_route(kind, path)
+
+        if path_info is not None:
+            return path_info
+
+    return None
 
 
 def build_user_log_path(home_dir: str, username: str):
@@ -58,6 +146,28 @@ def build_user_log_path(home_dir: str, username: str):
     return os.path.join(home_dir, filename)
 
 
+def build_user_response_log_path(home_dir: str, username: str):
+    """Builds the path of the log that the server writes responses to the
+    user's requests to, which has this form:
+
+    ~<username>/git-keeper-<username>.responses.log
+    """
+
+    filename = 'git-keeper-{0}.responses.log'.format(username)
+
+    return os.path.join(home_dir, filename)
+
+
+def build_regrade_requests_path(home_dir: str):
+    """Builds the path of the directory that re-grade requests are written
+    to, which has this form:
+
+    ~<username>/.regrade_requests
+    """
+
+    return os.path.join(home_dir, REGRADE_REQUESTS_DIRNAME)
+
+
 def parse_user_log_path(path: str) -> str:
     """Extracts the username from a faculty or student log file.
 
@@ -68,20 +178,12 @@ def parse_user_log_path(path: str) -> str:
     # we're parsing a path that ends with this:
     # <username>/git-keeper-<username>.log
 
-    path_list = path_to_list(path)
+    path_info = _match_route(USER_LOG, path)
 
-    if len(path_list) < 2:
+    if path_info is None:
         return None
 
-    # the information we want is in the last 2 elements of the list
-    username, log_filename = path_list[-2:]
-
-    expected_filename = 'git-keeper-' + username + '.log'
-
-    if log_filename != expected_filename:
-        return None
-
-    return username
+    return path_info.username
 
 
 def parse_submission_repo_path(path) -> (str, str, str):
@@ -96,22 +198,13 @@ def parse_submission_repo_path(path) -> (str, str, str):
     # we're parsing a path which ends with this:
     # <faculty>/<class>/<assignment>.git
 
-    path_list = path_to_list(path)
-
-    if len(path_list) < 3:
-        return None
-
-    # the information we want is in the last 3 elements of the list
-    faculty_username, class_name, repo_name = path_list[-3:]
+    path_info = _match_route(SUBMISSION_REPO, path)
 
-    # repo name must end with .git and must be more than just .git
-    if not repo_name.endswith('.git') or repo_name == '.git':
+    if path_info is None:
         return None
 
-    # strip the last 4 characters off the repo name to get the assignment name
-    assignment_name = repo_name[:-4]
-
-    return faculty_username, class_name, assignment_name
+    return (path_info.faculty_username, path_info.class_name,
+            path_info.assignment_name)
 
 
 def parse_faculty_assignment_path(path) -> (str, str):
@@ -125,15 +218,33 @@ def parse_faculty_assignment_path(path) -> (str, str):
     # we're parsing a path that ends with this:
     # <class>/<assignment>
 
-    path_list = path_to_list(path)
+    path_info = _match_route(FACULTY_ASSIGNMENT, path)
 
-    if len(path_list) < 2:
+    if path_info is None:
         return None
 
-    # the information we want is in the last 2 elements of the list
-    class_name, assignment_name = path_list[-2:]
+    return path_info.class_name, path_info.assignment_name
+
+
+def parse_update_flag_path(path) -> (str, str, str):
+    """Extracts the faculty username, the class name, and the assignment name
+    from the path to the update_flag file in a student's submission repository.
+
+    :param path: path to the update_flag file
+    :return: a tuple containing the faculty username, the class name, and the
+             assignment name, or None if the path is malformed
+    """
+
+    # we're parsing a path which ends with this:
+    # <faculty>/<class>/<assignment>.git/update_flag
+
+    path_info = _match_route(UPDATE_FLAG, path)
+
+    if path_info is None:
+        return None
 
-    return class_name, assignment_name
+    return (path_info.faculty_username, path_info.class_name,
+            path_info.assignment_name)
 
 
 def get_log_path_from_username(username: str) -> str:
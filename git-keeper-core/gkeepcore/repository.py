@@ -18,8 +18,10 @@ import sys
 
 from subprocess_commands import scp_file, git_remote_add, git_push_explicit_url,\
     git_init, git_init_bare, git_add_all, git_commit, git_clone, git_push,\
-    copy_directory_contents, directory_exists, create_directory, run_command,\
-    CommandError
+    git_pull, git_fetch, git_reset_hard, git_status_porcelain, git_head_hash,\
+    git_list_refs, git_add_alternate, git_repack, copy_directory_contents,\
+    directory_exists, create_directory, CommandError
+from git_refs import read_head_hash, list_refs, find_git_dir
 
 
 def copy_and_create_repo(source, dest, assignment,
@@ -68,6 +70,11 @@ class Repository:
         return '{0}@{1}:{2}'.format(self.remote_user, self.remote_host,
                                     self.path)
 
+    @property
+    def objects_path(self):
+        assert self.is_bare
+        return os.path.join(self.path, 'objects')
+
     def get_update_flag_path(self):
         return os.path.join(self.path, 'update_flag')
 
@@ -81,52 +88,57 @@ class Repository:
                      hook_dir)
 
     def set_remote(self, remote_repo, remote_name='origin'):
-        cwd = os.getcwd()
-        os.chdir(self.path)
-        try:
-            git_remote_add(remote_name, remote_repo.url)
-        except CommandError as e:
-            os.chdir(cwd)
-            raise e
-
-        os.chdir(cwd)
+        git_remote_add(self.path, remote_name, remote_repo.url)
 
     def add_all_and_commit(self, commit_message):
         assert (self.is_local and not self.is_bare)
-        cwd = os.getcwd()
-        os.chdir(self.path)
-        try:
-            git_add_all()
-            git_commit(commit_message)
-        finally:
-            os.chdir(cwd)
+        git_add_all(self.path)
+        git_commit(self.path, commit_message)
 
     def push(self, remote_repo=None, branch='master', force=False):
         assert self.is_local
-        cwd = os.getcwd()
-        os.chdir(self.path)
-        try:
-            if remote_repo is None:
-                git_push()
-            else:
-                git_push_explicit_url(remote_repo.url, branch, force)
-        finally:
-            os.chdir(cwd)
+        if remote_repo is None:
+            git_push(self.path)
+        else:
+            git_push_explicit_url(self.path, remote_repo.url, branch, force)
 
     def pull(self):
         assert self.is_local
         assert not self.is_bare
 
-        cwd = os.getcwd()
-        os.chdir(self.path)
         try:
-            run_command(['git', 'pull'])
+            git_pull(self.path)
         except CommandError as e:
             print('Error pulling in {0}:\n{1}'.format(self.path, e))
-        os.chdir(cwd)
+
+    def add_alternate(self, object_store_repo):
+        # Borrow objects from another bare repository on the same machine
+        # rather than storing copies of them. The other repository's objects
+        # must never be pruned.
+        assert self.is_bare
+        git_add_alternate(self.path, object_store_repo.objects_path,
+                          self.remote_user, self.remote_host, self.ssh)
+
+    def repack(self, local_only=False):
+        git_repack(self.path, local_only, self.remote_user, self.remote_host,
+                   self.ssh)
+
+    def fetch_and_reset(self, remote_name='origin', branch='master'):
+        # discards any local changes and commits that are not on the remote
+        assert self.is_local
+        assert not self.is_bare
+        git_fetch(self.path, remote_name)
+        git_reset_hard(self.path, '{0}/{1}'.format(remote_name, branch))
+
+    def has_changes(self):
+        assert self.is_local
+        assert not self.is_bare
+        return git_status_porcelain(self.path).strip() != ''
 
     def is_initialized(self):
         assert not self.is_bare
+        if self.is_local:
+            return find_git_dir(self.path) is not None
         return directory_exists(os.path.join(self.path, '.git'),
                                 self.remote_user, self.remote_host, self.ssh)
 
@@ -167,25 +179,32 @@ class Repository:
         git_clone(remote_repo.url, self.path)
 
     def get_head_hash(self):
-        head_hash = ''
+        # local repositories are read directly, falling back to git
         if self.is_local:
-            current_dir = os.getcwd()
-            os.chdir(self.path)
-            try:
-                head_hash = run_command(['git', 'rev-parse', 'HEAD']).rstrip()
-            except CommandError as e:
-                print('Error getting commit hash for {0}:\n{1}'
-                      .format(self.path, e), file=sys.stderr)
-            os.chdir(current_dir)
-        else:
-            command = 'cd {0}; git rev-parse HEAD'.format(self.path)
-            try:
-                head_hash = run_command(command, remote_user=self.remote_user,
-                                        remote_host=self.remote_host,
-                                        ssh=self.ssh)
-                head_hash = head_hash.rstrip()
-            except CommandError as e:
-                print('Error getting commit hash for {0}:\n{1}'
-                      .format(self.path, e), file=sys.stderr)
+            head_hash = read_head_hash(self.path, self.is_bare)
+            if head_hash is not None:
+                return head_hash
+
+        head_hash = ''
+        try:
+            if self.is_local:
+                head_hash = git_head_hash(self.path)
+            else:
+                head_hash = git_head_hash(self.path, self.remote_user,
+                                          self.remote_host, self.ssh)
+        except CommandError as e:
+            print('Error getting commit hash for {0}:\n{1}'
+                  .format(self.path, e), file=sys.stderr)
 
         return head_hash
+
+    def get_refs(self):
+        refs = None
+        if self.is_local:
+            refs = list_refs(self.path, self.is_bare)
+
+        if refs is None:
+            refs = git_list_refs(self.path, self.remote_user, self.remote_host,
+                                self.ssh)
+
+        return refs
@@ -0,0 +1,148 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides the format of requests that clients make to the server through
+the event logs, and of the server's responses.
+
+A client makes a request by logging a REQUEST event in the user's own log.
+The payload holds a request ID, the request type, and the request's
+arguments as a JSON object:
+
+    <timestamp> REQUEST <request ID> <request type> <arguments>
+
+Once the server has handled the request it logs a RESPONSE event in the
+user's response log (see path_utils.build_user_response_log_path()). The
+payload holds the request ID, a status of OK or ERROR, and a message as a
+JSON string so that it stays on one line:
+
+    <timestamp> RESPONSE <request ID> <status> <message>
+
+The client tails the response log and waits for the line with its request
+ID.
+"""
+
+
+import json
+import os
+import re
+
+
+REQUEST_EVENT_TYPE = 'REQUEST'
+RESPONSE_EVENT_TYPE = 'RESPONSE'
+
+# response statuses
+OK = 'OK'
+ERROR = 'ERROR'
+
+_REQUEST_PAYLOAD = re.compile(r'(\w+) (\w+) (\{.*\})$')
+_RESPONSE_LINE = re.compile(r'\d+ {0} (\w+) ({1}|{2}) (".*")$'
+                            .format(RESPONSE_EVENT_TYPE, OK, ERROR))
+
+
+class RequestLogException(Exception):
+    pass
+
+
+def new_request_id() -> str:
+    """
+    Create a new random request ID.
+
+    :return: the request ID as 16 hex digits
+    """
+
+    return os.urandom(8).hex()
+
+
+def format_request_payload(request_id: str, request_type: str,
+                           arguments: dict) -> str:
+    """
+    Build the payload of a REQUEST event.
+
+    :param request_id: ID from new_request_id()
+    :param request_type: type of the request, which selects the server's
+     handler
+    :param arguments: arguments for the handler, which must be serializable
+     as JSON
+    :return: the payload
+    """
+
+    return '{0} {1} {2}'.format(request_id, request_type,
+                                json.dumps(arguments, sort_keys=True))
+
+
+def parse_request_payload(payload: str) -> tuple:
+    """
+    Parse the payload of a REQUEST event.
+
+    Raises RequestLogException if the payload is malformed.
+
+    :param payload: the payload from the log
+    :return: a tuple containing the request ID, the request type, and the
+     arguments dictionary
+    """
+
+    match = _REQUEST_PAYLOAD.match(payload)
+
+    if match is None:
+        raise RequestLogException('Malformed request: {0}'.format(payload))
+
+    request_id, request_type, arguments = match.groups()
+
+    try:
+        arguments = json.loads(arguments)
+    except ValueError:
+        raise RequestLogException('Malformed request arguments: {0}'
+                                  .format(payload))
+
+    return request_id, request_type, arguments
+
+
+def format_response_payload(request_id: str, status: str,
+                            message: str) -> str:
+    """
+    Build the payload of a RESPONSE event.
+
+    :param request_id: ID of the request being responded to
+    :param status: OK or ERROR
+    :param message: message for the user, which may span several lines
+    :return: the payload
+    """
+
+    return '{0} {1} {2}'.format(request_id, status, json.dumps(message))
+
+
+def parse_response_line(line: str) -> tuple:
+    """
+    Parse a line of a response log.
+
+    :param line: the line from the log
+    :return: a tuple containing the request ID, the status, and the message,
+     or None if the line is not a response
+    """
+
+    match = _RESPONSE_LINE.match(line)
+
+    if match is None:
+        return None
+
+    request_id, status, message = match.groups()
+
+    try:
+        message = json.loads(message)
+    except ValueError:
+        return None
+
+    return request_id, status, message
@@ -0,0 +1,221 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides an in-memory index of students across classes.
+
+A student may be a member of any number of classes. Each student is stored
+once and can be looked up in constant time by username, by email address, or
+by class name and username. Iterating over the students in a class is
+iteration over a plain list.
+"""
+
+
+class RosterException(Exception):
+    pass
+
+
+class Roster:
+    """Index of the students in every class.
+
+    Students are stored by reference, so any object with username and
+    email_address attributes may be added. The same object is shared by all
+    of the classes that a student is a member of.
+
+    The students_by_class and students_by_username properties expose the
+    underlying dictionaries for iteration and lookups. They must not be
+    modified directly, use add() and remove() instead.
+    """
+
+    __slots__ = ('_students_by_class', '_students_by_username',
+                 '_students_by_email', '_class_names_by_username',
+                 '_members')
+
+    def __init__(self):
+        # class name -> list of students, in the order they were added
+        self._students_by_class = {}
+
+        # username -> student
+        self._students_by_username = {}
+
+        # email address -> student
+        self._students_by_email = {}
+
+        # username -> set of class names
+        self._class_names_by_username = {}
+
+        # set of (class name, username) memberships
+        self._members = set()
+
+    @property
+    def students_by_class(self) -> dict:
+        """Dictionary mapping class names to lists of students"""
+        return self._students_by_class
+
+    @property
+    def students_by_username(self) -> dict:
+        """Dictionary mapping usernames to students"""
+        return self._students_by_username
+
+    def add_class(self, class_name: str):
+        """Add a class with no students. Does nothing if the class exists.
+
+        :param class_name: name of the class
+        """
+
+        if class_name not in self._students_by_class:
+            self._students_by_class[class_name] = []
+
+    def add(self, class_name: str, student):
+        """Add a student to a class, creating the class if needed.
+
+        If a student with the same username is already in the roster, that
+        student must have the same email address and the existing object is
+        used for the new membership.
+
+        Raises RosterException if the username belongs to a student with a
+        different email address, or if the student is already in the class.
+
+        :param class_name: name of the class
+        :param student: the student to add
+        :return: the student object stored in the roster
+        """
+
+        username = student.username
+
+        if (class_name, username) in self._members:
+            raise RosterException('{0} is already in {1}'
+                                  .format(username, class_name))
+
+        existing = self._students_by_username.get(username)
+
+        if existing is None:
+            if student.email_address in self._students_by_email:
+                raise RosterException('{0} is used by more than one username'
+                                      .format(student.email_address))
+
+            self._students_by_username[username] = student
+            self._students_by_email[student.email_address] = student
+            self._class_names_by_username[username] = set()
+        elif existing.email_address != student.email_address:
+            raise RosterException('{0} has two email addresses: {1} and {2}'
+                                  .format(username, existing.email_address,
+                                          student.email_address))
+        else:
+            student = existing
+
+        self.add_class(class_name)
+        self._students_by_class[class_name].append(student)
+        self._class_names_by_username[username].add(class_name)
+        self._members.add((class_name, username))
+
+        return student
+
+    def remove(self, class_name: str, username: str):
+        """Remove a student from a class.
+
+        The student is removed from the roster entirely once they are not a
+        member of any class.
+
+        Raises RosterException if the student is not in the class.
+
+        :param class_name: name of the class
+        :param username: username of the student
+        """
+
+        if (class_name, username) not in self._members:
+            raise RosterException('{0} is not in {1}'.format(username,
+                                                             class_name))
+
+        self._members.remove((class_name, username))
+
+        students = self._students_by_class[class_name]
+        self._students_by_class[class_name] = \
+            [student for student in students if student.username != username]
+
+        class_names = self._class_names_by_username[username]
+        class_names.remove(class_name)
+
+        if len(class_names) == 0:
+            student = self._students_by_username.pop(username)
+            del self._students_by_email[student.email_address]
+            del self._class_names_by_username[username]
+
+    def get_student(self, username: str):
+        """Look up a student by username.
+
+        :param username: username of the student
+        :return: the student, or None if there is no such student
+        """
+
+        return self._students_by_username.get(username)
+
+    def get_student_by_email(self, email_address: str):
+        """Look up a student by email address.
+
+        :param email_address: email address of the student
+        :return: the student, or None if there is no such student
+        """
+
+        return self._students_by_email.get(email_address)
+
+    def get_class_student(self, class_name: str, username: str):
+        """Look up a student who is a member of a particular class.
+
+        :param class_name: name of the class
+        :param username: username of the student
+        :return: the student, or None if the student is not in the class
+        """
+
+        if (class_name, username) not in self._members:
+            return None
+
+        return self._students_by_username[username]
+
+    def is_member(self, class_name: str, username: str) -> bool:
+        """Determine if a student is a member of a class.
+
+        :param class_name: name of the class
+        :param username: username of the student
+        :return: True if the student is in the class, False otherwise
+        """
+
+        return (class_name, username) in self._members
+
+    def get_class_names(self, username: str) -> set:
+        """Get the names of all the classes that a student is a member of.
+
+        :param username: username of the student
+        :return: set of class names, empty if there is no such student
+        """
+
+        return set(self._class_names_by_username.get(username, ()))
+
+    def get_students(self, class_name: str) -> list:
+        """Get the students in a class.
+
+        The returned list must not be modified.
+
+        :param class_name: name of the class
+        :return: list of students, empty if there is no such class
+        """
+
+        return self._students_by_class.get(class_name, [])
+
+    def __contains__(self, username):
+        return username in self._students_by_username
+
+    def __len__(self):
+        return len(self._students_by_username)
@@ -25,7 +25,11 @@ class StudentException(Exception):
 
 
 class Student:
-    def __init__(self, last_name, first_name, email_address, ssh=None):
+    __slots__ = ('first_name', 'last_name', 'email_address', 'ssh',
+                 'username', 'home_dir')
+
+    def __init__(self, last_name, first_name, email_address, ssh=None,
+                 home_dir=None):
         self.first_name = first_name
         self.last_name = last_name
         self.email_address = email_address
@@ -40,7 +44,12 @@ class Student:
 
         self.username = split_email[0]
 
-        self.home_dir = home_dir_from_username(self.username, ssh=self.ssh)
+        # the home directory may be given for students who are not users on
+        # this machine, such as synthetic students in benchmarks
+        if home_dir is None:
+            home_dir = home_dir_from_username(self.username, ssh=self.ssh)
+
+        self.home_dir = home_dir
 
     def __repr__(self):
         return '{0} {1} ({2})'.format(self.first_name, self.last_name,
@@ -104,8 +104,12 @@ def scp_directory(local_path, remote_user, remote_host, remote_path):
     run_command(cmd)
 
 
-def git_remote_add(remote_name, url):
-    cmd = ['git', 'remote', 'add', remote_name, url]
+# The git helpers take the repository path and pass it to git with -C rather
+# than relying on the current working directory, which is shared by every
+# thread in the process.
+
+def git_remote_add(repo_path, remote_name, url):
+    cmd = ['git', '-C', repo_path, 'remote', 'add', remote_name, url]
     run_command(cmd)
 
 
@@ -148,13 +152,13 @@ def git_init_bare(repo_path, remote_user=None, remote_host=None, ssh=None):
     run_command(cmd, remote_user, remote_host, ssh)
 
 
-def git_add_all():
-    cmd = ['git', 'add', '-A']
+def git_add_all(repo_path):
+    cmd = ['git', '-C', repo_path, 'add', '-A']
     run_command(cmd)
 
 
-def git_commit(message):
-    cmd = ['git', 'commit', '-am', message]
+def git_commit(repo_path, message):
+    cmd = ['git', '-C', repo_path, 'commit', '-am', message]
     run_command(cmd)
 
 
@@ -164,19 +168,117 @@ def chmod_world_writable_recursive(remote_path, remote_user=None,
     run_command(cmd, remote_user, remote_host, ssh)
 
 
-def git_push():
-    cmd = ['git', 'push']
+def chmod_world_readable_recursive(remote_path, remote_user=None,
+                                   remote_host=None, ssh=None):
+    cmd = ['chmod', '-R', 'o+rX', remote_path]
+    run_command(cmd, remote_user, remote_host, ssh)
+
+
+def world_traversable(path, remote_user=None, remote_host=None, ssh=None):
+    # True if other users may search every directory from / down to path,
+    # which they need in order to open anything below path
+    path = os.path.abspath(path)
+    directories = [path]
+
+    while directories[-1] != '/':
+        directories.append(os.path.dirname(directories[-1]))
+
+    if (remote_user is not None and remote_host is not None) or ssh is not None:
+        # prints each directory which others cannot search
+        cmd = (['find'] + [shlex.quote(d) for d in directories] +
+               ['-maxdepth', '0', '!', '-perm', '-o=x'])
+
+        try:
+            output = run_command(cmd, remote_user, remote_host, ssh)
+        except CommandError:
+            return False
+
+        return output.strip() == ''
+    else:
+        try:
+            return all(os.stat(d).st_mode & 0o001 for d in directories)
+        except OSError:
+            return False
+
+
+def git_push(repo_path):
+    cmd = ['git', '-C', repo_path, 'push']
     run_command(cmd)
 
 
-def git_push_explicit_url(url, branch, force):
+def git_push_explicit_url(repo_path, url, branch, force):
     if force:
-        cmd = ['git', 'push', '-f', url, branch]
+        cmd = ['git', '-C', repo_path, 'push', '-f', url, branch]
     else:
-        cmd = ['git', 'push', url, branch]
+        cmd = ['git', '-C', repo_path, 'push', url, branch]
+    run_command(cmd)
+
+
+def git_pull(repo_path):
+    cmd = ['git', '-C', repo_path, 'pull']
+    run_command(cmd)
+
+
+def git_fetch(repo_path, remote_name='origin'):
+    cmd = ['git', '-C', repo_path, 'fetch', remote_name]
+    run_command(cmd)
+
+
+def git_reset_hard(repo_path, ref):
+    cmd = ['git', '-C', repo_path, 'reset', '--hard', ref]
     run_command(cmd)
 
 
+def git_status_porcelain(repo_path):
+    cmd = ['git', '-C', repo_path, 'status', '--porcelain']
+    return run_command(cmd)
+
+
+def git_add_alternate(repo_path, objects_path, remote_user=None,
+                      remote_host=None, ssh=None):
+    # objects_path is an absolute path to the objects directory of another
+    # repository, whose objects repo_path may then use as its own
+    alternates_path = os.path.join(repo_path, 'objects', 'info',
+                                   'alternates')
+    cmd = 'echo {0} >> {1}'.format(shlex.quote(objects_path),
+                                   shlex.quote(alternates_path))
+
+    if (remote_user is not None and remote_host is not None) or ssh is not None:
+        run_command([cmd], remote_user, remote_host, ssh)
+    else:
+        run_command(cmd)
+
+
+def git_repack(repo_path, local_only=False, remote_user=None,
+               remote_host=None, ssh=None):
+    # with local_only, objects which are available from alternates are left
+    # out of the pack, and removed from repo_path if they were copied there
+    if local_only:
+        cmd = ['git', '-C', repo_path, 'repack', '-a', '-d', '-l', '-q']
+    else:
+        cmd = ['git', '-C', repo_path, 'repack', '-a', '-d', '-q']
+    run_command(cmd, remote_user, remote_host, ssh)
+
+
+def git_head_hash(repo_path, remote_user=None, remote_host=None, ssh=None):
+    cmd = ['git', '-C', repo_path, 'rev-parse', 'HEAD']
+    return run_command(cmd, remote_user, remote_host, ssh).rstrip()
+
+
+def git_list_refs(repo_path, remote_user=None, remote_host=None, ssh=None):
+    # unlike show-ref, for-each-ref succeeds when there are no refs
+    cmd = ['git', '-C', repo_path, 'for-each-ref']
+    output = run_command(cmd, remote_user, remote_host, ssh)
+
+    # each line is <hash> SP <type> TAB <ref name>
+    refs = {}
+    for line in output.splitlines():
+        object_info, ref_name = line.split('\t', 1)
+        refs[ref_name] = object_info.split()[0]
+
+    return refs
+
+
 def git_clone(source_path, dest_path, remote_user=None, remote_host=None,
               ssh=None, local_to_remote=False):
     if local_to_remote:
@@ -193,12 +295,6 @@ def touch(path, remote_user=None, remote_host=None, ssh=None):
     run_command(cmd, remote_user, remote_host, ssh)
 
 
-def call_action(*args):
-    cmd = ['bash']
-    cmd.extend(args)
-    return run_command(cmd)
-
-
 def user_exists(username, remote_user=None, remote_host=None, ssh=None):
     tilde_home_dir = '~{0}'.format(username)
 
@@ -0,0 +1,357 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides tracing of a single submission's path through the server.
+
+A trace ID is created when a submission is first seen, and is passed along
+with the submission to everything that handles it. Each step records a span
+with its start time and duration in a trace log, so when a student reports a
+missing email the log shows where the time went.
+
+The trace log has one span per line:
+
+    <trace ID> <start time> <duration> <span name> <attributes>
+
+Times are in seconds, and the start time is seconds from the epoch. The
+attributes are a JSON object.
+
+This module stores a Tracer instance in the module-level variable named
+tracer. Spans are only written once open() has been called on it, so code
+may record spans whether or not tracing is enabled.
+
+Example usage:
+
+    from gkeepcore.tracing import tracer, new_trace_id
+
+    tracer.open('/path/to/trace.log')
+
+    trace_id = new_trace_id()
+
+    with tracer.span(trace_id, 'clone', repo=repo_path):
+        # clone the repository
+
+This module can also be run to show the traces in a log:
+
+    python3 -m gkeepcore.tracing <trace log> [<trace ID or username>]
+
+Without a trace ID the most recent traces are listed. With a trace ID or a
+username the spans of the matching traces are drawn as a waterfall.
+"""
+
+
+import json
+import os
+import sys
+from collections import OrderedDict
+from threading import Lock
+from time import time
+
+
+# length of the bars in a waterfall, in characters
+WATERFALL_WIDTH = 50
+
+# number of traces listed when no trace is chosen
+LIST_TRACE_COUNT = 20
+
+
+class TracingException(Exception):
+    pass
+
+
+def new_trace_id() -> str:
+    """
+    Create a new random trace ID.
+
+    :return: the trace ID as 16 hex digits
+    """
+
+    return os.urandom(8).hex()
+
+
+class SpanRecord:
+    """A span read from a trace log.
+
+    Attributes:
+        trace_id - ID of the trace the span belongs to
+        start_time - time the span started, in seconds since the epoch
+        duration - length of the span in seconds
+        name - name of the span
+        attributes - dictionary of extra information about the span
+    """
+
+    def __init__(self, trace_id, start_time, duration, name, attributes):
+        self.trace_id = trace_id
+        self.start_time = start_time
+        self.duration = duration
+        self.name = name
+        self.attributes = attributes
+
+    @property
+    def end_time(self):
+        """Time the span ended, in seconds since the epoch"""
+        return self.start_time + self.duration
+
+    def to_line(self) -> str:
+        """Format the span as a line of the trace log."""
+
+        attributes = json.dumps(self.attributes, separators=(',', ':'),
+                                sort_keys=True)
+
+        return '{0} {1:.3f} {2:.3f} {3} {4}'.format(self.trace_id,
+                                                    self.start_time,
+                                                    self.duration, self.name,
+                                                    attributes)
+
+    @classmethod
+    def from_line(cls, line: str):
+        """
+        Parse a line of the trace log.
+
+        Raises TracingException if the line is not a span.
+
+        :param line: the line to parse
+        :return: a new SpanRecord
+        """
+
+        fields = line.rstrip('\n').split(' ', 4)
+
+        if len(fields) != 5:
+            raise TracingException('Not a span: {0}'.format(line))
+
+        trace_id, start_time, duration, name, attributes = fields
+
+        try:
+            return cls(trace_id, float(start_time), float(duration), name,
+                       json.loads(attributes))
+        except ValueError:
+            raise TracingException('Not a span: {0}'.format(line))
+
+
+class Tracer:
+    """Writes spans to a trace log. Safe to use from any thread."""
+
+    def __init__(self):
+        self._file = None
+        self._lock = Lock()
+
+    def open(self, log_path: str):
+        """
+        Start writing spans to a trace log. Spans are appended if the log
+        already exists.
+
+        :param log_path: path to the trace log
+        """
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+            self._file = open(log_path, 'a', buffering=1)
+
+    def close(self):
+        """Stop writing spans."""
+
+        with self._lock:
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def span(self, trace_id, name: str, **attributes):
+        """
+        Record a span around a block of code.
+
+        Usage:
+
+            with tracer.span(trace_id, 'action', exit_code=None) as span:
+                # do something
+                span.attributes['exit_code'] = exit_code
+
+        If the block raises an exception its type is recorded as the error
+        attribute.
+
+        :param trace_id: ID of the trace, or None to record nothing
+        :param name: name of the span, which must not contain spaces
+        :param attributes: extra information to store with the span
+        :return: a context manager
+        """
+
+        return _Span(self, trace_id, name, attributes)
+
+    def record(self, trace_id, name: str, start_time, end_time,
+               **attributes):
+        """
+        Record a span that has already finished.
+
+        :param trace_id: ID of the trace, or None to record nothing
+        :param name: name of the span, which must not contain spaces
+        :param start_time: time the span started, in seconds since the epoch
+        :param end_time: time the span ended, in seconds since the epoch
+        :param attributes: extra information to store with the span
+        """
+
+        if trace_id is None or self._file is None:
+            return
+
+        line = SpanRecord(trace_id, start_time, max(end_time - start_time, 0),
+                          name, attributes).to_line()
+
+        with self._lock:
+            if self._file is not None:
+                try:
+                    self._file.write(line + '\n')
+                except OSError as e:
+                    print('Error writing trace log:', e, file=sys.stderr)
+
+
+class _Span:
+    # Context manager returned by Tracer.span()
+
+    def __init__(self, span_tracer: Tracer, trace_id, name, attributes):
+        self.attributes = attributes
+
+        self._tracer = span_tracer
+        self._trace_id = trace_id
+        self._name = name
+        self._start_time = None
+
+    def __enter__(self):
+        self._start_time = time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is not None:
+            self.attributes['error'] = exc_type.__name__
+
+        self._tracer.record(self._trace_id, self._name, self._start_time,
+                            time(), **self.attributes)
+        return False
+
+
+# the tracer shared by everything in the process
+tracer = Tracer()
+
+
+def read_trace_log(log_path: str) -> OrderedDict:
+    """
+    Read every span in a trace log. Lines which are not spans are skipped.
+
+    :param log_path: path to the trace log
+    :return: OrderedDict mapping trace IDs to lists of SpanRecord objects,
+     in the order the traces first appear in the log
+    """
+
+    spans_by_trace = OrderedDict()
+
+    with open(log_path) as f:
+        for line in f:
+            try:
+                span = SpanRecord.from_line(line)
+            except TracingException:
+                continue
+
+            spans_by_trace.setdefault(span.trace_id, []).append(span)
+
+    return spans_by_trace
+
+
+def render_waterfall(spans: list, width=WATERFALL_WIDTH) -> str:
+    """
+    Draw the spans of a trace as a waterfall, one line per span in order of
+    start time.
+
+    :param spans: the SpanRecord objects of a single trace
+    :param width: length of the longest possible bar in characters
+    :return: the waterfall as a string
+    """
+
+    if len(spans) == 0:
+        return ''
+
+    spans = sorted(spans, key=lambda span: span.start_time)
+
+    trace_start = spans[0].start_time
+    trace_end = max(span.end_time for span in spans)
+    total = max(trace_end - trace_start, 0.001)
+
+    name_width = max(len(span.name) for span in spans)
+
+    lines = ['trace {0}, {1:.3f}s total'.format(spans[0].trace_id,
+                                                trace_end - trace_start)]
+
+    for span in spans:
+        offset = int((span.start_time - trace_start) / total * width)
+        length = max(int(round(span.duration / total * width)), 1)
+        length = min(length, width - offset) if offset < width else 1
+        bar = ' ' * offset + '#' * length
+
+        lines.append('{0:<{1}} |{2:<{3}}| +{4:.3f}s {5:.3f}s'
+                     .format(span.name, name_width, bar, width,
+                             span.start_time - trace_start, span.duration))
+
+    return '\n'.join(lines)
+
+
+def _describe_trace(spans: list) -> str:
+    # one line summary used when listing traces
+
+    start_time = min(span.start_time for span in spans)
+    end_time = max(span.end_time for span in spans)
+
+    attributes = {}
+    for span in spans:
+        attributes.update(span.attributes)
+
+    details = ' '.join('{0}={1}'.format(key, attributes[key])
+                       for key in ('class', 'assignment', 'student')
+                       if key in attributes)
+
+    return '{0} {1:.3f}s {2}'.format(spans[0].trace_id, end_time - start_time,
+                                     details)
+
+
+def _matches(spans: list, trace_id_or_username: str) -> bool:
+    if spans[0].trace_id == trace_id_or_username:
+        return True
+
+    return any(span.attributes.get('student') == trace_id_or_username
+               for span in spans)
+
+
+def main():
+    if len(sys.argv) not in (2, 3):
+        sys.exit('Usage: {0} <trace log> [<trace ID or username>]'
+                 .format(sys.argv[0]))
+
+    try:
+        spans_by_trace = read_trace_log(sys.argv[1])
+    except OSError as e:
+        sys.exit('Error reading {0}:\n{1}'.format(sys.argv[1], e))
+
+    if len(sys.argv) == 2:
+        for spans in list(spans_by_trace.values())[-LIST_TRACE_COUNT:]:
+            print(_describe_trace(spans))
+        return
+
+    matching = [spans for spans in spans_by_trace.values()
+                if _matches(spans, sys.argv[2])]
+
+    if len(matching) == 0:
+        sys.exit('No traces match {0}'.format(sys.argv[2]))
+
+    print('\n\n'.join(render_waterfall(spans) for spans in matching))
+
+
+if __name__ == '__main__':
+    main()
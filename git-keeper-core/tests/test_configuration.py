@@ -0,0 +1,48 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for reading student CSV files in gkeepcore.configuration."""
+
+
+from pytest import raises
+
+from gkeepcore.configuration import GraderConfiguration, ConfigurationError
+
+
+def create_config():
+    # the student CSV files are read without a configuration directory
+    config = GraderConfiguration.__new__(GraderConfiguration)
+    config.ssh = None
+    return config
+
+
+def test_read_students_csv(tmpdir):
+    csv_path = tmpdir.join('cs1.csv')
+    csv_path.write('Doe,Alice,alice@school.edu\nRoe,Bob,bob@school.edu\n')
+
+    students = create_config()._read_students_csv(str(csv_path))
+
+    assert ['alice', 'bob'] == [student.username for student in students]
+
+
+def test_invalid_email_address(tmpdir):
+    csv_path = tmpdir.join('cs1.csv')
+    csv_path.write('Doe,Alice,alice@school.edu\nRoe,Bob,bob.school.edu\n')
+
+    with raises(ConfigurationError) as e:
+        create_config()._read_students_csv(str(csv_path))
+
+    assert 'bob.school.edu' in str(e.value)
@@ -0,0 +1,102 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepcore.event_journal."""
+
+
+import os
+
+from pytest import raises
+
+from gkeepcore.event_journal import EventJournal, EventJournalException, \
+    encode_record, decode_records
+
+
+def test_record_round_trip():
+    data = encode_record(100, 'alice', 'SUBMISSION', '/home/alice/repo.git')
+    data += encode_record(101, 'bob', 'UPLOAD', 'payload with ünicode')
+
+    records, used = decode_records(data, base_offset=10)
+
+    assert len(data) == used
+    assert [(10, 100, 'alice', 'SUBMISSION', '/home/alice/repo.git'),
+            (records[1].offset, 101, 'bob', 'UPLOAD',
+             'payload with ünicode')] == [tuple(r) for r in records]
+    assert 10 < records[1].offset
+
+
+def test_incomplete_record():
+    data = encode_record(100, 'alice', 'SUBMISSION', 'payload')
+    complete = encode_record(99, 'bob', 'SUBMISSION', 'payload')
+
+    records, used = decode_records(complete + data[:-1])
+
+    assert 1 == len(records)
+    assert len(complete) == used
+
+
+def test_corrupt_record():
+    data = bytearray(encode_record(100, 'alice', 'SUBMISSION', 'payload'))
+    data[-1] ^= 0xff
+
+    with raises(EventJournalException):
+        decode_records(bytes(data))
+
+
+def test_journal(tmpdir):
+    journal_path = str(tmpdir.join('events.journal'))
+
+    journal = EventJournal(journal_path)
+
+    journal.append(100, 'alice', 'SUBMISSION', 'first')
+    journal.append_many([(101, 'bob', 'SUBMISSION', 'second'),
+                         (102, 'alice', 'UPLOAD', 'third')])
+
+    assert ['first', 'second', 'third'] == \
+        [record.payload for record in journal.records()]
+
+    assert ['first', 'third'] == \
+        [record.payload for record in journal.query(username='alice')]
+    assert ['first', 'second'] == \
+        [record.payload for record in journal.query(event_type='SUBMISSION')]
+    assert ['third'] == \
+        [record.payload for record in journal.query('alice', 'UPLOAD')]
+    assert ['second', 'third'] == \
+        [record.payload for record in journal.query(since=101)]
+
+    # events appended by another writer are picked up by the index
+    other_journal = EventJournal(journal_path)
+    other_journal.append(103, 'alice', 'SUBMISSION', 'fourth')
+    other_journal.close()
+
+    assert ['first', 'third', 'fourth'] == \
+        [record.payload for record in journal.query(username='alice')]
+
+    # a record that is still being written is left for the next read
+    partial = encode_record(104, 'alice', 'SUBMISSION', 'fifth')
+    with open(journal_path, 'ab') as f:
+        f.write(partial[:5])
+
+    assert 3 == len(journal.query(username='alice'))
+
+    with open(journal_path, 'ab') as f:
+        f.write(partial[5:])
+
+    assert 'fifth' == journal.query(username='alice')[-1].payload
+
+    journal.close()
+
+    assert 0o600 == os.stat(journal_path).st_mode & 0o777
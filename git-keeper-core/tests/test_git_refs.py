@@ -0,0 +1,86 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepcore.git_refs."""
+
+
+from subprocess import check_call, check_output
+
+from gkeepcore.git_refs import read_head_hash, list_refs
+
+
+def git(repo_path, *args):
+    command = ['git', '-C', repo_path, '-c', 'user.name=test',
+               '-c', 'user.email=test@test'] + list(args)
+    return check_output(command).decode('utf-8').strip()
+
+
+def make_repo(tmpdir):
+    repo_path = str(tmpdir.join('repo'))
+    check_call(['git', 'init', '-q', repo_path])
+    tmpdir.join('repo', 'file.txt').write('contents')
+    git(repo_path, 'add', '-A')
+    git(repo_path, 'commit', '-q', '-m', 'first')
+    return repo_path
+
+
+def test_read_head_hash(tmpdir):
+    repo_path = make_repo(tmpdir)
+
+    assert git(repo_path, 'rev-parse', 'HEAD') == read_head_hash(repo_path)
+
+    # packed refs are found as well
+    git(repo_path, 'pack-refs', '--all')
+    assert git(repo_path, 'rev-parse', 'HEAD') == read_head_hash(repo_path)
+
+    # a detached HEAD holds the hash itself
+    git(repo_path, 'checkout', '-q', '--detach')
+    assert git(repo_path, 'rev-parse', 'HEAD') == read_head_hash(repo_path)
+
+
+def test_read_head_hash_bare(tmpdir):
+    repo_path = make_repo(tmpdir)
+    bare_path = str(tmpdir.join('bare'))
+    check_call(['git', 'clone', '-q', '--bare', repo_path, bare_path])
+
+    assert (git(repo_path, 'rev-parse', 'HEAD') ==
+            read_head_hash(bare_path, is_bare=True))
+
+
+def test_unresolvable(tmpdir):
+    # not a repository
+    assert read_head_hash(str(tmpdir)) is None
+    assert list_refs(str(tmpdir)) is None
+
+    # no commits yet, so HEAD points to a branch that does not exist
+    repo_path = str(tmpdir.join('empty'))
+    check_call(['git', 'init', '-q', repo_path])
+    assert read_head_hash(repo_path) is None
+    assert {} == list_refs(repo_path)
+
+
+def test_list_refs(tmpdir):
+    repo_path = make_repo(tmpdir)
+    git(repo_path, 'tag', '-a', '-m', 'tag', 'v1')
+    git(repo_path, 'pack-refs', '--all')
+    git(repo_path, 'branch', 'loose')
+
+    expected = {}
+    for line in git(repo_path, 'show-ref').splitlines():
+        ref_hash, ref_name = line.split()
+        expected[ref_name] = ref_hash
+
+    assert expected == list_refs(repo_path)
@@ -0,0 +1,50 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepcore.log_file."""
+
+
+from gkeepcore.log_file import LogFileWriter
+
+
+class ListLogFileWriter(LogFileWriter):
+    def __init__(self):
+        self.appends = []
+
+    def _append(self, string):
+        self.appends.append(string)
+
+
+def test_log():
+    writer = ListLogFileWriter()
+    writer.log('SUBMISSION', '/path/to/repo.git')
+
+    assert 1 == len(writer.appends)
+    timestamp, rest = writer.appends[0].split(' ', 1)
+    assert timestamp.isdigit()
+    assert 'SUBMISSION /path/to/repo.git' == rest
+
+
+def test_log_many():
+    writer = ListLogFileWriter()
+    writer.log_many([('SUBMISSION', 'first'), ('UPLOAD', 'second')])
+
+    assert ['SUBMISSION first', 'UPLOAD second'] == \
+        [string.split(' ', 1)[1] for string in writer.appends]
+
+    # nothing is appended for no events
+    writer.log_many([])
+    assert 2 == len(writer.appends)
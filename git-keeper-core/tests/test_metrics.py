@@ -0,0 +1,110 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepcore.metrics."""
+
+
+from pytest import raises
+
+from gkeepcore.metrics import MetricsRegistry, MetricsException
+
+
+def test_counter():
+    registry = MetricsRegistry()
+
+    counter = registry.counter('events_total', 'Number of events')
+    counter.inc()
+    counter.inc(2)
+
+    assert 3 == counter.value
+
+    # the same name gives the same counter
+    assert counter is registry.counter('events_total', 'Number of events')
+
+    with raises(MetricsException):
+        counter.inc(-1)
+
+    # a name cannot be reused for a different type of metric
+    with raises(MetricsException):
+        registry.gauge('events_total', 'Number of events')
+
+
+def test_gauge():
+    registry = MetricsRegistry()
+
+    gauge = registry.gauge('depth', 'Queue depth')
+    gauge.set(4)
+    assert 4 == gauge.value
+
+    items = [1, 2]
+    gauge.set_function(lambda: len(items))
+    assert 2 == gauge.value
+
+
+def test_histogram():
+    registry = MetricsRegistry()
+
+    histogram = registry.histogram('duration_seconds', 'Duration',
+                                   buckets=(1, 5))
+
+    for value in (0.5, 1, 3, 10):
+        histogram.observe(value)
+
+    assert 4 == histogram.count
+    assert 14.5 == histogram.sum
+
+    # buckets are cumulative and the infinity bucket counts everything
+    expected = ['duration_seconds_bucket{le="1.0"} 2',
+                'duration_seconds_bucket{le="5.0"} 3',
+                'duration_seconds_bucket{le="+Inf"} 4',
+                'duration_seconds_sum 14.5',
+                'duration_seconds_count 4']
+    assert expected == histogram.render_samples()
+
+    with histogram.time():
+        pass
+
+    assert 5 == histogram.count
+
+
+def test_render_and_write(tmpdir):
+    registry = MetricsRegistry()
+
+    registry.gauge('b_depth', 'Queue depth').set(1)
+    registry.counter('a_total', 'Things').inc()
+
+    # a failing gauge function does not hide the other metrics
+    registry.gauge('c_broken', 'Broken', lambda: 1 / 0)
+
+    text = registry.render()
+    lines = text.splitlines()
+
+    # metrics are rendered in order of name
+    assert ['# HELP a_total Things',
+            '# TYPE a_total counter',
+            'a_total 1',
+            '# HELP b_depth Queue depth',
+            '# TYPE b_depth gauge',
+            'b_depth 1'] == lines[:6]
+    assert lines[8].startswith('# ERROR')
+
+    stats_path = str(tmpdir.join('stats.prom'))
+    registry.write(stats_path)
+
+    with open(stats_path) as f:
+        assert text == f.read()
+
+    assert ['stats.prom'] == [p.basename for p in tmpdir.listdir()]
@@ -17,7 +17,10 @@
 """Tests for gkeepcore.path_utils functions."""
 
 
-from gkeepcore.path_utils import path_to_list, parse_user_log_path
+from gkeepcore.path_utils import path_to_list, parse_user_log_path, \
+    parse_submission_repo_path, parse_faculty_assignment_path, \
+    parse_update_flag_path, route_path, USER_LOG, UPDATE_FLAG, \
+    SUBMISSION_REPO, FACULTY_ASSIGNMENT
 
 
 def test_path_to_list():
@@ -29,6 +32,10 @@ def test_path_to_list():
     path_list = path_to_list('relative/directory/path/')
     assert ['relative', 'directory', 'path'] == path_list
 
+    # repeated slashes
+    path_list = path_to_list('//repeated//slashes')
+    assert ['repeated', 'slashes'] == path_list
+
 
 def test_extract_username_from_log_path():
     # valid student log path
@@ -42,3 +49,70 @@ def test_extract_username_from_log_path():
     # valid faculty relative path
     path = 'faculty/git-keeper-faculty.log'
     assert 'faculty' == parse_user_log_path(path)
+
+
+def test_parse_submission_repo_path():
+    # valid submission repo path
+    path = '/home/student/faculty/class/assignment.git'
+    assert ('faculty', 'class', 'assignment') == \
+        parse_submission_repo_path(path)
+
+    # trailing slash
+    path = '/home/student/faculty/class/assignment.git/'
+    assert ('faculty', 'class', 'assignment') == \
+        parse_submission_repo_path(path)
+
+    # repo name is only .git
+    path = '/home/student/faculty/class/.git'
+    assert parse_submission_repo_path(path) is None
+
+    # not a repo
+    path = '/home/student/faculty/class/assignment'
+    assert parse_submission_repo_path(path) is None
+
+    # too short
+    path = 'class/assignment.git'
+    assert parse_submission_repo_path(path) is None
+
+
+def test_parse_faculty_assignment_path():
+    path = '/home/faculty/class/assignment'
+    assert ('class', 'assignment') == parse_faculty_assignment_path(path)
+
+    path = 'assignment'
+    assert parse_faculty_assignment_path(path) is None
+
+
+def test_parse_update_flag_path():
+    path = '/home/student/faculty/class/assignment.git/update_flag'
+    assert ('faculty', 'class', 'assignment') == parse_update_flag_path(path)
+
+    path = '/home/student/faculty/class/assignment.git'
+    assert parse_update_flag_path(path) is None
+
+
+def test_route_path():
+    path_info = route_path('/home/student/git-keeper-student.log')
+    assert USER_LOG == path_info.kind
+    assert 'student' == path_info.username
+
+    path_info = route_path('/home/s/faculty/class/assignment.git/update_flag')
+    assert UPDATE_FLAG == path_info.kind
+    assert 'faculty' == path_info.faculty_username
+    assert 'class' == path_info.class_name
+    assert 'assignment' == path_info.assignment_name
+
+    path_info = route_path('/home/s/faculty/class/assignment.git')
+    assert SUBMISSION_REPO == path_info.kind
+    assert 'assignment' == path_info.assignment_name
+
+    path_info = route_path('/home/faculty/class/assignment')
+    assert FACULTY_ASSIGNMENT == path_info.kind
+    assert 'class' == path_info.class_name
+    assert path_info.username is None
+
+    assert route_path('/') is None
+
+    # routing the same path again gives the same result
+    assert route_path('/home/s/faculty/class/assignment.git') is \
+        route_path('/home/s/faculty/class/assignment.git')
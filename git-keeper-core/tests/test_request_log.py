@@ -0,0 +1,61 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepcore.request_log."""
+
+
+from pytest import raises
+
+from gkeepcore.request_log import format_request_payload, \
+    parse_request_payload, format_response_payload, parse_response_line, \
+    new_request_id, RequestLogException, OK, ERROR
+
+
+def test_request_round_trip():
+    request_id = new_request_id()
+
+    payload = format_request_payload(request_id, 'REGRADE',
+                                     {'class_name': 'cs100',
+                                      'assignment': 'hw 1'})
+
+    assert (request_id, 'REGRADE', {'class_name': 'cs100',
+                                    'assignment': 'hw 1'}) == \
+        parse_request_payload(payload)
+
+
+def test_malformed_request():
+    with raises(RequestLogException):
+        parse_request_payload('abc REGRADE')
+
+    with raises(RequestLogException):
+        parse_request_payload('abc REGRADE {not json}')
+
+
+def test_response_round_trip():
+    payload = format_response_payload('abc', ERROR, 'two\nlines')
+
+    assert '\n' not in payload
+
+    line = '100 RESPONSE {0}'.format(payload)
+    assert ('abc', ERROR, 'two\nlines') == parse_response_line(line)
+
+    line = '100 RESPONSE {0}'.format(format_response_payload('abc', OK, ''))
+    assert ('abc', OK, '') == parse_response_line(line)
+
+
+def test_not_a_response():
+    assert parse_response_line('100 SUBMISSION /path/to/repo.git') is None
+    assert parse_response_line('100 RESPONSE abc MAYBE "message"') is None
@@ -0,0 +1,81 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepcore.roster."""
+
+
+from pytest import raises
+
+from gkeepcore.roster import Roster, RosterException
+from gkeepcore.student import Student
+
+
+def test_lookups():
+    roster = Roster()
+
+    alice = Student('Doe', 'Alice', 'alice@school.edu')
+    bob = Student('Roe', 'Bob', 'bob@school.edu')
+
+    roster.add('cs1', alice)
+    roster.add('cs1', bob)
+
+    assert alice is roster.get_student('alice')
+    assert bob is roster.get_student_by_email('bob@school.edu')
+    assert alice is roster.get_class_student('cs1', 'alice')
+    assert roster.get_class_student('cs2', 'alice') is None
+    assert roster.get_student('carol') is None
+
+    assert [alice, bob] == roster.get_students('cs1')
+    assert [] == roster.get_students('cs2')
+
+
+def test_multiple_classes():
+    roster = Roster()
+
+    alice = Student('Doe', 'Alice', 'alice@school.edu')
+    alice_again = Student('Doe', 'Alice', 'alice@school.edu')
+
+    roster.add('cs1', alice)
+
+    # the existing record is shared rather than overwritten
+    assert alice is roster.add('cs2', alice_again)
+    assert alice is roster.get_class_student('cs2', 'alice')
+    assert {'cs1', 'cs2'} == roster.get_class_names('alice')
+
+    roster.remove('cs1', 'alice')
+    assert not roster.is_member('cs1', 'alice')
+    assert alice is roster.get_student('alice')
+
+    roster.remove('cs2', 'alice')
+    assert 'alice' not in roster
+    assert roster.get_student_by_email('alice@school.edu') is None
+
+
+def test_conflicts():
+    roster = Roster()
+
+    roster.add('cs1', Student('Doe', 'Alice', 'alice@school.edu'))
+
+    # same student twice in one class
+    with raises(RosterException):
+        roster.add('cs1', Student('Doe', 'Alice', 'alice@school.edu'))
+
+    # same username with a different email address
+    with raises(RosterException):
+        roster.add('cs2', Student('Doe', 'Alice', 'alice@other.edu'))
+
+    with raises(RosterException):
+        roster.remove('cs2', 'alice')
@@ -0,0 +1,87 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepcore.tracing."""
+
+
+from pytest import raises
+
+from gkeepcore.tracing import Tracer, SpanRecord, read_trace_log, \
+    render_waterfall, new_trace_id
+
+
+def test_span_line_round_trip():
+    span = SpanRecord('abc', 100.5, 2.25, 'clone', {'student': 'alice'})
+
+    line = span.to_line()
+    assert 'abc 100.500 2.250 clone {"student":"alice"}' == line
+
+    parsed = SpanRecord.from_line(line + '\n')
+    assert ('abc', 100.5, 2.25, 'clone', {'student': 'alice'}) == \
+        (parsed.trace_id, parsed.start_time, parsed.duration, parsed.name,
+         parsed.attributes)
+    assert 102.75 == parsed.end_time
+
+
+def test_tracer(tmpdir):
+    log_path = str(tmpdir.join('trace.log'))
+
+    tracer = Tracer()
+
+    # nothing is written before the tracer is opened
+    tracer.record('early', 'ignored', 0, 1)
+
+    tracer.open(log_path)
+
+    first_id = new_trace_id()
+    second_id = new_trace_id()
+    assert first_id != second_id
+
+    tracer.record(first_id, 'push_detect', 10, 11, student='alice')
+
+    with raises(ValueError):
+        with tracer.span(second_id, 'action') as span:
+            span.attributes['exit_code'] = 1
+            raise ValueError()
+
+    tracer.record(first_id, 'email_queued', 12, 12)
+
+    # spans without a trace are not recorded
+    tracer.record(None, 'untraced', 0, 1)
+
+    tracer.close()
+
+    spans_by_trace = read_trace_log(log_path)
+
+    assert [first_id, second_id] == list(spans_by_trace.keys())
+    assert ['push_detect', 'email_queued'] == \
+        [span.name for span in spans_by_trace[first_id]]
+
+    action_span = spans_by_trace[second_id][0]
+    assert {'exit_code': 1, 'error': 'ValueError'} == action_span.attributes
+
+
+def test_render_waterfall():
+    spans = [SpanRecord('abc', 14, 6, 'action', {}),
+             SpanRecord('abc', 10, 4, 'clone', {})]
+
+    lines = render_waterfall(spans, width=10).splitlines()
+
+    assert 'trace abc, 10.000s total' == lines[0]
+
+    # spans are drawn in order of start time, scaled to the width
+    assert lines[1].startswith('clone  |####      |')
+    assert lines[2].startswith('action |    ######|')
@@ -0,0 +1,37 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Makes gkeepcore and gkeepserver importable when running the benchmarks
+from a source checkout:
+
+    pytest benchmarks
+
+The directories are appended to sys.path so that gkeepserver/email.py does
+not shadow the standard library's email package.
+"""
+
+
+import os
+import sys
+
+
+_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+for _path in (os.path.join(_root, 'git-keeper-core'),
+              os.path.join(_root, 'git-keeper-core', 'gkeepcore'),
+              os.path.join(_root, 'git-keeper-server')):
+    if _path not in sys.path:
+        sys.path.append(_path)
@@ -0,0 +1,500 @@
+#!/usr/bin/env python3
+
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""End-to-end benchmark of the grading pipeline.
+
+A synthetic class is created under a temporary root directory: a faculty
+home directory with an assignment's tests and reports repositories, and a
+home directory with a bare submission repository for each synthetic student.
+No users are created, the students only exist as directories.
+
+Pushes are then made in bursts. Each push commits a change in a student's
+working clone, pushes it to the student's bare repository, and touches
+update_flag the way the post-update hook does. From there the pushes take the
+same path as in gkeepd: PushMonitor, UpdateFlagWatchManager, GradingPool and
+run_tests, which clones the submission, runs action.sh, and commits and
+pushes the report. Emails are put in a queue that is simply drained instead
+of being sent.
+
+The feedback latency of a push is the time from touching update_flag until
+run_tests has queued the results email for a run that started after the
+push. When reporting, the benchmark prints throughput, latency percentiles
+and the CPU time and memory used by the benchmark process and its children.
+
+Usage:
+
+    grading_benchmark.py [options]
+
+Run with --help to see the options. Use --json to save the results, and
+--baseline to compare a run against saved results.
+
+gkeepd uses bare imports as well as package imports, so git-keeper-core,
+git-keeper-server and the gkeepcore and gkeepserver directories are added to
+the end of sys.path. gkeepd also imports email_sender and locator, which are
+only installed on a grading server. The benchmark drains emails itself and
+uses its own call_action.sh, so stand-ins are used for them when they cannot
+be imported.
+"""
+
+
+import argparse
+import importlib.util
+import json
+import os
+import resource
+import shutil
+import sys
+from queue import Queue, Empty
+from subprocess import check_call, DEVNULL
+from tempfile import mkdtemp
+from threading import Thread, Lock
+from time import time, sleep
+from types import ModuleType, SimpleNamespace
+
+benchmarks_dir = os.path.dirname(os.path.abspath(__file__))
+core_dir = os.path.join(benchmarks_dir, '..', '..', 'git-keeper-core')
+server_dir = os.path.join(benchmarks_dir, '..')
+sys.path += [core_dir, os.path.join(core_dir, 'gkeepcore'), server_dir,
+             os.path.join(server_dir, 'gkeepserver')]
+
+
+class StandInEmail:
+    # stands in for email_sender.Email
+    def __init__(self, to_address, subject, body, files_to_attach=None,
+                 trace_id=None):
+        self.to_address = to_address
+        self.subject = subject
+        self.body = body
+        self.trace_id = trace_id
+
+
+def add_module_if_missing(name, **attributes):
+    if importlib.util.find_spec(name) is None:
+        module = ModuleType(name)
+        module.__dict__.update(attributes)
+        sys.modules[name] = module
+
+
+# the email thread is never started, see drain_emails()
+add_module_if_missing('email_sender', Email=StandInEmail,
+                      process_email_queue=None)
+add_module_if_missing('locator', module_path=lambda: benchmarks_dir)
+
+import gkeepd
+from action_runner import ActionLimits
+from grading_pool import GradingPool
+from inotify_monitors import PushMonitor
+from prepared_environments import PreparedEnvironmentCache
+from result_cache import ResultCache
+from roster import Roster
+from student import Student
+from update_flag_watches import UpdateFlagWatchManager
+
+
+CLASS_NAME = 'benchmark'
+ASSIGNMENT = 'hw1'
+
+# stands in for call_action.sh, which runs action.sh from the tests with the
+# submission path and the student's information
+CALL_ACTION_SCRIPT = 'bash action.sh "$@"\n'
+
+# action.sh used by the synthetic tests. It sleeps to stand in for running
+# real tests and prints a little output for the report.
+ACTION_SCRIPT = '''sleep {0}
+echo "Testing $1"
+ls "$1"
+'''
+
+
+def git(repo_path, *args):
+    command = ['git', '-C', repo_path, '-c', 'user.name=benchmark',
+               '-c', 'user.email=benchmark@localhost'] + list(args)
+    check_call(command, stdout=DEVNULL, stderr=DEVNULL)
+
+
+def create_repo_from_files(work_path, bare_path, files):
+    # Create a working repository containing files, a dictionary mapping
+    # relative paths to contents, and push it to a new bare repository.
+
+    for relative_path, contents in files.items():
+        file_path = os.path.join(work_path, relative_path)
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        with open(file_path, 'w') as f:
+            f.write(contents)
+
+    check_call(['git', 'init', '-q', work_path])
+    git(work_path, 'add', '-A')
+    git(work_path, 'commit', '-q', '-m', 'initial commit')
+    check_call(['git', 'init', '-q', '--bare', bare_path])
+    git(work_path, 'push', '-q', bare_path, 'HEAD:master')
+
+
+def create_synthetic_class(root, student_count, action_seconds):
+    """
+    Create the directories and repositories of a synthetic class.
+
+    :param root: directory to create everything in
+    :param student_count: number of students in the class
+    :param action_seconds: seconds that action.sh sleeps for
+    :return: a namespace containing the faculty home directory, the
+     students, the working clone of each student indexed by username, and
+     the path to the call_action.sh stand-in
+    """
+
+    faculty_home = os.path.join(root, 'faculty')
+    assignment_path = os.path.join(faculty_home, CLASS_NAME, 'assignments',
+                                   ASSIGNMENT)
+    scratch_path = os.path.join(root, 'scratch')
+
+    students = []
+    for i in range(student_count):
+        username = 'student{0:04d}'.format(i)
+        home_dir = os.path.join(root, 'students', username)
+        students.append(Student('Student', str(i),
+                                '{0}@localhost'.format(username),
+                                home_dir=home_dir))
+
+    create_repo_from_files(os.path.join(scratch_path, 'tests'),
+                           os.path.join(assignment_path,
+                                        ASSIGNMENT + '_tests.git'),
+                           {'action.sh': ACTION_SCRIPT.format(action_seconds)})
+
+    # run_tests writes each report into the directory named after the
+    # student
+    report_files = {}
+    for student in students:
+        report_dir = '{0}_{1}_{2}'.format(student.last_name.lower(),
+                                          student.first_name.lower(),
+                                          student.username)
+        report_files[os.path.join(report_dir, '.keep')] = ''
+
+    create_repo_from_files(os.path.join(scratch_path, 'reports'),
+                           os.path.join(assignment_path,
+                                        ASSIGNMENT + '_reports.git'),
+                           report_files)
+
+    starter_work_path = os.path.join(scratch_path, 'starter')
+    starter_bare_path = os.path.join(scratch_path, 'starter.git')
+    create_repo_from_files(starter_work_path, starter_bare_path,
+                           {'main.py': 'print("hello")\n'})
+
+    work_paths = {}
+    for student in students:
+        bare_path = student.get_bare_repo_dir(CLASS_NAME, ASSIGNMENT)
+        check_call(['git', 'clone', '-q', '--bare', starter_bare_path,
+                    bare_path])
+        open(os.path.join(bare_path, 'update_flag'), 'w').close()
+
+        work_path = os.path.join(root, 'work', student.username)
+        check_call(['git', 'clone', '-q', bare_path, work_path])
+        work_paths[student.username] = work_path
+
+    call_action_path = os.path.join(root, 'call_action.sh')
+    with open(call_action_path, 'w') as f:
+        f.write(CALL_ACTION_SCRIPT)
+
+    return SimpleNamespace(faculty_home=faculty_home, students=students,
+                           work_paths=work_paths,
+                           call_action_path=call_action_path)
+
+
+class LatencyTracker:
+    """Matches pushes to the grading runs that answered them."""
+
+    def __init__(self):
+        self.latencies = []
+
+        # push times not yet answered, indexed by repository path
+        self._pending = {}
+        self._lock = Lock()
+
+    def pushed(self, repo_path, push_time):
+        with self._lock:
+            self._pending.setdefault(repo_path, []).append(push_time)
+
+    def graded(self, repo_path, start_time, end_time):
+        # every push made before the run started was tested by the run
+        with self._lock:
+            pending = self._pending.get(repo_path, [])
+            answered = [t for t in pending if t <= start_time]
+            self._pending[repo_path] = [t for t in pending if t > start_time]
+            self.latencies += [end_time - t for t in answered]
+
+    def answered_count(self):
+        with self._lock:
+            return len(self.latencies)
+
+
+def percentile(values, fraction):
+    """
+    Get a percentile of a list of values using the nearest rank method.
+
+    :param values: the values
+    :param fraction: the percentile as a fraction, for example 0.99
+    :return: the percentile, or None if there are no values
+    """
+
+    if len(values) == 0:
+        return None
+
+    ordered = sorted(values)
+    rank = max(int(round(fraction * len(ordered) + 0.5)) - 1, 0)
+
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def fire_pushes(synthetic_class, push_count, burst_size, burst_interval,
+                tracker: LatencyTracker):
+    # Make push_count pushes in bursts of burst_size, cycling through the
+    # students. Runs in its own thread.
+
+    students = synthetic_class.students
+
+    for push_number in range(push_count):
+        if push_number > 0 and push_number % burst_size == 0:
+            sleep(burst_interval)
+
+        student = students[push_number % len(students)]
+        work_path = synthetic_class.work_paths[student.username]
+        bare_path = student.get_bare_repo_dir(CLASS_NAME, ASSIGNMENT)
+
+        with open(os.path.join(work_path, 'main.py'), 'a') as f:
+            f.write('# push {0}\n'.format(push_number))
+
+        git(work_path, 'commit', '-q', '-am', 'push {0}'.format(push_number))
+        git(work_path, 'push', '-q', 'origin', 'HEAD:master')
+
+        push_time = time()
+        tracker.pushed(bare_path, push_time)
+        os.utime(os.path.join(bare_path, 'update_flag'),
+                 (push_time, push_time))
+
+
+def drain_emails(email_queue: Queue, counts):
+    # Stands in for the email thread. A None item means shut down.
+
+    while True:
+        email = email_queue.get()
+        if email is None:
+            return
+        counts['emails'] += 1
+
+
+def resource_usage():
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+
+    # ru_maxrss is in kilobytes on Linux
+    return {
+        'cpu_seconds': own.ru_utime + own.ru_stime,
+        'children_cpu_seconds': children.ru_utime + children.ru_stime,
+        'max_rss_mb': own.ru_maxrss / 1024,
+        'children_max_rss_mb': children.ru_maxrss / 1024,
+    }
+
+
+def run_benchmark(args, root):
+    """
+    Create the synthetic class, make the pushes and wait for every one of
+    them to be answered.
+
+    :param args: parsed command line arguments
+    :param root: directory to create the synthetic class in
+    :return: dictionary of results
+    """
+
+    print('Creating {0} students in {1}'.format(args.students, root))
+    synthetic_class = create_synthetic_class(root, args.students,
+                                             args.action_seconds)
+
+    # handle_push and ClassState only need these from the configuration
+    roster = Roster()
+    for student in synthetic_class.students:
+        roster.add(CLASS_NAME, student)
+    config = SimpleNamespace(home_dir=synthetic_class.faculty_home,
+                             roster=roster)
+    class_states = {CLASS_NAME: gkeepd.ClassState(CLASS_NAME, config)}
+
+    test_environments = PreparedEnvironmentCache(os.path.join(root, 'envs'),
+                                                 ActionLimits())
+    result_cache = ResultCache(os.path.join(root, 'results'))
+
+    email_queue = Queue()
+    counts = {'emails': 0}
+    email_thread = Thread(target=drain_emails, args=(email_queue, counts))
+    email_thread.start()
+
+    tracker = LatencyTracker()
+
+    def grade(job):
+        start_time = time()
+        gkeepd.grade(job, class_states, synthetic_class.call_action_path,
+                     email_queue, test_environments, result_cache)
+        tracker.graded(job.repo.path, start_time, time())
+
+    grading_pool = GradingPool(args.workers, grade)
+
+    update_flag_queue = Queue()
+    push_monitor = PushMonitor(update_flag_queue)
+    watch_manager = UpdateFlagWatchManager(push_monitor)
+    gkeepd.add_update_flag_watches(CLASS_NAME, watch_manager, [ASSIGNMENT],
+                                   synthetic_class.students)
+
+    usage_before = resource_usage()
+    start_time = time()
+
+    pusher = Thread(target=fire_pushes,
+                    args=(synthetic_class, args.pushes, args.burst_size,
+                          args.burst_interval, tracker))
+    pusher.start()
+
+    # the same dispatching as gkeepd's main loop
+    deadline = start_time + args.timeout
+    while tracker.answered_count() < args.pushes and time() < deadline:
+        try:
+            wd = update_flag_queue.get(block=True, timeout=0.5)
+        except Empty:
+            continue
+
+        watched = watch_manager.get_repository(wd)
+        if watched is not None:
+            class_name, repo = watched
+            gkeepd.handle_push(class_name, repo, config, grading_pool)
+
+    elapsed = time() - start_time
+    usage_after = resource_usage()
+
+    pusher.join()
+    grading_pool.shutdown()
+    email_queue.put(None)
+    email_thread.join()
+
+    latencies = tracker.latencies
+
+    results = {
+        'students': args.students,
+        'pushes': args.pushes,
+        'answered': len(latencies),
+        'workers': args.workers,
+        'burst_size': args.burst_size,
+        'action_seconds': args.action_seconds,
+        'emails': counts['emails'],
+        'elapsed_seconds': elapsed,
+        'pushes_per_minute': len(latencies) / elapsed * 60,
+        'latency_p50_seconds': percentile(latencies, 0.5),
+        'latency_p99_seconds': percentile(latencies, 0.99),
+        'latency_max_seconds': max(latencies) if latencies else None,
+    }
+
+    for key, value in usage_after.items():
+        if key.startswith('max_rss') or key.startswith('children_max'):
+            results[key] = value
+        else:
+            results[key] = value - usage_before[key]
+
+    return results
+
+
+def print_results(results, baseline=None):
+    for key in sorted(results):
+        value = results[key]
+        line = '{0:<24} {1}'.format(key, _format(value))
+
+        if baseline is not None and isinstance(value, float) and \
+                isinstance(baseline.get(key), (int, float)) and \
+                baseline[key] != 0:
+            change = (value - baseline[key]) / baseline[key] * 100
+            line += '  ({0:+.1f}% vs baseline {1})'.format(
+                change, _format(baseline[key]))
+
+        print(line)
+
+
+def _format(value):
+    if isinstance(value, float):
+        return '{0:.3f}'.format(value)
+    return str(value)
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark the grading '
+                                                 'pipeline with a synthetic '
+                                                 'class')
+    parser.add_argument('--students', type=int, default=50,
+                        help='number of students in the class')
+    parser.add_argument('--pushes', type=int, default=100,
+                        help='total number of pushes to make')
+    parser.add_argument('--burst-size', type=int, default=25,
+                        help='number of pushes made back to back')
+    parser.add_argument('--burst-interval', type=float, default=5,
+                        help='seconds between bursts')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help='number of grading threads')
+    parser.add_argument('--action-seconds', type=float, default=0.5,
+                        help='seconds that action.sh takes')
+    parser.add_argument('--timeout', type=float, default=1800,
+                        help='give up waiting for results after this many '
+                             'seconds')
+    parser.add_argument('--root', help='directory to create the class in, a '
+                                       'temporary directory by default')
+    parser.add_argument('--keep', action='store_true',
+                        help='do not remove the class afterwards')
+    parser.add_argument('--json', metavar='PATH',
+                        help='also write the results to a JSON file')
+    parser.add_argument('--baseline', metavar='PATH',
+                        help='compare with results saved with --json')
+
+    return parser.parse_args()
+
+
+def main():
+    args = parse_arguments()
+
+    baseline = None
+    if args.baseline is not None:
+        try:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            sys.exit('Error reading {0}:\n{1}'.format(args.baseline, e))
+
+    if args.root is not None:
+        root = os.path.abspath(args.root)
+        os.makedirs(root)
+    else:
+        root = mkdtemp(prefix='gkeep-benchmark-')
+
+    try:
+        results = run_benchmark(args, root)
+    finally:
+        if not args.keep:
+            shutil.rmtree(root, ignore_errors=True)
+
+    print_results(results, baseline)
+
+    if args.json is not None:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if results['answered'] < results['pushes']:
+        sys.exit('Only {0} of {1} pushes were answered before the timeout'
+                 .format(results['answered'], results['pushes']))
+
+
+if __name__ == '__main__':
+    main()
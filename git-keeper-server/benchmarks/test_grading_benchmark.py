@@ -0,0 +1,46 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Smoke test which runs grading_benchmark.py with a tiny class so that the
+harness keeps working as gkeepd changes."""
+
+
+import json
+import os
+import sys
+from subprocess import check_output, STDOUT
+
+
+def test_grading_benchmark_runs(tmpdir):
+    script_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                               'grading_benchmark.py')
+    json_path = str(tmpdir.join('results.json'))
+
+    # run from tmpdir, since gkeepserver/email.py would shadow the standard
+    # library's email package if the current directory were gkeepserver.
+    # Each push is made by a different student, since two runs for the same
+    # student within a second write reports with the same file name.
+    check_output([sys.executable, script_path, '--students', '3',
+                  '--pushes', '3', '--burst-size', '3', '--workers', '2',
+                  '--action-seconds', '0', '--timeout', '60',
+                  '--root', str(tmpdir.join('class')), '--json', json_path],
+                 cwd=str(tmpdir), stderr=STDOUT, timeout=300)
+
+    with open(json_path) as f:
+        results = json.load(f)
+
+    assert 3 == results['answered']
+    assert 3 == results['emails']
@@ -0,0 +1,293 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Microbenchmarks for the path of a logged event into the server.
+
+The benchmarks use the pytest-benchmark plugin and are skipped if it is not
+installed:
+
+    pytest benchmarks/test_ingest_benchmarks.py
+
+Besides the timings reported by pytest-benchmark, each benchmark stores the
+figure that matters for it in extra_info, such as lines per second or CPU
+time per idle file. Use --benchmark-json to save them and
+--benchmark-compare to catch regressions.
+"""
+
+
+import os
+from queue import Queue, Empty
+from threading import Thread
+from time import time, process_time, sleep
+
+import pytest
+
+pytest.importorskip('pytest_benchmark')
+
+from gkeepcore.log_event_parser import LogEventParserThread
+from gkeepcore.log_polling import LogPollingThread
+from gkeepcore.path_utils import route_path, parse_user_log_path
+from gkeepserver.event_handlers.handler_registry import \
+    event_handlers_by_type
+from gkeepserver.local_log_file import LocalLogFileReader
+
+
+# number of log files for benchmarks of many files
+LOG_FILE_COUNT = 2000
+
+# number of lines in a single large backlog
+BACKLOG_LINE_COUNT = 100000
+
+# number of lines appended while measuring detection latency
+APPEND_COUNT = 2000
+
+
+def user_log_path(root, username):
+    return os.path.join(root, username,
+                        'git-keeper-{0}.log'.format(username))
+
+
+def submission_line(username, timestamp=None):
+    if timestamp is None:
+        timestamp = int(time())
+    return '{0} SUBMISSION /home/{1}/faculty/cs100/hw1.git'.format(timestamp,
+                                                                  username)
+
+
+def create_log_files(root, count, line_count=0):
+    # Create count user log files, each containing line_count lines, and
+    # return a LocalLogFileReader for each
+
+    readers = []
+
+    for i in range(count):
+        username = 'student{0:05d}'.format(i)
+        path = user_log_path(root, username)
+        os.makedirs(os.path.dirname(path))
+
+        with open(path, 'w') as f:
+            for _ in range(line_count):
+                f.write(submission_line(username) + '\n')
+
+        readers.append(LocalLogFileReader(path))
+
+    return readers
+
+
+def create_poller(readers):
+    # A poller that is already watching readers. polling_interval is 0 so
+    # that _poll() never sleeps.
+
+    add_log_queue = Queue()
+    new_log_line_queue = Queue()
+
+    poller = LogPollingThread(add_log_queue, new_log_line_queue,
+                              polling_interval=0)
+
+    for reader in readers:
+        add_log_queue.put(reader)
+    poller._poll()
+
+    return poller, new_log_line_queue
+
+
+def drain(queue: Queue) -> int:
+    count = 0
+    try:
+        while True:
+            queue.get(block=False)
+            count += 1
+    except Empty:
+        return count
+
+
+def record_rate(benchmark, name, count):
+    # Store count per second of the mean time in extra_info. There are no
+    # stats when benchmarks are run as plain tests with --benchmark-disable.
+    if benchmark.stats is not None:
+        benchmark.extra_info[name] = count / benchmark.stats.stats.mean
+
+
+def test_route_path_uncached(benchmark):
+    paths = ['/home/student{0:05d}/faculty/cs100/hw{1}.git/update_flag'
+             .format(i, i % 10) for i in range(LOG_FILE_COUNT)]
+
+    def route_all():
+        route_path.cache_clear()
+        for path in paths:
+            route_path(path)
+
+    benchmark(route_all)
+
+    record_rate(benchmark, 'paths_per_second', len(paths))
+
+
+def test_route_path_cached(benchmark):
+    paths = [user_log_path('/home', 'student{0:05d}'.format(i))
+             for i in range(LOG_FILE_COUNT)]
+
+    for path in paths:
+        parse_user_log_path(path)
+
+    def route_all():
+        for path in paths:
+            parse_user_log_path(path)
+
+    benchmark(route_all)
+
+    record_rate(benchmark, 'paths_per_second', len(paths))
+
+
+def test_parse_event(benchmark):
+    parser = LogEventParserThread(Queue(), Queue(), event_handlers_by_type)
+
+    events = []
+    for i in range(LOG_FILE_COUNT):
+        username = 'student{0:05d}'.format(i)
+        events.append((user_log_path('/home', username),
+                       submission_line(username)))
+
+    def parse_all():
+        for log_path, log_line in events:
+            parser._parse_event(log_path, log_line)
+
+    benchmark(parse_all)
+
+    record_rate(benchmark, 'lines_per_second', len(events))
+
+
+def test_reader_byte_counts(benchmark, tmpdir):
+    readers = create_log_files(str(tmpdir), LOG_FILE_COUNT, line_count=1)
+
+    def count_all():
+        for reader in readers:
+            reader.get_byte_count()
+
+    benchmark(count_all)
+
+    record_rate(benchmark, 'files_per_second', len(readers))
+
+
+def test_poll_idle_files(benchmark, tmpdir):
+    # Nothing changes, so this is the cost of watching files which are quiet,
+    # which is most of them most of the time
+    readers = create_log_files(str(tmpdir), LOG_FILE_COUNT, line_count=1)
+    poller, new_log_line_queue = create_poller(readers)
+
+    cpu_times = []
+
+    def poll():
+        start_cpu_time = process_time()
+        poller._poll()
+        cpu_times.append(process_time() - start_cpu_time)
+
+    benchmark(poll)
+
+    assert drain(new_log_line_queue) == 0
+
+    cpu_per_poll = sum(cpu_times) / len(cpu_times)
+    benchmark.extra_info['cpu_microseconds_per_idle_file'] = \
+        cpu_per_poll / len(readers) * 1e6
+
+
+def test_poll_large_backlog(benchmark, tmpdir):
+    # A single file that has grown by many lines since the last poll, as
+    # after the server was down for a while
+    root = str(tmpdir)
+    path = user_log_path(root, 'student')
+    os.makedirs(os.path.dirname(path))
+
+    line = submission_line('student') + '\n'
+    with open(path, 'w') as f:
+        f.write(line * BACKLOG_LINE_COUNT)
+
+    def setup():
+        poller, new_log_line_queue = create_poller([])
+        poller._log_byte_counts[LocalLogFileReader(path)] = 0
+        return (poller, new_log_line_queue), {}
+
+    def poll(poller, new_log_line_queue):
+        poller._poll()
+        assert drain(new_log_line_queue) == BACKLOG_LINE_COUNT
+
+    benchmark.pedantic(poll, setup=setup, rounds=5)
+
+    record_rate(benchmark, 'lines_per_second', BACKLOG_LINE_COUNT)
+
+
+def test_detection_latency(benchmark, tmpdir):
+    # Lines are appended to many files at a high rate while a real poller
+    # thread and parser thread run. The latency of each line is the time
+    # from appending it until its handler comes out of the parser.
+    readers = create_log_files(str(tmpdir), LOG_FILE_COUNT // 10)
+
+    add_log_queue = Queue()
+    new_log_line_queue = Queue()
+    event_handler_queue = Queue()
+
+    poller = LogPollingThread(add_log_queue, new_log_line_queue,
+                              polling_interval=0.05)
+    parser = LogEventParserThread(new_log_line_queue, event_handler_queue,
+                                  event_handlers_by_type)
+
+    # neither thread ever returns from run()
+    poller.daemon = True
+    parser.daemon = True
+    poller.start()
+    parser.start()
+
+    for reader in readers:
+        add_log_queue.put(reader)
+
+    # give the poller time to start watching every file
+    sleep(0.5)
+
+    append_times = {}
+
+    def append_lines():
+        for i in range(APPEND_COUNT):
+            reader = readers[i % len(readers)]
+            # stamped before writing, since the poller may see the line
+            # before the write returns
+            append_times[reader.get_file_path(), i] = time()
+            with open(reader.get_file_path(), 'a') as f:
+                f.write(submission_line('append{0}'.format(i)) + '\n')
+
+    def measure():
+        writer = Thread(target=append_lines)
+        writer.start()
+
+        latencies = []
+        while len(latencies) < APPEND_COUNT:
+            event_handler_queue.get(timeout=30)
+            latencies.append(time())
+
+        writer.join()
+        return latencies
+
+    detect_times = benchmark.pedantic(measure, rounds=1, iterations=1)
+
+    # handlers arrive in the order the lines were appended within a file,
+    # and across files the order only shifts by a polling interval, so the
+    # overall ordering is a good enough match for percentiles
+    latencies = sorted(detect - append for detect, append in
+                       zip(detect_times, sorted(append_times.values())))
+
+    record_rate(benchmark, 'lines_per_second', APPEND_COUNT)
+    benchmark.extra_info['latency_p50_seconds'] = \
+        latencies[len(latencies) // 2]
+    benchmark.extra_info['latency_p99_seconds'] = \
+        latencies[int(len(latencies) * 0.99)]
@@ -0,0 +1,340 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides a function for running a faculty member's action.sh with resource
+limits.
+
+Each run is started in a new session so that it and everything it spawns form
+a single process group. The command is run through prlimit from util-linux,
+which sets CPU time, memory, and process count limits before executing it, so
+nothing needs to run in the child between fork() and exec(). The whole process
+group is killed if the run exceeds its wall-clock timeout or produces too much
+output. The process group is also killed once bash exits, so processes left
+running in the background by a submission do not outlive the run.
+
+The default limits may be overridden for each assignment by a limits.cfg file
+in the assignment's tests, in the INI format:
+
+    [limits]
+    timeout = 1200
+    memory_bytes = 8589934592
+    max_processes = none
+
+Each option is an ActionLimits attribute, and none removes the limit.
+
+Output is never held in memory in full. It is written to an output file as it
+arrives, and only a bounded excerpt made of the beginning and the end of the
+output is kept for the result.
+
+Example usage:
+
+    from gkeepserver.action_runner import ActionLimits, run_action
+
+    result = run_action(['bash', 'call_action.sh', code_path], tests_path,
+                        ActionLimits(timeout=60), report_path)
+
+    if result.timed_out:
+        # handle the timeout
+"""
+
+
+import configparser
+import os
+import signal
+from subprocess import Popen, PIPE, STDOUT, DEVNULL, TimeoutExpired
+from threading import Thread, Lock
+
+
+# name of the file in the tests which overrides the default limits
+LIMITS_FILENAME = 'limits.cfg'
+
+# seconds to wait for the rest of the output once the process group has been
+# killed. A process which left the group may still hold the pipe open.
+OUTPUT_DRAIN_TIMEOUT = 10
+
+
+class ActionLimitsError(Exception):
+    pass
+
+
+class ActionLimits:
+    """Resource limits for a single run of action.sh.
+
+    Any limit may be None, in which case it is not applied.
+
+    Attributes:
+        timeout - wall-clock seconds before the process group is killed
+        cpu_seconds - CPU seconds for each process (RLIMIT_CPU)
+        memory_bytes - address space for each process (RLIMIT_AS)
+        max_processes - number of processes for the user (RLIMIT_NPROC).
+         This counts every process owned by the user, including gkeepd
+         itself, so it must be set well above what the daemon uses.
+        max_output_bytes - bytes of output written to the output file before
+         the process group is killed
+    """
+
+    def __init__(self, timeout=600, cpu_seconds=600,
+                 memory_bytes=4 * 1024 ** 3, max_processes=None,
+                 max_output_bytes=10 * 1024 ** 2):
+        self.timeout = timeout
+        self.cpu_seconds = cpu_seconds
+        self.memory_bytes = memory_bytes
+        self.max_processes = max_processes
+        self.max_output_bytes = max_output_bytes
+
+
+def read_action_limits(path: str, defaults: ActionLimits) -> ActionLimits:
+    """Read limits from a limits file, using the defaults for any limits
+    that it does not set.
+
+    Raises ActionLimitsError if the file cannot be parsed.
+
+    :param path: path of the limits file. If it does not exist, the defaults
+     are returned.
+    :param defaults: the limits to use when the file does not set them
+    :return: the limits to apply
+    """
+
+    if not os.path.isfile(path):
+        return defaults
+
+    parser = configparser.ConfigParser()
+
+    try:
+        parser.read(path)
+    except configparser.Error as e:
+        raise ActionLimitsError('Error reading {0}: {1}'.format(path, e))
+
+    limits = ActionLimits(defaults.timeout, defaults.cpu_seconds,
+                          defaults.memory_bytes, defaults.max_processes,
+                          defaults.max_output_bytes)
+
+    if not parser.has_section('limits'):
+        return limits
+
+    for name, value in parser.items('limits'):
+        if not hasattr(limits, name):
+            raise ActionLimitsError('Unknown limit in {0}: {1}'
+                                    .format(path, name))
+
+        if value.strip().lower() == 'none':
+            setattr(limits, name, None)
+            continue
+
+        try:
+            setattr(limits, name, int(value))
+        except ValueError:
+            raise ActionLimitsError('Invalid value for {0} in {1}: {2}'
+                                    .format(name, path, value))
+
+    return limits
+
+
+class ActionResult:
+    """The outcome of a single run of action.sh.
+
+    Attributes:
+        output - excerpt of the combined stdout and stderr. If the output was
+         longer than the excerpt size, the middle is replaced by a line
+         saying how many bytes were left out.
+        output_byte_count - total number of bytes of output that were read
+        exit_code - exit code of bash, negative if it was killed by a signal
+        timed_out - True if the run was killed for exceeding its timeout
+        output_truncated - True if the run was killed for producing too much
+         output
+    """
+
+    def __init__(self, output, output_byte_count, exit_code, timed_out,
+                 output_truncated):
+        self.output = output
+        self.output_byte_count = output_byte_count
+        self.exit_code = exit_code
+        self.timed_out = timed_out
+        self.output_truncated = output_truncated
+
+    @property
+    def succeeded(self) -> bool:
+        """True if the run finished on its own with a zero exit code"""
+        return (self.exit_code == 0 and not self.timed_out and
+                not self.output_truncated)
+
+
+def _limited_command(command: list, limits: ActionLimits) -> list:
+    # Prefix the command with prlimit, which sets both the soft and hard
+    # limits and then executes the command. If a limit cannot be set, prlimit
+    # prints an error and exits with a non-zero exit code.
+
+    options = [
+        ('--cpu', limits.cpu_seconds),
+        ('--as', limits.memory_bytes),
+        ('--nproc', limits.max_processes),
+    ]
+
+    prlimit_command = ['prlimit']
+
+    for option, value in options:
+        if value is not None:
+            prlimit_command.append('{0}={1}'.format(option, value))
+
+    if len(prlimit_command) == 1:
+        return command
+
+    return prlimit_command + ['--'] + command
+
+
+def _kill_process_group(process: Popen):
+    # The child is the leader of its own session, so its process group ID is
+    # its PID
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except ProcessLookupError:
+        pass
+
+
+class _OutputReader(Thread):
+    # Reads the output of the process in chunks and writes them to the output
+    # file, keeping only the first and last excerpt_bytes / 2 bytes in
+    # memory. Kills the process group once more than max_output_bytes have
+    # been read.
+
+    def __init__(self, process: Popen, output_file, max_output_bytes,
+                 excerpt_bytes):
+        # a reader which never finishes must not keep gkeepd from exiting
+        Thread.__init__(self, daemon=True)
+
+        self._process = process
+        self._output_file = output_file
+        self._max_output_bytes = max_output_bytes
+        self._head_limit = excerpt_bytes // 2
+        self._tail_limit = excerpt_bytes - self._head_limit
+
+        self.head = bytearray()
+        self.tail = bytearray()
+        self.byte_count = 0
+        self.truncated = False
+
+        # held while storing a chunk, so that once stop() returns nothing is
+        # stored anymore
+        self._lock = Lock()
+        self._stopped = False
+
+    def run(self):
+        for chunk in iter(lambda: self._process.stdout.read1(65536), b''):
+            with self._lock:
+                if self.truncated or self._stopped:
+                    # keep draining until the writers close the pipe
+                    continue
+
+                if (self._max_output_bytes is not None and
+                        self.byte_count + len(chunk) >
+                        self._max_output_bytes):
+                    chunk = chunk[:self._max_output_bytes - self.byte_count]
+                    self.truncated = True
+                    _kill_process_group(self._process)
+
+                self._store(chunk)
+
+    def stop(self):
+        # Stop storing output. Output read afterwards is discarded.
+        with self._lock:
+            self._stopped = True
+
+    def _store(self, chunk):
+        self.byte_count += len(chunk)
+
+        if self._output_file is not None:
+            self._output_file.write(chunk)
+
+        head_space = self._head_limit - len(self.head)
+        if head_space > 0:
+            self.head += chunk[:head_space]
+            chunk = chunk[head_space:]
+
+        self.tail += chunk
+        if len(self.tail) > self._tail_limit:
+            del self.tail[:len(self.tail) - self._tail_limit]
+
+    def get_excerpt(self) -> str:
+        omitted = self.byte_count - len(self.head) - len(self.tail)
+
+        excerpt = self.head.decode('utf-8', errors='replace')
+
+        if omitted > 0:
+            excerpt += ('\n\n[... {0} bytes of output omitted ...]\n\n'
+                        .format(omitted))
+
+        return excerpt + self.tail.decode('utf-8', errors='replace')
+
+
+def run_action(command: list, cwd: str, limits: ActionLimits,
+               output_path=None, excerpt_bytes=64 * 1024) -> ActionResult:
+    """Run a command with resource limits, streaming its combined stdout and
+    stderr to a file.
+
+    :param command: the command to run as a list of arguments
+    :param cwd: the working directory for the command
+    :param limits: the limits to apply
+    :param output_path: path of the file to write the output to. The file is
+     overwritten. If None, the output is only kept as an excerpt.
+    :param excerpt_bytes: maximum size of the excerpt of the output stored in
+     the result
+    :return: an ActionResult describing the run
+    """
+
+    # prlimit is run directly rather than setting the limits in a preexec_fn,
+    # which is not safe in a program with threads
+
+    if output_path is not None:
+        output_file = open(output_path, 'wb')
+    else:
+        output_file = None
+
+    try:
+        process = Popen(_limited_command(command, limits), cwd=cwd,
+                        stdin=DEVNULL, stdout=PIPE, stderr=STDOUT,
+                        start_new_session=True)
+
+        reader = _OutputReader(process, output_file, limits.max_output_bytes,
+                               excerpt_bytes)
+        reader.start()
+
+        timed_out = False
+
+        try:
+            process.wait(timeout=limits.timeout)
+        except TimeoutExpired:
+            timed_out = True
+
+        # kill anything still running in the group, including background
+        # processes that would otherwise keep the output pipe open
+        _kill_process_group(process)
+
+        exit_code = process.wait()
+
+        # A process which started its own session is not killed with the
+        # group and may keep the pipe open. Its output is not waited for
+        # indefinitely, and the reader drains the pipe until it is closed.
+        reader.join(OUTPUT_DRAIN_TIMEOUT)
+        reader.stop()
+
+        if not reader.is_alive():
+            process.stdout.close()
+    finally:
+        if output_file is not None:
+            output_file.close()
+
+    return ActionResult(reader.get_excerpt(), reader.byte_count, exit_code,
+                        timed_out, reader.truncated)
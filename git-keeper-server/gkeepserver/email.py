@@ -42,7 +42,7 @@ class EmailException(Exception):
 
 class Email:
     def __init__(self, to_address, subject, body, files_to_attach=None,
-                 max_character_count=1000000):
+                 max_character_count=1000000, trace_id=None):
         """
         Construct an email object.
 
@@ -56,9 +56,13 @@ class Email:
         :param files_to_attach: a list of file paths to attach to the email
         :param max_character_count: if the email is longer than this number of
          characters it will be truncated
+        :param trace_id: ID of the trace of the submission the email is about,
+         if any. It is included as a header so it can be found in a
+         forwarded email.
         """
 
         self.to_address = to_address
+        self.trace_id = trace_id
 
         self._subject = subject
         self._files_to_attach = files_to_attach
@@ -111,6 +115,9 @@ class Email:
         message['To'] = to_header
         message['reply-to'] = reply_to_header
 
+        if self.trace_id is not None:
+            message['X-Git-Keeper-Trace'] = self.trace_id
+
         # attach the body
         message.attach(MIMEText(self._body, _charset='utf-8'))
 
@@ -46,9 +46,23 @@ from threading import Thread
 from queue import Queue, Empty
 from time import time, sleep
 
+from gkeepcore.metrics import registry
+from gkeepcore.tracing import tracer
 from gkeepserver.email import Email, EmailException
 
 
+_emails_sent = registry.counter('gkeep_emails_sent_total',
+                                'Number of emails sent')
+_email_failures = registry.counter('gkeep_email_failures_total',
+                                   'Number of emails that failed to send')
+_email_delivery_seconds = registry.histogram('gkeep_email_delivery_seconds',
+                                             'Time from an email being '
+                                             'queued to it being sent')
+_email_queue_depth = registry.gauge('gkeep_email_sender_queue_depth',
+                                    'Number of emails waiting in the email '
+                                    'sender thread')
+
+
 class EmailSenderThread(Thread):
     """
     Provides a Thread which blocks waiting for new emails and sends them in a
@@ -78,7 +92,9 @@ class EmailSenderThread(Thread):
 
         Thread.__init__(self)
 
+        # items are (email, time queued) tuples
         self._email_queue = Queue()
+        _email_queue_depth.set_function(self._email_queue.qsize)
 
         self._min_send_interval = min_send_interval
         self._last_send_time = 0
@@ -94,7 +110,7 @@ class EmailSenderThread(Thread):
         :param email: the email to send
         """
 
-        self._email_queue.put(email)
+        self._email_queue.put((email, time()))
 
     def shutdown(self):
         """
@@ -122,20 +138,23 @@ class EmailSenderThread(Thread):
         while not self._shutdown_flag:
             try:
                 while True:
-                    email = self._email_queue.get(block=True, timeout=0.5)
+                    email, queued_time = \
+                        self._email_queue.get(block=True, timeout=0.5)
 
                     if isinstance(email, Email):
-                        self._send_email_with_rate_limiting(email)
+                        self._send_email_with_rate_limiting(email,
+                                                            queued_time)
                     else:
                         # FIXME - log this
                         pass
             except Empty:
                 pass
 
-    def _send_email_with_rate_limiting(self, email: Email):
+    def _send_email_with_rate_limiting(self, email: Email, queued_time):
         # Send the email. Sleep first if need be.
         #
         # :param email: the email to send
+        # :param queued_time: the time the email was queued
 
         # if _min_send_interval seconds have not elapsed since the last email
         # was sent, sleep until _min_send_interval seconds have elapsed
@@ -147,10 +166,17 @@ class EmailSenderThread(Thread):
 
         self._last_send_time = current_time
 
+        tracer.record(email.trace_id, 'email_queue', queued_time, time(),
+                      to=email.to_address)
+
         try:
-            email.send()
+            with tracer.span(email.trace_id, 'email_send'):
+                email.send()
+            _emails_sent.inc()
+            _email_delivery_seconds.observe(time() - queued_time)
             # FIXME - log this instead
             print('EMAILER: Sent email to', email.to_address)
         except EmailException as e:
+            _email_failures.inc()
             # FIXME - log this instead
             print('EMAILER: Failed to send email to', email.to_address)
@@ -18,11 +18,13 @@
 classes. Pass event_handlers_by_type to a LogEventParserThread constructor."""
 
 
+from gkeepserver.event_handlers.request_handler import RequestHandler
 from gkeepserver.event_handlers.submission_handler import SubmissionHandler
 from gkeepserver.event_handlers.upload_handler import UploadHandler
 
 
 event_handlers_by_type = {
+    'REQUEST': RequestHandler,
     'SUBMISSION': SubmissionHandler,
     'UPLOAD': UploadHandler
 }
@@ -0,0 +1,176 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Handler for requests from clients.
+
+Event type: REQUEST
+
+The request type selects a function from request_functions_by_type. The
+function's message, or its error, is logged as the response in the user's
+response log. See gkeepcore.request_log for the format of requests and
+responses.
+"""
+
+
+import os
+
+from gkeepcore.event_handler import EventHandler, HandlerException
+from gkeepcore.log_file import LogFileException
+from gkeepcore.path_utils import parse_user_log_path, \
+    build_user_response_log_path
+from gkeepcore.request_log import parse_request_payload, \
+    format_response_payload, RequestLogException, RESPONSE_EVENT_TYPE, OK, \
+    ERROR
+from gkeepcore.tracing import tracer
+from gkeepserver.local_log_file import LocalLogFileWriter
+from gkeepserver.regrade_requests import regrade_requests_dir, \
+    write_regrade_request
+
+
+class RequestError(Exception):
+    """Raised by request functions. The message is sent to the user."""
+    pass
+
+
+def _get_string_argument(arguments: dict, name: str) -> str:
+    # Get a required string argument, raising RequestError if it is missing
+
+    value = arguments.get(name)
+
+    if not isinstance(value, str) or value == '':
+        raise RequestError('Missing argument: {0}'.format(name))
+
+    return value
+
+
+def ping(home_dir: str, username: str, arguments: dict) -> str:
+    """Respond to a request which only checks that the server is handling
+    requests.
+    """
+
+    return ''
+
+
+def regrade(home_dir: str, username: str, arguments: dict) -> str:
+    """Request that every submission for an assignment be tested again.
+
+    Required arguments: class_name, assignment
+    """
+
+    class_name = _get_string_argument(arguments, 'class_name')
+    assignment = _get_string_argument(arguments, 'assignment')
+
+    assignment_path = os.path.join(home_dir, class_name, 'assignments',
+                                   assignment)
+
+    if not os.path.isdir(assignment_path):
+        raise RequestError('assignment {0} not in class {1}'
+                           .format(assignment, class_name))
+
+    try:
+        write_regrade_request(regrade_requests_dir(home_dir), class_name,
+                              assignment)
+    except OSError as e:
+        raise RequestError('Error requesting re-grade: {0}'.format(e))
+
+    return ('Every submission for {0} will be tested again. Students will be '
+            'emailed their new results.'.format(assignment))
+
+
+# Each function takes the user's home directory, the username, and the
+# request's arguments, and returns a message for the user
+request_functions_by_type = {
+    'PING': ping,
+    'REGRADE': regrade,
+}
+
+
+class RequestHandler(EventHandler):
+    """Handles a request from a client and logs the response."""
+
+    def handle(self):
+        """Runs the requested function and logs its response."""
+
+        with tracer.span(self.trace_id, 'handle_request',
+                         user=self._username,
+                         request_type=self._request_type) as span:
+            try:
+                message = self._run_request()
+                status = OK
+            except RequestError as e:
+                message = str(e)
+                status = ERROR
+
+            span.attributes['status'] = status
+
+            self._respond(status, message)
+
+    def _run_request(self) -> str:
+        # Run the request's function, raising RequestError if there is none
+
+        if self._request_type not in request_functions_by_type:
+            raise RequestError('Unknown request type: {0}'
+                               .format(self._request_type))
+
+        request_function = request_functions_by_type[self._request_type]
+
+        return request_function(self._home_dir, self._username,
+                                self._arguments)
+
+    def _respond(self, status, message):
+        # Log the response in the user's response log
+
+        response_log_path = build_user_response_log_path(self._home_dir,
+                                                         self._username)
+        payload = format_response_payload(self._request_id, status, message)
+
+        try:
+            LocalLogFileWriter(response_log_path).log(RESPONSE_EVENT_TYPE,
+                                                      payload)
+        except LogFileException as e:
+            # FIXME - log this
+            print('Error responding to request {0}: {1}'
+                  .format(self._request_id, e))
+
+    def _parse(self):
+        """Extracts the username, home directory, request ID, request type,
+        and arguments from the log event.
+
+        Raises:
+             HandlerException
+
+        Attributes available after parsing:
+            _username
+            _home_dir
+            _request_id
+            _request_type
+            _arguments
+        """
+
+        self._username = parse_user_log_path(self._log_path)
+
+        if self._username is None:
+            raise HandlerException('Malformed log path: {0}'
+                                   .format(self._log_path))
+
+        # the log is in the user's home directory
+        self._home_dir = os.path.dirname(self._log_path)
+
+        try:
+            self._request_id, self._request_type, self._arguments = \
+                parse_request_payload(self._payload)
+        except RequestLogException as e:
+            raise HandlerException(e)
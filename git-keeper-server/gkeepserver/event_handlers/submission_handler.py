@@ -23,6 +23,7 @@ Event type: SUBMISSION
 from gkeepcore.event_handler import EventHandler, HandlerException
 from gkeepcore.path_utils import parse_user_log_path, \
     parse_submission_repo_path
+from gkeepcore.tracing import tracer
 
 
 class SubmissionHandler(EventHandler):
@@ -31,14 +32,19 @@ class SubmissionHandler(EventHandler):
     def handle(self):
         """Takes action after a student pushes a new submission."""
 
-        # FIXME - ensure everything exists, set things up, and run tests
-        print('Handling submission:')
-        print(' Student:   ', self._student_username)
-        print(' Faculty:   ', self._faculty_username)
-        print(' Class:     ', self._class_name)
-        print(' Assignment:', self._assignment_name)
-        print(' Repo path: ', self._submission_repo_path)
-        print()
+        with tracer.span(self.trace_id, 'handle_submission',
+                         student=self._student_username,
+                         assignment=self._assignment_name,
+                         **{'class': self._class_name}):
+            # FIXME - ensure everything exists, set things up, and run tests
+            print('Handling submission:')
+            print(' Student:   ', self._student_username)
+            print(' Faculty:   ', self._faculty_username)
+            print(' Class:     ', self._class_name)
+            print(' Assignment:', self._assignment_name)
+            print(' Repo path: ', self._submission_repo_path)
+            print(' Trace:     ', self.trace_id)
+            print()
 
     def _parse(self):
         """Extracts the student username, faculty username, class name,
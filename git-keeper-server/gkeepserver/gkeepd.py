@@ -19,55 +19,203 @@ import os
 import sys
 from queue import Queue, Empty
 from tempfile import TemporaryDirectory
-from threading import Thread
-from time import strftime, time, sleep
+from functools import partial
+from threading import Thread, Lock
+from time import strftime, time
 
+from action_runner import ActionLimits, ActionLimitsError, LIMITS_FILENAME,\
+    read_action_limits, run_action
 from configuration import GraderConfiguration, ConfigurationError
 from email_sender import Email, process_email_queue
-from inotify_monitors import PushMonitor
+from grading_pool import GradingPool, GradingJob, GradingProgress
+from inotify_monitors import PushMonitor, RosterMonitor, AssignmentMonitor,\
+    RegradeRequestMonitor
+from prepared_environments import PreparedEnvironmentCache,\
+    PreparedEnvironmentError
+from regrade_requests import regrade_requests_dir, is_regrade_request_path,\
+    read_regrade_request, RegradeRequestError
 from repository import Repository
-from subprocess_commands import call_action, CommandError
+from result_cache import ResultCache, NO_RESULT_CACHE_FILENAME
+from subprocess_commands import CommandError
+from update_flag_watches import UpdateFlagWatchManager
 
 import locator
 from student import Student
 
+# Modules which are shared with the log pipeline and the email sender thread
+# are imported through their packages, as those modules import them. Importing
+# them by their bare names as well would load second copies, with a separate
+# metrics registry and tracer which are never written out.
+from gkeepcore.event_journal import EventJournal, EventJournalException
+from gkeepcore.log_event_parser import LogEventParserThread
+from gkeepcore.log_polling import LogPollingThread
+from gkeepcore.metrics import registry, MetricsWriterThread
+from gkeepcore.path_utils import build_user_log_path
+from gkeepcore.tracing import tracer
+from gkeepserver.event_handlers.request_handler import RequestHandler
+from gkeepserver.local_log_file import LocalLogFileReader
+
+
+# limits applied to every run of action.sh, so that one runaway submission
+# cannot stall grading for everyone else
+action_limits = ActionLimits()
+
+# prepared test environments are kept here, see prepared_environments.py
+TEST_ENVIRONMENTS_DIR = \
+    os.path.expanduser('~/.cache/git-keeper/test_environments')
+
+# results of successful test runs are kept here, see result_cache.py
+RESULT_CACHE_DIR = os.path.expanduser('~/.cache/git-keeper/results')
+
+# number of submissions that are tested at the same time
+GRADING_WORKER_COUNT = os.cpu_count() or 1
+
+# the reports of every student in an assignment are pushed to the same
+# repository, so grading threads take turns committing and pushing reports
+report_push_lock = Lock()
+
+# spans of every submission's trace are appended here, see tracing.py
+TRACE_LOG_PATH = os.path.expanduser('~/.cache/git-keeper/trace.log')
+
+# every push is appended here as a SUBMISSION event, as is every event parsed
+# from the logs. See event_journal.py
+EVENT_JOURNAL_PATH = os.path.expanduser('~/.cache/git-keeper/events.journal')
+
+# metrics are written here in the Prometheus text format, see metrics.py
+METRICS_FILE_PATH = os.path.expanduser('~/.cache/git-keeper/metrics.prom')
+
+push_detect_seconds = registry.histogram('gkeep_push_detect_seconds',
+                                         'Time from a push touching '
+                                         'update_flag to gkeepd handling it')
+clone_seconds = registry.histogram('gkeep_clone_seconds',
+                                   'Time taken to clone a submission or '
+                                   'reports repository')
+test_setup_seconds = registry.histogram('gkeep_test_setup_seconds',
+                                        'Time taken to prepare and copy the '
+                                        'tests for a submission')
+action_seconds = registry.histogram('gkeep_action_seconds',
+                                    'Time taken to run action.sh')
+report_commit_seconds = registry.histogram('gkeep_report_commit_seconds',
+                                           'Time taken to commit and push a '
+                                           'report, including waiting for '
+                                           'other threads')
+pushes = registry.counter('gkeep_pushes_total', 'Number of pushes handled')
+grading_failures = registry.counter('gkeep_grading_failures_total',
+                                    'Number of submissions that could not '
+                                    'be tested or whose action.sh failed')
+result_cache_hits = registry.counter('gkeep_result_cache_hits_total',
+                                     'Number of submissions answered with '
+                                     'stored results')
+
+# emails are sent by email_sender.process_email_queue(), which does not record
+# metrics, so only queued emails are counted here. The sent and failed
+# counters are recorded by EmailSenderThread.
+emails_queued = registry.counter('gkeep_emails_queued_total',
+                                 'Number of emails queued by gkeepd')
+
+# upload_assignment copies email.txt into the assignment directory last, so
+# once it has been written the assignment is complete
+ASSIGNMENT_READY_FILENAME = 'email.txt'
+
 
 def write_report(file_path, output, report_repo: Repository,
-                 commit_message='new submission'):
+                 commit_message='new submission', mode='w', trace_id=None):
     try:
-        with open(file_path, 'w') as f:
+        with open(file_path, mode) as f:
             f.write(output)
     except OSError as e:
         print('Error opening {0}:\n{1}'.format(file_path, e), file=sys.stderr)
         report_repo = None
 
+    commit_report(report_repo, commit_message, trace_id)
+
+
+def commit_report(report_repo: Repository, commit_message='new submission',
+                  trace_id=None):
+    # other threads may have pushed reports since the reports repository was
+    # cloned, so pull them first to make the push a fast-forward
     if report_repo is not None:
-        report_repo.add_all_and_commit(commit_message)
-        report_repo.push()
+        with report_commit_seconds.time(), \
+                tracer.span(trace_id, 'commit_report'), report_push_lock:
+            report_repo.pull()
+            report_repo.add_all_and_commit(commit_message)
+            report_repo.push()
 
 
-def create_failure_email(to_address, assignment):
+def create_failure_email(to_address, assignment, trace_id=None):
     subject = '{0}: Failed to process submission - contact instructor'.format(assignment)
     body = ['Your submission was received, but something went wrong.',
             'This is likely your instructor\'s fault, not yours.',
             'Please contact your instructor about this error!']
 
-    return Email(to_address, subject, body)
+    return Email(to_address, subject, body, trace_id=trace_id)
+
+
+def queue_email(email_queue: Queue, email: Email, trace_id=None):
+    # the email thread does not record spans, so the trace ends when the
+    # email is queued. The email carries the trace ID in its headers.
+    email_queue.put(email)
+    emails_queued.inc()
+    tracer.record(trace_id, 'email_queued', time(), time())
 
 
 def report_failure(error, to_address, assignment, email_queue: Queue,
-                   report_path, report_repo):
+                   report_path, report_repo, trace_id=None):
     print('FAILURE: {0}'.format(error), file=sys.stderr)
+    grading_failures.inc()
     write_report(report_path, error, report_repo,
-                 commit_message='new submission, action.sh failure')
-    email_queue.put(create_failure_email(to_address, assignment))
+                 commit_message='new submission, action.sh failure',
+                 trace_id=trace_id)
+    queue_email(email_queue,
+                create_failure_email(to_address, assignment, trace_id),
+                trace_id)
+
+
+def action_failure_message(result, limits: ActionLimits) -> str:
+    if result.timed_out:
+        return ('!!!  ERROR: SCRIPT DID NOT FINISH IN {0} SECONDS  !!!'
+                .format(limits.timeout))
+    elif result.output_truncated:
+        return ('!!!  ERROR: SCRIPT PRODUCED MORE THAN {0} BYTES OF OUTPUT  '
+                '!!!'.format(limits.max_output_bytes))
+    else:
+        return '!!!  ERROR: SCRIPT RETURNED NON-ZERO EXIT CODE  !!!'
+
+
+def report_action_failure(result, limits: ActionLimits, to_address,
+                          assignment, email_queue: Queue, report_path,
+                          report_repo, trace_id=None):
+    # The output of action.sh is already in the report file, so only the
+    # error message is appended to it
+    error = action_failure_message(result, limits)
+    grading_failures.inc()
+    print('FAILURE: {0}\n\n{1}'.format(error, result.output), file=sys.stderr)
+    write_report(report_path, '\n' + error + '\n', report_repo,
+                 commit_message='new submission, action.sh failure',
+                 mode='a', trace_id=trace_id)
+    queue_email(email_queue,
+                create_failure_email(to_address, assignment, trace_id),
+                trace_id)
+
+
+def create_results_email(to_address, assignment, result, trace_id=None):
+    subject = assignment + ' submission test results'
+
+    # the output in the result is already limited to an excerpt
+    body = result.output
+
+    if result.output_byte_count > len(result.output.encode('utf-8')):
+        body += ('\n\nThe test output was {0} bytes long, so only the '
+                 'beginning and the end are included in this email.'
+                 .format(result.output_byte_count))
+
+    return Email(to_address, subject, body, trace_id=trace_id)
 
 
 def run_tests(student_repo: Repository, test_repo: Repository,
               report_repo: Repository, call_action_path, student: Student,
-              email_queue: Queue):
-    starting_dir = os.getcwd()
-
+              email_queue: Queue, test_environments: PreparedEnvironmentCache,
+              result_cache: ResultCache, trace_id=None):
     code_tempdir = TemporaryDirectory()
     test_tempdir = TemporaryDirectory()
     report_tempdir = TemporaryDirectory()
@@ -80,14 +228,13 @@ def run_tests(student_repo: Repository, test_repo: Repository,
 
     tmp_report_repo = None
     try:
-        tmp_report_repo = report_repo.clone_to(report_path)
-        student_repo.clone_to(code_path)
-        test_repo.clone_to(test_path)
+        with clone_seconds.time(), tracer.span(trace_id, 'clone_reports'):
+            tmp_report_repo = report_repo.clone_to(report_path)
     except CommandError as e:
         error = 'Failed to clone:\n{0}'.format(e)
         report_failure(error, student.email_address, student_repo.assignment,
-                       email_queue, report_file_path, tmp_report_repo)
-        os.chdir(starting_dir)
+                       email_queue, report_file_path, tmp_report_repo,
+                       trace_id)
         return
 
     report_filename = 'report-{0}.txt'.format(strftime('%Y-%m-%d-%H:%M:%S-%Z'))
@@ -98,42 +245,498 @@ def run_tests(student_repo: Repository, test_repo: Repository,
             report_file_path = os.path.join(item_path, report_filename)
             break
 
-    os.chdir(test_path)
+    if report_file_path == '':
+        error = 'No report directory for {0}'.format(student.username)
+        report_failure(error, student.email_address, student_repo.assignment,
+                       email_queue, report_file_path, tmp_report_repo,
+                       trace_id)
+        return
 
+    # the tests are copied from an environment prepared once per commit of
+    # the tests repository
     try:
-        output = call_action(call_action_path, code_path, student.first_name,
-                             student.last_name, student.username,
-                             student.email_address)
+        with test_setup_seconds.time(), \
+                tracer.span(trace_id, 'prepare_tests'):
+            tests_hash, environment_path = \
+                test_environments.prepare(test_repo)
+    except PreparedEnvironmentError as e:
+        error = 'Failed to set up tests:\n{0}'.format(e)
+        report_failure(error, student.email_address, student_repo.assignment,
+                       email_queue, report_file_path, tmp_report_repo,
+                       trace_id)
+        return
+
+    # the environment is not removed while it is in use
+    try:
+        run_prepared_tests(student_repo, test_repo, tmp_report_repo,
+                           call_action_path, student, email_queue,
+                           test_environments, result_cache, tests_hash,
+                           environment_path, code_path, test_path,
+                           report_file_path, trace_id)
+    finally:
+        test_environments.release(environment_path)
+
+
+def run_prepared_tests(student_repo: Repository, test_repo: Repository,
+                       tmp_report_repo: Repository, call_action_path,
+                       student: Student, email_queue: Queue,
+                       test_environments: PreparedEnvironmentCache,
+                       result_cache: ResultCache, tests_hash,
+                       environment_path, code_path, test_path,
+                       report_file_path, trace_id=None):
+    # the submission is cloned first so that the results are looked up and
+    # stored for the commit that is actually tested, even if the student
+    # pushes again in the meantime
+    try:
+        with clone_seconds.time(), tracer.span(trace_id, 'clone_submission'):
+            code_repo = student_repo.clone_to(code_path)
     except CommandError as e:
-        error = '!!!  ERROR: SCRIPT RETURNED NON-ZERO EXIT CODE  !!!\n\n'
-        error += str(e)
+        error = 'Failed to set up the submission:\n{0}'.format(e)
         report_failure(error, student.email_address, student_repo.assignment,
-                       email_queue, report_file_path, tmp_report_repo)
-        os.chdir(starting_dir)
+                       email_queue, report_file_path, tmp_report_repo,
+                       trace_id)
         return
 
-    write_report(report_file_path, output, tmp_report_repo)
+    # a commit that was already tested against these tests gets the stored
+    # results, unless the tests opt out of caching
+    submission_hash = code_repo.get_head_hash()
+    no_cache_path = os.path.join(environment_path, NO_RESULT_CACHE_FILENAME)
+    use_cache = submission_hash != '' and not os.path.isfile(no_cache_path)
+
+    if use_cache:
+        cached = result_cache.get(test_repo.path, tests_hash,
+                                  student.username, submission_hash)
+        if cached is not None:
+            result, report = cached
+            print('Using stored results for {0}'.format(submission_hash))
+            result_cache_hits.inc()
+            tracer.record(trace_id, 'result_cache_hit', time(), time(),
+                          submission=submission_hash)
+            write_report(report_file_path, report, tmp_report_repo,
+                         trace_id=trace_id)
+            queue_email(email_queue,
+                        create_results_email(student.email_address,
+                                             student_repo.assignment, result,
+                                             trace_id),
+                        trace_id)
+            return
+
+    try:
+        with test_setup_seconds.time(), tracer.span(trace_id, 'copy_tests'):
+            test_environments.copy_environment(environment_path, test_path)
+    except PreparedEnvironmentError as e:
+        error = 'Failed to set up the submission:\n{0}'.format(e)
+        report_failure(error, student.email_address, student_repo.assignment,
+                       email_queue, report_file_path, tmp_report_repo,
+                       trace_id)
+        return
+
+    # the tests may override the default limits
+    try:
+        limits = read_action_limits(os.path.join(environment_path,
+                                                 LIMITS_FILENAME),
+                                    action_limits)
+    except ActionLimitsError as e:
+        report_failure(str(e), student.email_address,
+                       student_repo.assignment, email_queue, report_file_path,
+                       tmp_report_repo, trace_id)
+        return
+
+    action_command = ['bash', call_action_path, code_path,
+                      student.first_name, student.last_name, student.username,
+                      student.email_address]
+
+    # the output is streamed into the report file as action.sh runs
+    try:
+        with action_seconds.time(), \
+                tracer.span(trace_id, 'action') as span:
+            result = run_action(action_command, test_path, limits,
+                                report_file_path)
+            span.attributes['exit_code'] = result.exit_code
+            span.attributes['timed_out'] = result.timed_out
+    except OSError as e:
+        error = 'Failed to run action.sh:\n{0}'.format(e)
+        report_failure(error, student.email_address, student_repo.assignment,
+                       email_queue, report_file_path, tmp_report_repo,
+                       trace_id)
+        return
+
+    if not result.succeeded:
+        report_action_failure(result, limits, student.email_address,
+                              student_repo.assignment, email_queue,
+                              report_file_path, tmp_report_repo, trace_id)
+        return
+
+    if use_cache:
+        result_cache.put(test_repo.path, tests_hash, student.username,
+                         submission_hash, result, report_file_path)
+
+    commit_report(tmp_report_repo, trace_id=trace_id)
+
+    queue_email(email_queue,
+                create_results_email(student.email_address,
+                                     student_repo.assignment, result,
+                                     trace_id),
+                trace_id)
+
+
+class ClassState:
+    """State that is kept separately for each class served by the daemon.
 
-    email_subject = student_repo.assignment + ' submission test results'
-    email_queue.put(Email(student.email_address, email_subject, output))
+    Everything else, including inotify monitors, the email thread, and the
+    student roster, is shared by all classes.
+    """
+
+    def __init__(self, class_name, config: GraderConfiguration):
+        self.class_name = class_name
+        self.assignments_path = os.path.join(config.home_dir, class_name,
+                                             'assignments')
+
+        # assignments which are complete and being graded
+        self.active_assignments = set()
+
+        # assignments whose directories exist but which are not completely
+        # uploaded yet
+        self.pending_assignments = set()
+
+
+def add_update_flag_watches(class_name, watch_manager: UpdateFlagWatchManager,
+                            assignments, students):
+    # Watch the update_flag files of the given students' repositories for the
+    # given assignments. The repository paths are built directly rather than
+    # found by listing each student's class directory.
+    for student in students:
+        assert isinstance(student, Student)
+        for assignment in assignments:
+            repo_path = student.get_bare_repo_dir(class_name, assignment)
+            repo = Repository(repo_path, assignment, is_bare=True,
+                              student_username=student.username)
+            watch_manager.add_repository(class_name, repo)
+
+
+def reload_rosters(class_states, config: GraderConfiguration,
+                   roster_file_queue: Queue,
+                   watch_manager: UpdateFlagWatchManager):
+    # Apply any changes to the student CSV files of the served classes
+    # without restarting. Only the students that were added or removed have
+    # their watches changed.
+    class_names_by_csv_path = {}
+    for class_name in class_states:
+        csv_path = config.students_csv_filenames_by_class[class_name]
+        class_names_by_csv_path[csv_path] = class_name
+
+    changed_class_names = set()
+
+    try:
+        while True:
+            csv_path = roster_file_queue.get(block=False)
+            if csv_path in class_names_by_csv_path:
+                changed_class_names.add(class_names_by_csv_path[csv_path])
+            else:
+                print('{0} is not a served class, restart to serve it'
+                      .format(csv_path))
+    except Empty:
+        pass
+
+    for class_name in changed_class_names:
+        reload_roster(class_states[class_name], config, watch_manager)
+
+
+def reload_roster(class_state: ClassState, config: GraderConfiguration,
+                  watch_manager: UpdateFlagWatchManager):
+    class_name = class_state.class_name
+
+    try:
+        added, removed = config.reload_class(class_name)
+    except ConfigurationError as e:
+        print('Not reloading {0}:\n{1}'.format(class_name, e),
+              file=sys.stderr)
+        return
+
+    for student in removed:
+        watch_manager.remove_student(class_name, student.username)
+
+    add_update_flag_watches(class_name, watch_manager,
+                            class_state.active_assignments, added)
+
+    for student in removed:
+        print('{0}: Removed student {1}'.format(class_name, student))
+    for student in added:
+        print('{0}: Added student {1}'.format(class_name, student))
+
+
+def activate_assignment(class_state: ClassState, assignment,
+                        config: GraderConfiguration,
+                        watch_manager: UpdateFlagWatchManager, email_queue):
+    class_name = class_state.class_name
+
+    print('{0}: Adding assignment {1}'.format(class_name, assignment))
+
+    email_file_path = os.path.join(class_state.assignments_path, assignment,
+                                   ASSIGNMENT_READY_FILENAME)
+
+    add_update_flag_watches(class_name, watch_manager, [assignment],
+                            config.students_by_class[class_name])
+    email_students_new_assignment(class_name, assignment, email_file_path,
+                                  config, email_queue)
+
+
+def deactivate_assignment(class_state: ClassState, assignment,
+                          assignment_monitor: AssignmentMonitor,
+                          watch_manager: UpdateFlagWatchManager):
+    # Forget an assignment whose directory was removed, such as by
+    # delete_assignment, so that an assignment with the same name may be
+    # uploaded again
+    class_name = class_state.class_name
+
+    if assignment in class_state.active_assignments:
+        print('{0}: Removing assignment {1}'.format(class_name, assignment))
+        class_state.active_assignments.remove(assignment)
+        watch_manager.remove_assignment(class_name, assignment)
+
+    if assignment in class_state.pending_assignments:
+        class_state.pending_assignments.remove(assignment)
+        assignment_monitor.remove_file(
+            os.path.join(class_state.assignments_path, assignment))
+
+
+def process_ignored_watches(ignored_wd_queue: Queue,
+                            watch_manager: UpdateFlagWatchManager):
+    # Forget the watches which inotify has removed, without blocking. Watch
+    # descriptors are allocated cyclically by the kernel, so one is not
+    # reused before its IN_IGNORED event has been handled.
+    try:
+        while True:
+            watch_manager.forget_watch(ignored_wd_queue.get(block=False))
+    except Empty:
+        pass
+
+
+def process_assignment_events(class_states_by_assignments_path,
+                              assignment_file_queue: Queue,
+                              assignment_monitor: AssignmentMonitor,
+                              config: GraderConfiguration,
+                              watch_manager: UpdateFlagWatchManager,
+                              email_queue):
+    # Handle every path currently in the queue without blocking.
+    #
+    # A new directory in an assignments directory is a pending assignment,
+    # and its directory is watched until the ready file is written. Since the
+    # ready file may have been written before the watch was added, its
+    # existence is checked right after adding the watch. A removed directory
+    # in an assignments directory is an assignment which is no longer served.
+    try:
+        while True:
+            path, removed = assignment_file_queue.get(block=False)
+            parent_path, name = os.path.split(path)
+
+            if removed:
+                if parent_path in class_states_by_assignments_path:
+                    deactivate_assignment(
+                        class_states_by_assignments_path[parent_path], name,
+                        assignment_monitor, watch_manager)
+                continue
+
+            if parent_path in class_states_by_assignments_path:
+                class_state = class_states_by_assignments_path[parent_path]
+                assignment = name
+                if (assignment in class_state.active_assignments or
+                        assignment in class_state.pending_assignments):
+                    continue
+
+                class_state.pending_assignments.add(assignment)
+                assignment_monitor.add_file(path)
+
+                ready_path = os.path.join(path, ASSIGNMENT_READY_FILENAME)
+                if not os.path.isfile(ready_path):
+                    continue
+            elif (name == ASSIGNMENT_READY_FILENAME and
+                  os.path.dirname(parent_path) in
+                  class_states_by_assignments_path):
+                assignments_path = os.path.dirname(parent_path)
+                class_state = \
+                    class_states_by_assignments_path[assignments_path]
+                assignment = os.path.basename(parent_path)
+                if assignment not in class_state.pending_assignments:
+                    continue
+            else:
+                continue
+
+            class_state.pending_assignments.remove(assignment)
+            assignment_monitor.remove_file(
+                os.path.join(class_state.assignments_path, assignment))
+            class_state.active_assignments.add(assignment)
+
+            activate_assignment(class_state, assignment, config,
+                                watch_manager, email_queue)
+    except Empty:
+        pass
+
+
+def handle_push(class_name, repo: Repository, config: GraderConfiguration,
+                grading_pool: GradingPool, journal: EventJournal=None):
+    student = config.roster.get_class_student(class_name,
+                                              repo.student_username)
+
+    # the student may have been removed after the event was queued
+    if student is None:
+        return
 
-    os.chdir(starting_dir)
+    job = GradingJob(class_name, repo, student)
 
+    print('{0}: New push from {1}, trace {2}'.format(class_name,
+                                                     student.username,
+                                                     job.trace_id))
+    pushes.inc()
+
+    # the post-update hook touches update_flag, so its modification time is
+    # when the push finished
+    detect_time = time()
+    try:
+        update_flag_mtime = os.stat(repo.get_update_flag_path()).st_mtime
+    except OSError:
+        update_flag_mtime = detect_time
+
+    push_detect_seconds.observe(max(detect_time - update_flag_mtime, 0))
+    tracer.record(job.trace_id, 'push_detect', update_flag_mtime, detect_time,
+                  student=student.username, assignment=repo.assignment,
+                  **{'class': class_name})
+
+    if journal is not None:
+        try:
+            journal.append(int(update_flag_mtime), student.username,
+                           'SUBMISSION', repo.path)
+        except EventJournalException as e:
+            print(e, file=sys.stderr)
+
+    grading_pool.submit(job)
+
+
+def handle_missed_pushes(watch_manager: UpdateFlagWatchManager,
+                         config: GraderConfiguration,
+                         grading_pool: GradingPool, journal: EventJournal):
+    # Pushes made while gkeepd was not running are never noticed by inotify.
+    # A repository whose update_flag was modified after its last journaled
+    # submission was pushed to in the meantime. Repositories without any
+    # journaled submission are skipped, since their update_flag may only have
+    # been created along with the repository.
+    try:
+        submissions = journal.query(event_type='SUBMISSION')
+    except EventJournalException as e:
+        print(e, file=sys.stderr)
+        return
+
+    last_submission_times = {}
+    for record in submissions:
+        last_submission_times[record.payload] = record.timestamp
+
+    for class_name, repo in watch_manager.repositories():
+        if repo.path not in last_submission_times:
+            continue
+
+        try:
+            update_flag_mtime = os.stat(repo.get_update_flag_path()).st_mtime
+        except OSError:
+            continue
+
+        if int(update_flag_mtime) > last_submission_times[repo.path]:
+            handle_push(class_name, repo, config, grading_pool, journal)
+
+
+def grade(job: GradingJob, class_states, call_action_path, email_queue,
+          test_environments: PreparedEnvironmentCache,
+          result_cache: ResultCache):
+    # Called by the grading pool's worker threads
+
+    repo = job.repo
+    class_state = class_states[job.class_name]
+
+    assignment_path = os.path.join(class_state.assignments_path,
+                                   repo.assignment)
+    test_repo_path = os.path.join(assignment_path,
+                                  repo.assignment + '_tests.git')
+    reports_repo_path = os.path.join(assignment_path,
+                                     repo.assignment + '_reports.git')
+    test_repo = Repository(test_repo_path, repo.assignment, is_bare=True)
+    reports_repo = Repository(reports_repo_path, repo.assignment,
+                              is_bare=True)
+    run_tests(repo, test_repo, reports_repo, call_action_path, job.student,
+              email_queue, test_environments, result_cache, job.trace_id)
+
+
+def process_regrade_requests(class_states, regrade_request_queue: Queue,
+                             config: GraderConfiguration,
+                             grading_pool: GradingPool):
+    # Handle every request currently in the queue without blocking. Requests
+    # are removed once they are handled, whether or not they were valid.
+    try:
+        while True:
+            request_path = regrade_request_queue.get(block=False)
+
+            try:
+                class_name, assignment = read_regrade_request(request_path)
+            except RegradeRequestError as e:
+                print(e, file=sys.stderr)
+                continue
+            finally:
+                try:
+                    os.remove(request_path)
+                except OSError:
+                    pass
+
+            if class_name not in class_states:
+                print('Cannot re-grade {0} {1}, {0} is not a served class'
+                      .format(class_name, assignment), file=sys.stderr)
+            elif assignment not in class_states[class_name].active_assignments:
+                print('Cannot re-grade {0} {1}, no such assignment'
+                      .format(class_name, assignment), file=sys.stderr)
+            else:
+                regrade_assignment(class_name, assignment, config,
+                                   grading_pool)
+    except Empty:
+        pass
+
+
+def process_requests(request_handler_queue: Queue):
+    # Handle every request from a client currently in the queue without
+    # blocking. Each handler logs its own response.
+    try:
+        while True:
+            request_handler_queue.get(block=False).handle()
+    except Empty:
+        pass
+
+
+def regrade_assignment(class_name, assignment, config: GraderConfiguration,
+                       grading_pool: GradingPool):
+    # Queue the submission repository of every student in the class. The
+    # HEAD of each repository is read directly from its files, so checking
+    # all of them does not start a git process per student.
+    jobs = []
 
-def add_update_flag_watches(class_name, config: GraderConfiguration,
-                            push_monitor: PushMonitor,
-                            repos_by_update_flag_path,
-                            assignment=None):
     for student in config.students_by_class[class_name]:
         assert isinstance(student, Student)
-        repos = student.get_class_repositories(class_name)
-        for repo in repos:
-            assert isinstance(repo, Repository)
-            update_flag_path = repo.get_update_flag_path()
-            if update_flag_path not in repos_by_update_flag_path \
-                    or assignment == repo.assignment:
-                repos_by_update_flag_path[update_flag_path] = repo
-                push_monitor.add_file(update_flag_path)
+        repo_path = student.get_bare_repo_dir(class_name, assignment)
+        repo = Repository(repo_path, assignment, is_bare=True,
+                          student_username=student.username)
+
+        if repo.get_head_hash() == '':
+            print('{0}: No submission repository for {1}, not re-grading'
+                  .format(class_name, student.username), file=sys.stderr)
+            continue
+
+        jobs.append(GradingJob(class_name, repo, student))
+
+    description = '{0}: Re-grading {1}'.format(class_name, assignment)
+    print('{0}: {1} submissions queued'.format(description, len(jobs)))
+
+    progress = GradingProgress(description, len(jobs))
+
+    for job in jobs:
+        tracer.record(job.trace_id, 'regrade_request', time(), time(),
+                      student=job.student.username, assignment=assignment,
+                      **{'class': class_name})
+        grading_pool.submit(job, progress)
 
 
 def email_students_new_assignment(class_name, assignment, email_file_path,
@@ -156,113 +759,215 @@ def email_students_new_assignment(class_name, assignment, email_file_path,
         email_body = 'Clone URL:\n{0}\n\n{1}'.format(clone_url,
                                                      email_body_from_file)
 
-        email_queue.put(Email(student.email_address, email_subject, email_body))
+        queue_email(email_queue,
+                    Email(student.email_address, email_subject, email_body))
 
 
 def main():
-    if len(sys.argv) != 2:
-        sys.exit('Usage: {0} <class name>'.format(sys.argv[0]))
-
-    class_name = sys.argv[1]
-
     try:
         config = GraderConfiguration(on_grading_server=True)
     except ConfigurationError as e:
         sys.exit(e)
 
-    if class_name not in config.students_by_class:
-        sys.exit('No student CSV file for {0}'.format(class_name))
+    # serve every class unless specific classes are given
+    if len(sys.argv) > 1:
+        class_names = sys.argv[1:]
+    else:
+        class_names = sorted(config.students_by_class.keys())
+
+    for class_name in class_names:
+        if class_name not in config.students_by_class:
+            sys.exit('No student CSV file for {0}'.format(class_name))
 
     call_action_path = os.path.join(locator.module_path(), 'call_action.sh')
 
     if not os.path.isfile(call_action_path):
         sys.exit('{0} does not exist'.format(call_action_path))
 
+    try:
+        test_environments = PreparedEnvironmentCache(TEST_ENVIRONMENTS_DIR,
+                                                     action_limits)
+    except OSError as e:
+        sys.exit('Error creating {0}:\n{1}'.format(TEST_ENVIRONMENTS_DIR, e))
+
+    try:
+        result_cache = ResultCache(RESULT_CACHE_DIR)
+    except OSError as e:
+        sys.exit('Error creating {0}:\n{1}'.format(RESULT_CACHE_DIR, e))
+
     update_flag_queue = Queue()
-    push_monitor = PushMonitor(update_flag_queue)
+    ignored_wd_queue = Queue()
+    push_monitor = PushMonitor(update_flag_queue, ignored_wd_queue)
+
+    # stores student submission repositories of every class indexed by the
+    # watch descriptors of their update_flag files
+    watch_manager = UpdateFlagWatchManager(push_monitor)
+
+    # student CSV files are watched so that roster changes can be applied
+    # without restarting
+    roster_file_queue = Queue()
+    roster_monitor = RosterMonitor(roster_file_queue)
+    roster_monitor.add_directory(config.config_dir)
 
-    # stores student submission repositories indexed by their
-    # update_flag file paths, which are watched by inotify
-    repos_by_update_flag_path = {}
+    # a single monitor watches the assignments directories of all classes
+    assignment_file_queue = Queue()
+    assignment_monitor = AssignmentMonitor(assignment_file_queue)
 
-    add_update_flag_watches(class_name, config, push_monitor,
-                            repos_by_update_flag_path)
+    class_states = {}
+    class_states_by_assignments_path = {}
 
-    assignments_path = os.path.join(config.home_dir, class_name, 'assignments')
+    for class_name in class_names:
+        class_state = ClassState(class_name, config)
 
-    active_assignments = set(os.listdir(assignments_path))
+        if not os.path.isdir(class_state.assignments_path):
+            print('{0} does not exist, not serving {1}'
+                  .format(class_state.assignments_path, class_name),
+                  file=sys.stderr)
+            continue
 
-    print('Current assignments:')
-    for assignment in active_assignments:
-        print(assignment)
+        # start watching for new assignments before listing the existing
+        # ones so that none are missed
+        assignment_monitor.add_file(class_state.assignments_path)
 
-    last_assignment_poll_time = time()
+        class_state.active_assignments = \
+            set(os.listdir(class_state.assignments_path))
 
+        add_update_flag_watches(class_name, watch_manager,
+                                class_state.active_assignments,
+                                config.students_by_class[class_name])
+
+        class_states[class_name] = class_state
+        class_states_by_assignments_path[class_state.assignments_path] = \
+            class_state
+
+        print('Current assignments for {0}:'.format(class_name))
+        for assignment in sorted(class_state.active_assignments):
+            print(assignment)
+
+    if len(class_states) == 0:
+        sys.exit('No classes to serve')
+
+    # Everything that may stop the daemon is done before the email thread and
+    # the grading pool are started, since those threads would keep the
+    # process running after sys.exit()
+    requests_dir = regrade_requests_dir(config.home_dir)
+    try:
+        os.makedirs(requests_dir, exist_ok=True)
+    except OSError as e:
+        sys.exit('Error creating {0}:\n{1}'.format(requests_dir, e))
+
+    # clients make requests by logging REQUEST events in the faculty log,
+    # which is polled for new lines. The log must exist to be polled.
+    request_log_path = build_user_log_path(config.home_dir, config.username)
+    try:
+        open(request_log_path, 'a').close()
+    except OSError as e:
+        sys.exit('Error creating {0}:\n{1}'.format(request_log_path, e))
+
+    try:
+        os.makedirs(os.path.dirname(METRICS_FILE_PATH), exist_ok=True)
+    except OSError as e:
+        sys.exit('Error creating {0}:\n{1}'
+                 .format(os.path.dirname(METRICS_FILE_PATH), e))
+
+    try:
+        tracer.open(TRACE_LOG_PATH)
+    except OSError as e:
+        sys.exit('Error opening {0}:\n{1}'.format(TRACE_LOG_PATH, e))
+
+    try:
+        journal = EventJournal(EVENT_JOURNAL_PATH)
+    except OSError as e:
+        sys.exit('Error opening {0}:\n{1}'.format(EVENT_JOURNAL_PATH, e))
+
+    # emails from all classes go through one queue and one thread
     email_queue = Queue()
     email_thread = Thread(target=process_email_queue, args=(email_queue,
-                                                            class_name,
+                                                            None,
                                                             config))
     email_thread.start()
 
+    # submissions are tested in parallel by the pool's worker threads
+    grade_function = partial(grade, class_states=class_states,
+                             call_action_path=call_action_path,
+                             email_queue=email_queue,
+                             test_environments=test_environments,
+                             result_cache=result_cache)
+    grading_pool = GradingPool(GRADING_WORKER_COUNT, grade_function)
+
+    # re-grade requests are watched before the existing ones are listed so
+    # that none are missed
+    regrade_request_queue = Queue()
+    regrade_request_monitor = RegradeRequestMonitor(regrade_request_queue)
+    regrade_request_monitor.add_directory(requests_dir)
+
+    for name in sorted(os.listdir(requests_dir)):
+        request_path = os.path.join(requests_dir, name)
+        if is_regrade_request_path(request_path):
+            regrade_request_queue.put(request_path)
+
+    add_log_queue = Queue()
+    new_log_line_queue = Queue()
+    request_handler_queue = Queue()
+
+    log_poller = LogPollingThread(add_log_queue, new_log_line_queue)
+    log_parser = LogEventParserThread(new_log_line_queue,
+                                      request_handler_queue,
+                                      {'REQUEST': RequestHandler},
+                                      journal=journal)
+
+    # neither thread ever returns, so they must not keep the daemon running
+    log_poller.daemon = True
+    log_parser.daemon = True
+
+    add_log_queue.put(LocalLogFileReader(request_log_path))
+    log_poller.start()
+    log_parser.start()
+
+    registry.gauge('gkeep_update_flag_queue_depth',
+                   'Number of pushes waiting to be handled',
+                   update_flag_queue.qsize)
+    registry.gauge('gkeep_email_queue_depth',
+                   'Number of emails waiting to be sent', email_queue.qsize)
+    registry.gauge('gkeep_update_flag_watches',
+                   'Number of submission repositories being watched',
+                   lambda: len(watch_manager))
+
+    metrics_writer = MetricsWriterThread(registry, METRICS_FILE_PATH)
+    metrics_writer.start()
+
+    handle_missed_pushes(watch_manager, config, grading_pool, journal)
+
     print('daemon initialized, waiting for pushes')
 
     while True:
         try:
-            if time() - last_assignment_poll_time > 5:
-                current_assignments = set(os.listdir(assignments_path))
-                last_assignment_poll_time = time()
-
-                if current_assignments != active_assignments:
-                    new_assignments = \
-                        current_assignments.difference(active_assignments)
-                    for new_assignment in new_assignments:
-                        print('I see a new directory for assignment {0}'
-                              .format(new_assignment))
-                        new_assignment_path = os.path.join(assignments_path,
-                                                           new_assignment)
-                        print('Path:', new_assignment_path)
-                        email_file_path = os.path.join(new_assignment_path,
-                                                       'email.txt')
-
-                        retries = 0
-                        while (not os.path.isfile(email_file_path) and
-                               retries < 10):
-                            retries += 1
-                            print('I see no email.txt, retry', retries)
-                            sleep(2)
-
-                        if os.path.isfile(email_file_path):
-                            print('email.txt exists, adding assignment')
-                            add_update_flag_watches(class_name, config,
-                                                    push_monitor,
-                                                    repos_by_update_flag_path,
-                                                    assignment=new_assignment)
-                            email_students_new_assignment(class_name,
-                                                          new_assignment,
-                                                          email_file_path,
-                                                          config, email_queue)
-                        else:
-                            print('No email.txt, skipping assignment')
-
-                    active_assignments = current_assignments
-
-            update_flag_path = update_flag_queue.get(block=True, timeout=0.5)
-            repo = repos_by_update_flag_path[update_flag_path]
+            reload_rosters(class_states, config, roster_file_queue,
+                           watch_manager)
+
+            process_assignment_events(class_states_by_assignments_path,
+                                      assignment_file_queue,
+                                      assignment_monitor, config,
+                                      watch_manager, email_queue)
+
+            process_regrade_requests(class_states, regrade_request_queue,
+                                     config, grading_pool)
+
+            process_ignored_watches(ignored_wd_queue, watch_manager)
+
+            process_requests(request_handler_queue)
+
+            wd = update_flag_queue.get(block=True, timeout=0.5)
+            watched = watch_manager.get_repository(wd)
+
+            # the student may have been removed after the event was queued
+            if watched is None:
+                continue
+
+            class_name, repo = watched
             assert isinstance(repo, Repository)
-            student = config.students_by_username[repo.student_username]
-            print('{0}: New push from {1}'.format(class_name, student.username))
-            test_repo_path = os.path.join(assignments_path,
-                                          repo.assignment,
-                                          repo.assignment + '_tests.git')
-            reports_repo_path = os.path.join(assignments_path,
-                                             repo.assignment,
-                                             repo.assignment + '_reports.git')
-            test_repo = Repository(test_repo_path, repo.assignment,
-                                   is_bare=True)
-            reports_repo = Repository(reports_repo_path, repo.assignment,
-                                      is_bare=True)
-            run_tests(repo, test_repo, reports_repo, call_action_path,
-                      student, email_queue)
+
+            handle_push(class_name, repo, config, grading_pool, journal)
         except Empty:
             pass
         except KeyboardInterrupt:
@@ -271,6 +976,11 @@ def main():
 
     print('Shutting down')
 
+    print('Waiting for submissions that are being tested')
+    discarded = grading_pool.shutdown()
+    if discarded > 0:
+        print('{0} queued submissions were not tested'.format(discarded))
+
     email_queue.put(None)
     emailer_shutdown_time = 10
     print('Waiting up to {0} seconds for emailer to shut down'
@@ -278,6 +988,13 @@ def main():
 
     email_thread.join(timeout=emailer_shutdown_time)
 
+    metrics_writer.shutdown()
+    metrics_writer.join()
+
+    tracer.close()
+
+    journal.close()
+
 
 if __name__ == '__main__':
     main()
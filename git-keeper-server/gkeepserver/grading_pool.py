@@ -0,0 +1,234 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides a pool of threads which test submissions in parallel.
+
+Submissions are tested by calling a grading function with a GradingJob. The
+function must be safe to call from several threads at once.
+
+A job for a repository that is still waiting in the queue is not queued a
+second time, since the waiting job will test whatever the repository contains
+when it starts.
+
+Jobs may be submitted with a GradingProgress object, which tracks how many
+of a group of jobs are done. The re-grading of a whole assignment uses this
+to report its progress and throughput.
+
+Example usage:
+
+    pool = GradingPool(4, grade)
+
+    progress = GradingProgress('cs100 hw1 re-grade', len(jobs))
+    for job in jobs:
+        pool.submit(job, progress)
+
+    ...
+
+    pool.shutdown()
+"""
+
+
+import sys
+from queue import Queue, Empty
+from threading import Thread, Lock, current_thread
+from time import time
+
+from gkeepcore.metrics import registry
+from repository import Repository
+from gkeepcore.tracing import tracer, new_trace_id
+
+
+_queue_wait_seconds = registry.histogram('gkeep_grading_queue_wait_seconds',
+                                         'Time submissions wait in the '
+                                         'queue for a grading thread')
+_grading_seconds = registry.histogram('gkeep_grading_seconds',
+                                      'Time taken to test a submission and '
+                                      'report the results')
+
+
+class GradingJob:
+    """A student repository that needs to be tested.
+
+    Attributes:
+        class_name - name of the class the repository belongs to
+        repo - the student's bare submission repository
+        student - the Student who owns the repository
+        queued_time - time the job was submitted to the pool, in seconds
+         since the epoch
+        trace_id - ID of the trace that spans of the job are recorded in
+    """
+
+    def __init__(self, class_name, repo: Repository, student, trace_id=None):
+        self.class_name = class_name
+        self.repo = repo
+        self.student = student
+        self.queued_time = None
+
+        if trace_id is None:
+            trace_id = new_trace_id()
+        self.trace_id = trace_id
+
+
+class GradingProgress:
+    """Tracks the progress of a group of jobs and prints it as jobs finish.
+
+    Attributes:
+        description - describes the group of jobs in printed messages
+        total - number of jobs in the group
+        finished - number of jobs that have finished
+        start_time - time the group was created, in seconds since the epoch
+    """
+
+    def __init__(self, description, total):
+        self.description = description
+        self.total = total
+        self.finished = 0
+        self.start_time = time()
+
+        self._lock = Lock()
+
+    @property
+    def done(self) -> bool:
+        """True once every job in the group has finished"""
+        return self.finished >= self.total
+
+    def job_finished(self):
+        """Record that a job finished, called by the worker threads."""
+
+        with self._lock:
+            self.finished += 1
+            finished = self.finished
+
+        elapsed = max(time() - self.start_time, 0.001)
+        rate = finished / elapsed * 60
+
+        if finished < self.total:
+            print('{0}: {1}/{2} done, {3:.1f} submissions per minute'
+                  .format(self.description, finished, self.total, rate))
+        else:
+            print('{0}: all {1} done in {2:.1f} seconds, {3:.1f} submissions '
+                  'per minute'.format(self.description, self.total, elapsed,
+                                      rate))
+
+
+class GradingPool:
+    """Runs a grading function on submitted jobs with a fixed number of
+    worker threads."""
+
+    def __init__(self, worker_count: int, grade_function):
+        """
+        :param worker_count: number of jobs that may be graded at once
+        :param grade_function: function which is called with a GradingJob
+        """
+
+        self._grade_function = grade_function
+        self._job_queue = Queue()
+
+        # paths of repositories with a job that has not started yet
+        self._queued_paths = set()
+        self._queued_paths_lock = Lock()
+
+        registry.gauge('gkeep_grading_queue_depth',
+                       'Number of submissions waiting for a grading thread',
+                       self.queue_size)
+
+        self._workers = []
+        for i in range(worker_count):
+            worker = Thread(target=self._work, name='grader-{0}'.format(i))
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, job: GradingJob, progress: GradingProgress=None):
+        """Queue a job to be graded.
+
+        If a job for the same repository is already waiting the job is not
+        queued again, but it still counts towards the progress.
+
+        :param job: the job to queue
+        :param progress: optional GradingProgress to update when the job is
+         finished
+        """
+
+        with self._queued_paths_lock:
+            if job.repo.path in self._queued_paths:
+                if progress is not None:
+                    progress.job_finished()
+                return
+            self._queued_paths.add(job.repo.path)
+
+        job.queued_time = time()
+        self._job_queue.put((job, progress))
+
+    def queue_size(self) -> int:
+        """Get the number of jobs waiting for a worker."""
+        return self._job_queue.qsize()
+
+    def shutdown(self, timeout=None) -> int:
+        """Stop the workers once they finish their current jobs. Jobs that
+        have not started are discarded.
+
+        :param timeout: seconds to wait for each worker, or None to wait for
+         as long as it takes
+        :return: the number of jobs that were discarded
+        """
+
+        discarded = 0
+        try:
+            while True:
+                self._job_queue.get(block=False)
+                discarded += 1
+        except Empty:
+            pass
+
+        for worker in self._workers:
+            self._job_queue.put(None)
+
+        for worker in self._workers:
+            worker.join(timeout=timeout)
+
+        return discarded
+
+    def _work(self):
+        # Worker thread loop. A None item means shut down.
+
+        while True:
+            item = self._job_queue.get()
+
+            if item is None:
+                return
+
+            job, progress = item
+
+            with self._queued_paths_lock:
+                self._queued_paths.discard(job.repo.path)
+
+            start_time = time()
+            _queue_wait_seconds.observe(start_time - job.queued_time)
+            tracer.record(job.trace_id, 'grading_queue', job.queued_time,
+                          start_time)
+
+            try:
+                with _grading_seconds.time(), \
+                        tracer.span(job.trace_id, 'grade',
+                                    thread=current_thread().name):
+                    self._grade_function(job)
+            except Exception as e:
+                # one bad submission must not take the worker down with it
+                print('Error grading {0}:\n{1}'.format(job.repo.path, e),
+                      file=sys.stderr)
+
+            if progress is not None:
+                progress.job_finished()
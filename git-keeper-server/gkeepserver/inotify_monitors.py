@@ -18,27 +18,41 @@ import queue
 
 
 class PushEventHandler(pyinotify.ProcessEvent):
-    def __init__(self, update_flag_queue):
+    def __init__(self, update_flag_queue, ignored_wd_queue=None):
         assert(isinstance(update_flag_queue, queue.Queue))
         pyinotify.ProcessEvent.__init__(self)
         self.updated_repo_queue = update_flag_queue
+        self.ignored_wd_queue = ignored_wd_queue
 
+    # the watch descriptor identifies the repository, see
+    # UpdateFlagWatchManager
     def process_IN_ATTRIB(self, event):
-        self.updated_repo_queue.put(event.pathname)
+        self.updated_repo_queue.put(event.wd)
+
+    # the watch is gone, for example because the repository was deleted, and
+    # its watch descriptor must be forgotten
+    def process_IN_IGNORED(self, event):
+        if self.ignored_wd_queue is not None:
+            self.ignored_wd_queue.put(event.wd)
 
 
 class PushMonitor:
-    def __init__(self, update_flag_queue):
+    def __init__(self, update_flag_queue, ignored_wd_queue=None):
         self.wm = pyinotify.WatchManager()
         self.mask = pyinotify.IN_ATTRIB
 
-        self.notifier =\
-            pyinotify.ThreadedNotifier(self.wm,
-                                       PushEventHandler(update_flag_queue))
+        handler = PushEventHandler(update_flag_queue, ignored_wd_queue)
+        self.notifier = pyinotify.ThreadedNotifier(self.wm, handler)
         self.notifier.start()
 
+    # update_flag files are watched individually, watching the whole
+    # repository recursively would use one watch per directory
     def add_file(self, filename):
-        self.wm.add_watch(filename, self.mask, rec=True)
+        wds = self.wm.add_watch(filename, self.mask)
+        return wds.get(filename, -1)
+
+    def remove_watch(self, wd):
+        self.wm.rm_watch(wd)
 
     def __del__(self):
         self.notifier.stop()
@@ -50,22 +64,124 @@ class AssignmentEventHandler(pyinotify.ProcessEvent):
         pyinotify.ProcessEvent.__init__(self)
         self.assignment_file_queue = assignment_file_queue
 
+    # The queue holds (path, removed) tuples in the order the events happened,
+    # so an assignment that is deleted and uploaded again is seen in that
+    # order.
+    #
+    # Only new directories are reported on creation, files are reported once
+    # they have been completely written
     def process_IN_CREATE(self, event):
-        self.assignment_file_queue.put(event.pathname)
+        if event.dir:
+            self.assignment_file_queue.put((event.pathname, False))
+
+    def process_IN_CLOSE_WRITE(self, event):
+        self.assignment_file_queue.put((event.pathname, False))
+
+    def process_IN_MOVED_TO(self, event):
+        self.assignment_file_queue.put((event.pathname, False))
+
+    # removed directories, such as assignments moved to the trash
+    def process_IN_DELETE(self, event):
+        if event.dir:
+            self.assignment_file_queue.put((event.pathname, True))
+
+    def process_IN_MOVED_FROM(self, event):
+        if event.dir:
+            self.assignment_file_queue.put((event.pathname, True))
 
 
 class AssignmentMonitor:
     def __init__(self, assignment_file_queue):
         self.wm = pyinotify.WatchManager()
-        self.mask = pyinotify.IN_CREATE
+        self.mask = (pyinotify.IN_CREATE | pyinotify.IN_CLOSE_WRITE |
+                     pyinotify.IN_MOVED_TO | pyinotify.IN_DELETE |
+                     pyinotify.IN_MOVED_FROM)
 
         self.notifier =\
             pyinotify.ThreadedNotifier(self.wm,
                                        AssignmentEventHandler(assignment_file_queue))
         self.notifier.start()
 
+    # directories are watched individually, assignment directories contain
+    # bare repositories which would each need many watches
     def add_file(self, filename):
-        self.wm.add_watch(filename, self.mask, rec=True)
+        self.wm.add_watch(filename, self.mask)
+
+    def remove_file(self, filename):
+        wd = self.wm.get_wd(filename)
+        if wd is not None:
+            self.wm.rm_watch(wd)
+
+    # the notifier thread is not a daemon thread, so it must be stopped for
+    # the process to exit. pyinotify raises if it is stopped twice.
+    def stop(self):
+        if self.notifier.is_alive():
+            self.notifier.stop()
+
+    def __del__(self):
+        self.stop()
+
+
+class RosterEventHandler(pyinotify.ProcessEvent):
+    def __init__(self, roster_file_queue):
+        assert(isinstance(roster_file_queue, queue.Queue))
+        pyinotify.ProcessEvent.__init__(self)
+        self.roster_file_queue = roster_file_queue
+
+    # editors either write the file in place or write a temporary file and
+    # move it over the original
+    def process_IN_CLOSE_WRITE(self, event):
+        self._put_if_roster(event.pathname)
+
+    def process_IN_MOVED_TO(self, event):
+        self._put_if_roster(event.pathname)
+
+    def _put_if_roster(self, pathname):
+        if pathname.endswith('.csv'):
+            self.roster_file_queue.put(pathname)
+
+
+class RosterMonitor:
+    def __init__(self, roster_file_queue):
+        self.wm = pyinotify.WatchManager()
+        self.mask = pyinotify.IN_CLOSE_WRITE | pyinotify.IN_MOVED_TO
+
+        self.notifier =\
+            pyinotify.ThreadedNotifier(self.wm,
+                                       RosterEventHandler(roster_file_queue))
+        self.notifier.start()
+
+    def add_directory(self, path):
+        self.wm.add_watch(path, self.mask)
+
+    def __del__(self):
+        self.notifier.stop()
+
+
+class RegradeRequestEventHandler(pyinotify.ProcessEvent):
+    def __init__(self, regrade_request_queue):
+        assert(isinstance(regrade_request_queue, queue.Queue))
+        pyinotify.ProcessEvent.__init__(self)
+        self.regrade_request_queue = regrade_request_queue
+
+    # requests are written to a dot file and then moved into place
+    def process_IN_MOVED_TO(self, event):
+        if not event.name.startswith('.'):
+            self.regrade_request_queue.put(event.pathname)
+
+
+class RegradeRequestMonitor:
+    def __init__(self, regrade_request_queue):
+        self.wm = pyinotify.WatchManager()
+        self.mask = pyinotify.IN_MOVED_TO
+
+        self.notifier =\
+            pyinotify.ThreadedNotifier(self.wm,
+                                       RegradeRequestEventHandler(regrade_request_queue))
+        self.notifier.start()
+
+    def add_directory(self, path):
+        self.wm.add_watch(path, self.mask)
 
     def __del__(self):
         self.notifier.stop()
@@ -13,17 +13,19 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-"""Provides two classes for reading from and writing to local log files
-over paramiko SSH connections.
+"""Provides two classes for reading from and writing to local log files.
 
-Thread-safe if the strings written to the log are <= 512 bytes.
+Lines are appended with a single write() to the file opened with O_APPEND,
+without running any other process. Lines from different threads and
+processes are not interleaved as long as each write is no more than PIPE_BUF
+bytes, which is at least 512. Use log_many() to append several lines with
+one write.
 """
 
 import os
 
 from gkeepcore.log_file import LogFileReader, LogFileWriter, \
     LogFileException
-from gkeepcore.subprocess_commands import append_to_file, CommandError
 
 
 class LocalLogFileReader(LogFileReader):
@@ -80,7 +82,28 @@ class LocalLogFileWriter(LogFileWriter):
     def _append(self, string):
         # Appends a string to the log. Should not be called directly, use the
         # inherited log() method instead.
+        self._write(string + '\n')
+
+    def _append_many(self, strings):
+        # Appends several strings to the log with one write. Should not be
+        # called directly, use the inherited log_many() method instead.
+        self._write(''.join(string + '\n' for string in strings))
+
+    def _write(self, text):
+        # Write text to the end of the log with a single call. A short write
+        # on a regular file only happens when the disk is full.
+        data = text.encode('utf-8')
+
         try:
-            append_to_file(self._file_path, string)
-        except CommandError as e:
+            fd = os.open(self._file_path,
+                         os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+            try:
+                written = os.write(fd, data)
+            finally:
+                os.close(fd)
+        except OSError as e:
             raise LogFileException from e
+
+        if written != len(data):
+            raise LogFileException('Short write to {0}'
+                                   .format(self._file_path))
@@ -0,0 +1,287 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides prepared test environments which are reused across submissions.
+
+Without preparation, every submission clones the tests repository and runs
+action.sh from scratch, repeating any expensive setup it does. Instead, an
+assignment's tests repository may contain a script named prepare.sh. The
+first time a submission is tested against a particular commit of the tests
+repository, the tests are cloned into a cache directory and prepare.sh is run
+there once. Every submission then receives a copy of the prepared directory.
+Copies are made with cp --reflink=auto, so on filesystems that support it
+they share storage with the prepared directory until they are modified.
+
+Prepared environments are stored under the cache directory by a hash of the
+tests repository path and the commit hash of its HEAD. When the tests change,
+the environment is prepared again and the old one is removed. An environment
+which is still in use by a submission is removed once it is released.
+
+Environments for different tests repositories are prepared concurrently,
+while only one thread at a time prepares the environment for a given tests
+repository.
+
+Example usage:
+
+    environments = PreparedEnvironmentCache(cache_dir, action_limits)
+
+    try:
+        tests_hash, environment_path = environments.prepare(test_repo)
+    except PreparedEnvironmentError as e:
+        # report the error
+
+    try:
+        environments.copy_environment(environment_path, test_path)
+    finally:
+        environments.release(environment_path)
+"""
+
+
+import hashlib
+import os
+import shutil
+from tempfile import mkdtemp
+from threading import Lock
+
+from action_runner import ActionLimits, ActionLimitsError, LIMITS_FILENAME,\
+    read_action_limits, run_action
+from repository import Repository
+from subprocess_commands import run_command, CommandError
+
+
+PREPARE_SCRIPT_FILENAME = 'prepare.sh'
+
+
+class PreparedEnvironmentError(Exception):
+    pass
+
+
+class PreparedEnvironmentCache:
+    """Prepares test environments once per tests commit and copies them for
+    each submission."""
+
+    def __init__(self, cache_dir: str, limits: ActionLimits):
+        """
+        :param cache_dir: directory in which prepared environments are kept.
+         It is created if it does not exist.
+        :param limits: default resource limits for running prepare.sh,
+         which the tests may override
+        """
+
+        self._cache_dir = cache_dir
+        self._limits = limits
+
+        # Submissions are tested by several threads. Each tests repository
+        # has its own lock, held while its environments are prepared or
+        # removed. self._lock guards the dictionaries below and is never
+        # held for long.
+        self._lock = Lock()
+        self._locks_by_repo_cache_dir = {}
+
+        # number of submissions using each environment, and the environments
+        # to remove once they are no longer used
+        self._user_counts = {}
+        self._stale_environments = set()
+
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    def prepare(self, test_repo: Repository) -> tuple:
+        """Prepare the environment for the current commit of the tests if it
+        has not been prepared already.
+
+        The environment is not removed until release() is called with its
+        path. It must not be modified. Use copy_environment() to get a copy
+        of it to run tests in.
+
+        Raises PreparedEnvironmentError if the tests cannot be cloned or
+        prepare.sh fails.
+
+        :param test_repo: the bare tests repository for the assignment
+        :return: a tuple containing the commit hash of the tests and the path
+         to the prepared environment
+        """
+
+        head_hash = test_repo.get_head_hash()
+
+        if head_hash == '':
+            raise PreparedEnvironmentError('Cannot find the HEAD of {0}'
+                                           .format(test_repo.path))
+
+        repo_cache_dir = self._get_repo_cache_dir(test_repo)
+        environment_path = os.path.join(repo_cache_dir, head_hash)
+
+        with self._get_repo_lock(repo_cache_dir):
+            if not self._use_existing(environment_path):
+                self._prepare(test_repo, repo_cache_dir, environment_path)
+
+                with self._lock:
+                    self._user_counts[environment_path] = 1
+
+        return head_hash, environment_path
+
+    def release(self, environment_path: str):
+        """Release an environment returned by prepare().
+
+        :param environment_path: path returned by prepare()
+        """
+
+        with self._lock:
+            self._user_counts[environment_path] -= 1
+
+            if self._user_counts[environment_path] > 0:
+                return
+
+            del self._user_counts[environment_path]
+
+            if environment_path not in self._stale_environments:
+                return
+
+            self._stale_environments.remove(environment_path)
+            removal_path = self._hide(environment_path)
+
+        shutil.rmtree(removal_path, ignore_errors=True)
+
+    def copy_environment(self, environment_path: str, dest_path: str):
+        """Copy a prepared environment into dest_path.
+
+        Raises PreparedEnvironmentError if the copy fails.
+
+        :param environment_path: path returned by prepare(), which has not
+         been released yet
+        :param dest_path: existing empty directory to copy the tests into
+        """
+
+        # copy the contents rather than the directory itself so that
+        # dest_path may already exist
+        try:
+            run_command(['cp', '-a', '--reflink=auto',
+                         os.path.join(environment_path, '.'), dest_path])
+        except CommandError as e:
+            raise PreparedEnvironmentError('Error copying {0}:\n{1}'
+                                           .format(environment_path, e))
+
+    def _get_repo_cache_dir(self, test_repo: Repository) -> str:
+        # Each tests repository gets its own directory in the cache, named by
+        # a hash of the repository's path
+
+        path_hash = hashlib.sha1(test_repo.path.encode('utf-8')).hexdigest()
+
+        return os.path.join(self._cache_dir, path_hash)
+
+    def _get_repo_lock(self, repo_cache_dir: str) -> Lock:
+        with self._lock:
+            if repo_cache_dir not in self._locks_by_repo_cache_dir:
+                self._locks_by_repo_cache_dir[repo_cache_dir] = Lock()
+
+            return self._locks_by_repo_cache_dir[repo_cache_dir]
+
+    def _use_existing(self, environment_path: str) -> bool:
+        # Count another user of the environment if it has been prepared. An
+        # environment waiting to be removed is in use again if the tests were
+        # changed back to its commit.
+
+        with self._lock:
+            if not os.path.isdir(environment_path):
+                return False
+
+            self._user_counts[environment_path] = \
+                self._user_counts.get(environment_path, 0) + 1
+            self._stale_environments.discard(environment_path)
+
+            return True
+
+    def _hide(self, environment_path: str) -> str:
+        # Rename an environment to a hidden path before it is removed, so
+        # that it is never seen partially removed. Called with self._lock
+        # held.
+
+        removal_path = mkdtemp(prefix='.removing-',
+                               dir=os.path.dirname(environment_path))
+        os.rename(environment_path, os.path.join(removal_path, 'tests'))
+
+        return removal_path
+
+    def _prepare(self, test_repo: Repository, repo_cache_dir: str,
+                 environment_path: str):
+        # Clone the tests into a staging directory and run prepare.sh there.
+        # The staging directory is only moved into place if everything
+        # succeeds, so a partially prepared environment is never used.
+
+        os.makedirs(repo_cache_dir, exist_ok=True)
+
+        staging_path = mkdtemp(prefix='.staging-', dir=repo_cache_dir)
+
+        try:
+            clone_path = os.path.join(staging_path, 'tests')
+
+            try:
+                test_repo.clone_to(clone_path)
+            except CommandError as e:
+                raise PreparedEnvironmentError('Failed to clone tests:\n{0}'
+                                               .format(e))
+
+            prepare_script_path = os.path.join(clone_path,
+                                               PREPARE_SCRIPT_FILENAME)
+
+            if os.path.isfile(prepare_script_path):
+                result = self._run_prepare_script(clone_path)
+                if not result.succeeded:
+                    raise PreparedEnvironmentError(
+                        '{0} failed:\n{1}'.format(PREPARE_SCRIPT_FILENAME,
+                                                  result.output))
+
+            self._remove_old_environments(repo_cache_dir)
+
+            os.rename(clone_path, environment_path)
+        finally:
+            shutil.rmtree(staging_path, ignore_errors=True)
+
+    def _run_prepare_script(self, clone_path: str):
+        # Run prepare.sh with the limits that apply to the tests
+
+        try:
+            limits = read_action_limits(os.path.join(clone_path,
+                                                     LIMITS_FILENAME),
+                                        self._limits)
+            return run_action(['bash', PREPARE_SCRIPT_FILENAME], clone_path,
+                              limits)
+        except (ActionLimitsError, OSError) as e:
+            raise PreparedEnvironmentError('Failed to run {0}:\n{1}'
+                                           .format(PREPARE_SCRIPT_FILENAME,
+                                                   e))
+
+    def _remove_old_environments(self, repo_cache_dir: str):
+        # Remove environments prepared for older commits of the tests. Those
+        # still in use are removed when they are released. Called with the
+        # repository's lock held.
+
+        removal_paths = []
+
+        with self._lock:
+            for name in os.listdir(repo_cache_dir):
+                # staging and removal directories are hidden
+                if name.startswith('.'):
+                    continue
+
+                environment_path = os.path.join(repo_cache_dir, name)
+
+                if self._user_counts.get(environment_path, 0) > 0:
+                    self._stale_environments.add(environment_path)
+                else:
+                    removal_paths.append(self._hide(environment_path))
+
+        for removal_path in removal_paths:
+            shutil.rmtree(removal_path, ignore_errors=True)
@@ -0,0 +1,136 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides functions for requesting that gkeepd re-grade an assignment.
+
+A re-grade request is a file in the .regrade_requests directory of the
+faculty member's home directory. The first line of the file is the class
+name and the second line is the assignment name. Requests are written to a
+file whose name starts with a dot and then renamed, so gkeepd never sees a
+partially written request. gkeepd removes each request once it has queued
+the assignment's submissions for testing.
+
+This module can be run on the server to request a re-grade:
+
+    python3 regrade_requests.py <class name> <assignment>
+"""
+
+
+import os
+import sys
+from tempfile import mkstemp
+
+from gkeepcore.path_utils import build_regrade_requests_path
+
+
+class RegradeRequestError(Exception):
+    pass
+
+
+def regrade_requests_dir(home_dir: str) -> str:
+    """
+    Get the path to the directory that re-grade requests are written to.
+
+    :param home_dir: home directory of the faculty member
+    :return: path to the requests directory
+    """
+
+    return build_regrade_requests_path(home_dir)
+
+
+def is_regrade_request_path(path: str) -> bool:
+    """
+    Determine if a path is a complete request rather than a request that is
+    still being written.
+
+    :param path: path to a file in the requests directory
+    :return: True if the path is a complete request
+    """
+
+    return not os.path.basename(path).startswith('.')
+
+
+def write_regrade_request(requests_dir: str, class_name: str,
+                          assignment: str) -> str:
+    """
+    Write a re-grade request.
+
+    :param requests_dir: the requests directory, created if it does not exist
+    :param class_name: name of the class
+    :param assignment: name of the assignment
+    :return: path to the request
+    """
+
+    os.makedirs(requests_dir, exist_ok=True)
+
+    fd, temp_path = mkstemp(prefix='.', dir=requests_dir)
+    with os.fdopen(fd, 'w') as f:
+        f.write('{0}\n{1}\n'.format(class_name, assignment))
+
+    request_path = os.path.join(requests_dir,
+                                os.path.basename(temp_path)[1:])
+    os.rename(temp_path, request_path)
+
+    return request_path
+
+
+def read_regrade_request(request_path: str) -> tuple:
+    """
+    Read a re-grade request.
+
+    Raises RegradeRequestError if the request cannot be read or is
+    malformed.
+
+    :param request_path: path to the request
+    :return: a tuple containing the class name and the assignment name
+    """
+
+    try:
+        with open(request_path) as f:
+            lines = f.read().splitlines()
+    except OSError as e:
+        raise RegradeRequestError('Error reading {0}:\n{1}'
+                                  .format(request_path, e))
+
+    if len(lines) != 2 or '' in lines:
+        raise RegradeRequestError('Malformed re-grade request {0}'
+                                  .format(request_path))
+
+    class_name, assignment = lines
+
+    return class_name, assignment
+
+
+def main():
+    if len(sys.argv) != 3:
+        sys.exit('Usage: {0} <class name> <assignment>'.format(sys.argv[0]))
+
+    class_name, assignment = sys.argv[1:]
+
+    requests_dir = regrade_requests_dir(os.path.expanduser('~'))
+
+    try:
+        request_path = write_regrade_request(requests_dir, class_name,
+                                             assignment)
+    except OSError as e:
+        sys.exit('Error writing re-grade request:\n{0}'.format(e))
+
+    print('Requested re-grade of {0} {1}: {2}'.format(class_name, assignment,
+                                                      request_path))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Repacks the git repositories of every assignment to save disk space.
+
+Each assignment's base code is stored once in <assignment>_base.git in the
+assignment directory, and every student repository for the assignment uses
+those objects through git alternates instead of storing its own copy (see
+upload_assignment in gkeepclient). Over time the objects that students push
+pile up as loose objects, so this repacks each base repository and each
+student repository. Student repositories are repacked with -l so that the
+objects they borrow from the base repository are never copied into their own
+packs.
+
+Base repositories must never be pruned or garbage collected with --prune,
+since the student repositories depend on their objects.
+
+Run this on the server periodically, for example from cron:
+
+    python3 repack_repositories.py [<class name> ...]
+
+Without class names every class is repacked.
+"""
+
+
+import os
+import sys
+
+from configuration import GraderConfiguration, ConfigurationError
+from repository import Repository
+from subprocess_commands import CommandError
+
+
+def directory_size(path: str) -> int:
+    """
+    Add up the sizes of the files in a directory tree.
+
+    :param path: path to the directory
+    :return: total size in bytes
+    """
+
+    size = 0
+
+    for dir_path, dir_names, file_names in os.walk(path):
+        for file_name in file_names:
+            try:
+                size += os.lstat(os.path.join(dir_path, file_name)).st_size
+            except OSError:
+                # removed while walking, or not readable
+                pass
+
+    return size
+
+
+def repack_assignment(class_name, assignment, assignments_path,
+                      students) -> tuple:
+    """
+    Repack the base repository of an assignment and the repository of each
+    student who has one.
+
+    :param class_name: name of the class
+    :param assignment: name of the assignment
+    :param assignments_path: path to the class's assignments directory
+    :param students: Student objects of the students in the class
+    :return: tuple containing the number of repositories repacked and the
+     total size of their objects before and after, in bytes
+    """
+
+    repos = []
+
+    base_repo_path = os.path.join(assignments_path, assignment,
+                                  '{0}_base.git'.format(assignment))
+
+    # assignments uploaded before base repositories were added do not have
+    # one, but their student repositories can still be repacked
+    if os.path.isdir(base_repo_path):
+        repos.append((Repository(base_repo_path, assignment, is_bare=True),
+                      False))
+
+    for student in students:
+        repo_path = student.get_bare_repo_dir(class_name, assignment)
+        if os.path.isdir(repo_path):
+            repos.append((Repository(repo_path, assignment, is_bare=True,
+                                     student_username=student.username),
+                          True))
+
+    repacked_count = 0
+    size_before = 0
+    size_after = 0
+
+    for repo, local_only in repos:
+        before = directory_size(repo.objects_path)
+
+        try:
+            repo.repack(local_only)
+        except CommandError as e:
+            # objects pushed by students belong to the students, so some
+            # repositories may not be writable
+            print('Error repacking {0}:\n{1}'.format(repo.path, e),
+                  file=sys.stderr)
+            continue
+
+        repacked_count += 1
+        size_before += before
+        size_after += directory_size(repo.objects_path)
+
+    return repacked_count, size_before, size_after
+
+
+def main():
+    try:
+        config = GraderConfiguration(on_grading_server=True)
+    except ConfigurationError as e:
+        sys.exit(e)
+
+    if len(sys.argv) > 1:
+        class_names = sys.argv[1:]
+    else:
+        class_names = sorted(config.students_by_class.keys())
+
+    for class_name in class_names:
+        if class_name not in config.students_by_class:
+            sys.exit('No student CSV file for {0}'.format(class_name))
+
+    for class_name in class_names:
+        assignments_path = os.path.join(config.home_dir, class_name,
+                                        'assignments')
+
+        if not os.path.isdir(assignments_path):
+            print('{0} does not exist, skipping {1}'
+                  .format(assignments_path, class_name), file=sys.stderr)
+            continue
+
+        for assignment in sorted(os.listdir(assignments_path)):
+            count, before, after = \
+                repack_assignment(class_name, assignment, assignments_path,
+                                  config.students_by_class[class_name])
+
+            print('{0} {1}: repacked {2} repositories, {3} KiB -> {4} KiB'
+                  .format(class_name, assignment, count, before // 1024,
+                          after // 1024))
+
+
+if __name__ == '__main__':
+    main()
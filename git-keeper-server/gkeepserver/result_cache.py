@@ -0,0 +1,184 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides a cache of test results for submissions that were already tested.
+
+A student may push the same commit more than once, for instance by pushing a
+commit to another branch and then merging it without changes. The results of
+testing a commit against a particular commit of the tests do not change, so
+successful results are stored and reused instead of running action.sh again.
+
+Results are stored by the commit hash of the tests, the student's username
+and the commit hash of the submission. The username is part of the key
+because action.sh is given the student's name and email address. When a
+result is stored for a new commit of the tests, the results for older commits
+of the same tests are removed.
+
+Assignments whose tests do not always produce the same output for the same
+submission can opt out by including a file named no_result_cache in the
+tests repository.
+
+Example usage:
+
+    results = ResultCache(cache_dir)
+
+    cached = results.get(tests_path, tests_hash, username, submission_hash)
+
+    if cached is None:
+        # run the tests and then
+        results.put(tests_path, tests_hash, username, submission_hash,
+                    result, report_path)
+    else:
+        result, report = cached
+"""
+
+
+import hashlib
+import json
+import os
+import shutil
+from tempfile import mkdtemp
+from threading import Lock
+
+from action_runner import ActionResult
+
+
+NO_RESULT_CACHE_FILENAME = 'no_result_cache'
+
+_RESULT_FILENAME = 'result.json'
+_REPORT_FILENAME = 'report.txt'
+
+
+class ResultCache:
+    """Stores the results and reports of successful test runs."""
+
+    def __init__(self, cache_dir: str):
+        """
+        :param cache_dir: directory in which results are kept. It is created
+         if it does not exist.
+        """
+
+        self._cache_dir = cache_dir
+
+        # results are stored by several grading threads
+        self._lock = Lock()
+
+        os.makedirs(self._cache_dir, exist_ok=True)
+
+    def get(self, tests_path: str, tests_hash: str, username: str,
+            submission_hash: str):
+        """Get a stored result.
+
+        :param tests_path: path to the tests repository
+        :param tests_hash: commit hash of the tests
+        :param username: username of the student
+        :param submission_hash: commit hash of the submission
+        :return: a tuple containing the ActionResult and the full text of the
+         report, or None if no result is stored
+        """
+
+        result_path = self._get_result_path(tests_path, tests_hash, username,
+                                            submission_hash)
+
+        try:
+            with open(os.path.join(result_path, _RESULT_FILENAME)) as f:
+                result = ActionResult(**json.load(f))
+            with open(os.path.join(result_path, _REPORT_FILENAME)) as f:
+                report = f.read()
+        except (OSError, ValueError, TypeError):
+            return None
+
+        return result, report
+
+    def put(self, tests_path: str, tests_hash: str, username: str,
+            submission_hash: str, result: ActionResult, report_path: str):
+        """Store a result.
+
+        Only results of successful runs are stored. Errors are printed and
+        otherwise ignored, since a result that is not stored only costs
+        running the tests again.
+
+        :param tests_path: path to the tests repository
+        :param tests_hash: commit hash of the tests
+        :param username: username of the student
+        :param submission_hash: commit hash of the submission
+        :param result: the result of running action.sh
+        :param report_path: path to the report containing the full output
+        """
+
+        if not result.succeeded:
+            return
+
+        tests_cache_dir = self._get_tests_cache_dir(tests_path)
+        result_path = self._get_result_path(tests_path, tests_hash, username,
+                                            submission_hash)
+
+        with self._lock:
+            self._put(tests_cache_dir, tests_hash, result_path, result,
+                      report_path)
+
+    def _put(self, tests_cache_dir, tests_hash, result_path, result,
+             report_path):
+        # Store a result while holding the lock
+
+        if os.path.isdir(result_path):
+            return
+
+        try:
+            self._remove_old_results(tests_cache_dir, tests_hash)
+
+            os.makedirs(os.path.dirname(result_path), exist_ok=True)
+
+            # write everything to a staging directory first so that a
+            # partially stored result is never read
+            staging_path = mkdtemp(prefix='.staging-',
+                                   dir=os.path.dirname(result_path))
+
+            try:
+                with open(os.path.join(staging_path, _RESULT_FILENAME),
+                          'w') as f:
+                    json.dump(vars(result), f)
+                shutil.copyfile(report_path,
+                                os.path.join(staging_path, _REPORT_FILENAME))
+                os.rename(staging_path, result_path)
+            finally:
+                shutil.rmtree(staging_path, ignore_errors=True)
+        except OSError as e:
+            print('Error storing result in {0}:\n{1}'.format(result_path, e))
+
+    def _get_tests_cache_dir(self, tests_path: str) -> str:
+        # Each tests repository gets its own directory in the cache, named by
+        # a hash of the repository's path
+
+        path_hash = hashlib.sha1(tests_path.encode('utf-8')).hexdigest()
+
+        return os.path.join(self._cache_dir, path_hash)
+
+    def _get_result_path(self, tests_path, tests_hash, username,
+                         submission_hash) -> str:
+        return os.path.join(self._get_tests_cache_dir(tests_path), tests_hash,
+                            username, submission_hash)
+
+    def _remove_old_results(self, tests_cache_dir: str, tests_hash: str):
+        # Remove results stored for other commits of the tests
+
+        if not os.path.isdir(tests_cache_dir):
+            return
+
+        for name in os.listdir(tests_cache_dir):
+            if name != tests_hash:
+                shutil.rmtree(os.path.join(tests_cache_dir, name),
+                              ignore_errors=True)
@@ -0,0 +1,176 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Provides a class for incrementally registering inotify watches on the
+update_flag files of student submission repositories.
+
+Only the update_flag file of each repository is watched, never the repository
+itself, so each repository costs exactly one inotify watch. Watches are added
+one assignment or one student at a time, and events are mapped back to their
+class and repository through the watch descriptor. A single manager serves
+every class.
+"""
+
+
+import os
+
+
+class UpdateFlagWatchManager:
+    """Keeps track of the update_flag watches registered with a PushMonitor.
+
+    Stores 3 indexes:
+
+        (class name, repository) by watch descriptor - used to find the
+         repository that an inotify event belongs to
+        watch descriptor by update_flag path - used to avoid adding the same
+         watch twice
+        update_flag paths by (class name, student username) - used to remove
+         all of a student's watches for a class at once
+    """
+
+    def __init__(self, push_monitor):
+        """
+        :param push_monitor: the PushMonitor to register watches with
+        """
+
+        self._push_monitor = push_monitor
+
+        self._repos_by_wd = {}
+        self._wds_by_path = {}
+        self._paths_by_member = {}
+
+    def add_repository(self, class_name: str, repo) -> bool:
+        """Watch the update_flag file of a repository.
+
+        Nothing is done if the file is already watched or does not exist.
+
+        :param class_name: name of the class the repository belongs to
+        :param repo: the student's bare submission Repository
+        :return: True if a new watch was added, False otherwise
+        """
+
+        update_flag_path = repo.get_update_flag_path()
+
+        if update_flag_path in self._wds_by_path:
+            return False
+
+        if not os.path.isfile(update_flag_path):
+            return False
+
+        wd = self._push_monitor.add_file(update_flag_path)
+
+        if wd < 0:
+            return False
+
+        self._repos_by_wd[wd] = (class_name, repo)
+        self._wds_by_path[update_flag_path] = wd
+
+        member = (class_name, repo.student_username)
+
+        if member not in self._paths_by_member:
+            self._paths_by_member[member] = set()
+
+        self._paths_by_member[member].add(update_flag_path)
+
+        return True
+
+    def remove_student(self, class_name: str, username: str):
+        """Remove the watches on all of a student's repositories in a class.
+
+        :param class_name: name of the class
+        :param username: the student's username
+        """
+
+        member = (class_name, username)
+
+        for update_flag_path in self._paths_by_member.pop(member, ()):
+            wd = self._wds_by_path.pop(update_flag_path)
+            del self._repos_by_wd[wd]
+            self._push_monitor.remove_watch(wd)
+
+    def remove_assignment(self, class_name: str, assignment: str):
+        """Remove the watches on every student's repository for an
+        assignment, so that they can be added again if an assignment with the
+        same name is uploaded.
+
+        :param class_name: name of the class
+        :param assignment: name of the assignment
+        """
+
+        wds = [wd for wd, (repo_class_name, repo) in self._repos_by_wd.items()
+               if repo_class_name == class_name and
+               repo.assignment == assignment]
+
+        for wd in wds:
+            self._forget(wd)
+            self._push_monitor.remove_watch(wd)
+
+    def forget_watch(self, wd: int):
+        """Forget a watch which inotify has already removed, for example
+        because the update_flag file was deleted.
+
+        Nothing is done if the watch is not managed here.
+
+        :param wd: watch descriptor from an IN_IGNORED event
+        """
+
+        if wd in self._repos_by_wd:
+            self._forget(wd)
+
+    def _forget(self, wd: int):
+        # Remove a watch from every index
+
+        class_name, repo = self._repos_by_wd.pop(wd)
+
+        update_flag_path = repo.get_update_flag_path()
+        del self._wds_by_path[update_flag_path]
+
+        member = (class_name, repo.student_username)
+        paths = self._paths_by_member.get(member, set())
+        paths.discard(update_flag_path)
+
+        if len(paths) == 0:
+            self._paths_by_member.pop(member, None)
+
+    def get_repository(self, wd: int) -> tuple:
+        """Look up the repository that a watch descriptor belongs to.
+
+        :param wd: watch descriptor from an inotify event
+        :return: a tuple containing the class name and the Repository, or
+                 None if the watch is not managed here
+        """
+
+        return self._repos_by_wd.get(wd)
+
+    def is_watched(self, update_flag_path: str) -> bool:
+        """Determine if an update_flag file is being watched.
+
+        :param update_flag_path: path to the update_flag file
+        :return: True if the file is watched, False otherwise
+        """
+
+        return update_flag_path in self._wds_by_path
+
+    def repositories(self) -> list:
+        """Get every watched repository.
+
+        :return: list of (class name, Repository) tuples
+        """
+
+        return list(self._repos_by_wd.values())
+
+    def __len__(self):
+        return len(self._repos_by_wd)
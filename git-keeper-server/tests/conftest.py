@@ -0,0 +1,85 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Makes gkeepcore and gkeepserver importable when running the tests from a
+source checkout:
+
+    pytest tests
+
+The directories are appended to sys.path so that gkeepserver/email.py does
+not shadow the standard library's email package.
+
+The gkeepd fixture provides the gkeepd module. gkeepd imports email_sender
+and locator, which are only installed on a grading server, so stand-ins are
+used for them when they cannot be imported.
+"""
+
+
+import importlib.util
+import os
+import sys
+from types import ModuleType
+
+import pytest
+
+
+_root = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..')
+
+for _path in (os.path.join(_root, 'git-keeper-core'),
+              os.path.join(_root, 'git-keeper-core', 'gkeepcore'),
+              os.path.join(_root, 'git-keeper-server'),
+              os.path.join(_root, 'git-keeper-server', 'gkeepserver')):
+    if _path not in sys.path:
+        sys.path.append(_path)
+
+
+class _Email:
+    # stands in for email_sender.Email
+    def __init__(self, to_address, subject, body, files_to_attach=None,
+                 trace_id=None):
+        self.to_address = to_address
+        self.subject = subject
+        self.body = body
+        self.trace_id = trace_id
+
+
+def _process_email_queue(email_queue, *args):
+    # stands in for email_sender.process_email_queue, discarding emails
+    # until None is queued
+    while email_queue.get() is not None:
+        pass
+
+
+def _add_module_if_missing(name, **attributes):
+    if name in sys.modules or importlib.util.find_spec(name) is not None:
+        return
+
+    module = ModuleType(name)
+    module.__dict__.update(attributes)
+    sys.modules[name] = module
+
+
+@pytest.fixture(scope='session')
+def gkeepd():
+    _add_module_if_missing('email_sender', Email=_Email,
+                           process_email_queue=_process_email_queue)
+    _add_module_if_missing('locator',
+                           module_path=lambda: os.path.join(
+                               _root, 'git-keeper-server', 'gkeepserver'))
+
+    import gkeepd
+
+    return gkeepd
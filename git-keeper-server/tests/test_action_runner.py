@@ -0,0 +1,92 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepserver.action_runner."""
+
+
+import os
+from time import time
+
+import pytest
+
+from gkeepserver import action_runner
+from gkeepserver.action_runner import ActionLimits, ActionLimitsError,\
+    read_action_limits, run_action
+
+
+def test_limits_applied(tmpdir):
+    limits = ActionLimits(timeout=10, cpu_seconds=5,
+                          memory_bytes=512 * 1024 ** 2)
+
+    result = run_action(['bash', '-c', 'ulimit -t; ulimit -v'], str(tmpdir),
+                        limits)
+
+    assert result.succeeded
+    assert ['5', str(512 * 1024)] == result.output.split()
+
+
+def test_limit_failure_is_reported(tmpdir):
+    if os.geteuid() == 0:
+        pytest.skip('root may raise its hard limits')
+
+    # an unprivileged process cannot raise its hard limit
+    limits = ActionLimits(cpu_seconds=None, memory_bytes=None,
+                          max_processes=2 ** 62)
+
+    result = run_action(['true'], str(tmpdir), limits)
+
+    assert not result.succeeded
+    assert 'prlimit' in result.output
+
+
+def test_read_action_limits(tmpdir):
+    defaults = ActionLimits()
+    path = str(tmpdir.join('limits.cfg'))
+
+    assert defaults is read_action_limits(path, defaults)
+
+    with open(path, 'w') as f:
+        f.write('[limits]\n'
+                'timeout = 1200\n'
+                'memory_bytes = none\n')
+
+    limits = read_action_limits(path, defaults)
+
+    assert 1200 == limits.timeout
+    assert limits.memory_bytes is None
+    assert defaults.cpu_seconds == limits.cpu_seconds
+    assert 600 == defaults.timeout
+
+    with open(path, 'w') as f:
+        f.write('[limits]\nmemory = 1\n')
+
+    with pytest.raises(ActionLimitsError):
+        read_action_limits(path, defaults)
+
+
+def test_escaped_process_does_not_block(tmpdir, monkeypatch):
+    monkeypatch.setattr(action_runner, 'OUTPUT_DRAIN_TIMEOUT', 1)
+
+    # setsid puts sleep in its own session, out of reach of the group kill,
+    # and it keeps the output pipe open
+    command = ['bash', '-c', 'echo started; setsid sleep 5 & exit 0']
+
+    start = time()
+    result = run_action(command, str(tmpdir), ActionLimits(timeout=10))
+
+    assert time() - start < 4
+    assert result.succeeded
+    assert 'started\n' == result.output
@@ -0,0 +1,134 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for how gkeepd is put together."""
+
+
+import os
+from queue import Queue
+from types import SimpleNamespace
+
+from gkeepcore.path_utils import build_user_log_path
+from gkeepcore.request_log import format_request_payload, new_request_id
+from gkeepcore.tracing import read_trace_log
+from gkeepserver.action_runner import ActionResult
+from gkeepserver.local_log_file import LocalLogFileReader
+
+
+def test_log_poller_metrics_are_written(gkeepd, tmpdir):
+    # the registry that gkeepd writes to metrics.prom must be the one the
+    # log pipeline records its metrics in
+    log_path = tmpdir.join('git-keeper-faculty.log')
+    log_path.write('')
+
+    add_log_queue = Queue()
+    poller = gkeepd.LogPollingThread(add_log_queue, Queue(),
+                                     polling_interval=0)
+    add_log_queue.put(LocalLogFileReader(str(log_path)))
+    poller._poll()
+
+    stats_path = str(tmpdir.join('metrics.prom'))
+    gkeepd.registry.write(stats_path)
+
+    with open(stats_path) as f:
+        stats = f.read()
+
+    assert 'gkeep_watched_log_files 1' in stats.splitlines()
+    assert 'gkeep_log_poll_seconds_count' in stats
+
+
+def test_request_spans_are_traced(gkeepd, tmpdir):
+    # the tracer that gkeepd opens must be the one the event handlers record
+    # their spans with
+    home_dir = str(tmpdir.mkdir('faculty'))
+    trace_log_path = str(tmpdir.join('trace.log'))
+
+    handler = gkeepd.RequestHandler(
+        build_user_log_path(home_dir, 'faculty'), 0,
+        format_request_payload(new_request_id(), 'PING', {}))
+
+    gkeepd.tracer.open(trace_log_path)
+    try:
+        handler.handle()
+    finally:
+        gkeepd.tracer.close()
+
+    spans = read_trace_log(trace_log_path)[handler.trace_id]
+
+    assert ['handle_request'] == [span.name for span in spans]
+
+
+def test_emails_carry_the_trace_id(gkeepd):
+    result = ActionResult('passed', 6, 0, False, False)
+
+    results_email = gkeepd.create_results_email('s@example.edu', 'hw1',
+                                                result, 'trace1')
+    failure_email = gkeepd.create_failure_email('s@example.edu', 'hw1',
+                                                'trace2')
+
+    assert 'trace1' == results_email.trace_id
+    assert 'trace2' == failure_email.trace_id
+
+
+class FakePushMonitor:
+    def __init__(self):
+        self.next_wd = 1
+
+    def add_file(self, path):
+        self.next_wd += 1
+        return self.next_wd - 1
+
+
+def test_missed_pushes_are_graded(gkeepd, tmpdir):
+    # only repositories pushed to after their last journaled submission are
+    # graded at startup
+    watch_manager = gkeepd.UpdateFlagWatchManager(FakePushMonitor())
+    journal = gkeepd.EventJournal(str(tmpdir.join('events.journal')))
+
+    repos = {}
+    for username in ('pushed', 'unchanged', 'never_journaled'):
+        repo_path = str(tmpdir.mkdir(username).mkdir('hw1.git'))
+        open(os.path.join(repo_path, 'update_flag'), 'w').close()
+        os.utime(os.path.join(repo_path, 'update_flag'), (2000, 2000))
+
+        repos[username] = gkeepd.Repository(repo_path, 'hw1', is_bare=True,
+                                            student_username=username)
+        watch_manager.add_repository('cs100', repos[username])
+
+    journal.append(1000, 'pushed', 'SUBMISSION', repos['pushed'].path)
+    journal.append(2000, 'unchanged', 'SUBMISSION', repos['unchanged'].path)
+
+    roster = SimpleNamespace(
+        get_class_student=lambda class_name, username:
+        SimpleNamespace(username=username))
+    grading_pool = SimpleNamespace(jobs=[])
+    grading_pool.submit = grading_pool.jobs.append
+
+    gkeepd.handle_missed_pushes(watch_manager,
+                                SimpleNamespace(roster=roster),
+                                grading_pool, journal)
+
+    assert ['pushed'] == [job.student.username for job in grading_pool.jobs]
+
+    # the push is journaled, so it is not graded again at the next startup
+    grading_pool.jobs.clear()
+    gkeepd.handle_missed_pushes(watch_manager,
+                                SimpleNamespace(roster=roster),
+                                grading_pool, journal)
+
+    assert [] == grading_pool.jobs
+
+    journal.close()
@@ -0,0 +1,100 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepserver.prepared_environments."""
+
+
+import os
+
+from gkeepserver.action_runner import ActionLimits
+from gkeepserver.prepared_environments import PreparedEnvironmentCache
+from repository import Repository
+from subprocess_commands import run_command
+
+
+def commit_tests(work_path, bare_path, contents):
+    with open(os.path.join(work_path, 'action.sh'), 'w') as f:
+        f.write(contents)
+
+    run_command(['git', '-C', work_path, 'add', '-A'])
+    run_command(['git', '-C', work_path, '-c', 'user.name=test',
+                 '-c', 'user.email=test@example.com', 'commit', '-q', '-m',
+                 contents])
+    run_command(['git', '-C', work_path, 'push', '-q', bare_path, 'master'])
+
+
+def create_tests_repo(root):
+    work_path = os.path.join(root, 'work')
+    bare_path = os.path.join(root, 'hw1_tests.git')
+
+    run_command(['git', 'init', '-q', work_path])
+    run_command(['git', '-C', work_path, 'checkout', '-q', '-b', 'master'])
+    run_command(['git', 'init', '-q', '--bare', bare_path])
+
+    return work_path, Repository(bare_path, 'hw1', is_bare=True)
+
+
+def test_old_environment_removed_after_release(tmpdir):
+    work_path, test_repo = create_tests_repo(str(tmpdir))
+    environments = PreparedEnvironmentCache(str(tmpdir.join('cache')),
+                                            ActionLimits())
+
+    commit_tests(work_path, test_repo.path, 'echo 1')
+    old_hash, old_path = environments.prepare(test_repo)
+
+    # the tests change while a submission still uses the old environment
+    commit_tests(work_path, test_repo.path, 'echo 2')
+    new_hash, new_path = environments.prepare(test_repo)
+
+    assert old_hash != new_hash
+    assert os.path.isdir(old_path)
+
+    dest_path = str(tmpdir.mkdir('dest'))
+    environments.copy_environment(old_path, dest_path)
+
+    with open(os.path.join(dest_path, 'action.sh')) as f:
+        assert 'echo 1' == f.read()
+
+    environments.release(old_path)
+    assert not os.path.exists(old_path)
+
+    # the current environment is kept after it is released
+    environments.release(new_path)
+    assert os.path.isdir(new_path)
+
+    # only the current environment is left in the cache
+    assert [new_hash] == os.listdir(os.path.dirname(new_path))
+
+
+def test_reused_environment_is_not_prepared_again(tmpdir):
+    work_path, test_repo = create_tests_repo(str(tmpdir))
+    environments = PreparedEnvironmentCache(str(tmpdir.join('cache')),
+                                            ActionLimits())
+
+    commit_tests(work_path, test_repo.path, 'echo 1')
+
+    first_hash, first_path = environments.prepare(test_repo)
+    marker_path = os.path.join(first_path, 'marker')
+    open(marker_path, 'w').close()
+
+    second_hash, second_path = environments.prepare(test_repo)
+
+    assert (first_hash, first_path) == (second_hash, second_path)
+    assert os.path.isfile(marker_path)
+
+    environments.release(first_path)
+    environments.release(second_path)
+    assert os.path.isdir(first_path)
@@ -0,0 +1,89 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepserver.event_handlers.request_handler."""
+
+
+import os
+
+from gkeepcore.path_utils import build_user_log_path, \
+    build_user_response_log_path
+from gkeepcore.request_log import format_request_payload, \
+    parse_response_line, new_request_id, OK, ERROR
+from gkeepserver.event_handlers.request_handler import RequestHandler
+from gkeepserver.regrade_requests import regrade_requests_dir, \
+    read_regrade_request
+
+
+def handle_request(home_dir, request_type, arguments) -> tuple:
+    # Handle a request logged by the user whose home directory is home_dir
+    # and return the parsed response
+
+    username = os.path.basename(home_dir)
+    request_id = new_request_id()
+    payload = format_request_payload(request_id, request_type, arguments)
+
+    RequestHandler(build_user_log_path(home_dir, username), 0,
+                   payload).handle()
+
+    response_log_path = build_user_response_log_path(home_dir, username)
+
+    with open(response_log_path) as f:
+        lines = f.read().splitlines()
+
+    response_id, status, message = parse_response_line(lines[-1])
+
+    assert request_id == response_id
+
+    return status, message
+
+
+def test_regrade_request(tmpdir):
+    home_dir = str(tmpdir.mkdir('faculty'))
+    os.makedirs(os.path.join(home_dir, 'cs100', 'assignments', 'hw1'))
+    requests_dir = regrade_requests_dir(home_dir)
+    os.makedirs(requests_dir)
+
+    status, message = handle_request(home_dir, 'REGRADE',
+                                     {'class_name': 'cs100',
+                                      'assignment': 'hw1'})
+
+    assert OK == status
+    assert 'hw1' in message
+
+    request_names = os.listdir(requests_dir)
+    assert 1 == len(request_names)
+
+    request_path = os.path.join(requests_dir, request_names[0])
+    assert ('cs100', 'hw1') == read_regrade_request(request_path)
+
+
+def test_invalid_requests(tmpdir):
+    home_dir = str(tmpdir.mkdir('faculty'))
+
+    status, message = handle_request(home_dir, 'REGRADE',
+                                     {'class_name': 'cs100'})
+    assert ERROR == status
+    assert 'assignment' in message
+
+    status, message = handle_request(home_dir, 'REGRADE',
+                                     {'class_name': 'cs100',
+                                      'assignment': 'hw1'})
+    assert ERROR == status
+    assert 'hw1' in message
+
+    status, message = handle_request(home_dir, 'UNKNOWN', {})
+    assert ERROR == status
@@ -0,0 +1,124 @@
+# Copyright 2016 Nathan Sommer and Ben Coleman
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+
+"""Tests for gkeepserver.update_flag_watches and the assignment events from
+gkeepserver.inotify_monitors."""
+
+
+import os
+from queue import Queue
+
+from gkeepserver.inotify_monitors import AssignmentMonitor
+from gkeepserver.update_flag_watches import UpdateFlagWatchManager
+from repository import Repository
+
+
+class FakePushMonitor:
+    def __init__(self):
+        self.next_wd = 1
+        self.watched = {}
+
+    def add_file(self, path):
+        wd = self.next_wd
+        self.next_wd += 1
+        self.watched[wd] = path
+        return wd
+
+    def remove_watch(self, wd):
+        del self.watched[wd]
+
+
+def create_repo(root, username, assignment):
+    path = os.path.join(root, username, 'cs100', assignment + '.git')
+    os.makedirs(path)
+    open(os.path.join(path, 'update_flag'), 'w').close()
+
+    return Repository(path, assignment, is_bare=True,
+                      student_username=username)
+
+
+def test_remove_assignment_and_add_again(tmpdir):
+    root = str(tmpdir)
+    push_monitor = FakePushMonitor()
+    manager = UpdateFlagWatchManager(push_monitor)
+
+    hw1_repos = [create_repo(root, username, 'hw1')
+                 for username in ('alice', 'bob')]
+    hw2_repo = create_repo(root, 'alice', 'hw2')
+
+    for repo in hw1_repos + [hw2_repo]:
+        assert manager.add_repository('cs100', repo)
+
+    assert 3 == len(manager)
+
+    manager.remove_assignment('cs100', 'hw1')
+
+    # only hw2 is still watched
+    assert 1 == len(manager)
+    assert [hw2_repo.get_update_flag_path()] == \
+        list(push_monitor.watched.values())
+    for repo in hw1_repos:
+        assert not manager.is_watched(repo.get_update_flag_path())
+
+    # the same paths are watched again after a new upload
+    for repo in hw1_repos:
+        assert manager.add_repository('cs100', repo)
+
+    assert 3 == len(manager)
+
+    # removing a student still removes all of their watches
+    manager.remove_student('cs100', 'alice')
+    assert 1 == len(manager)
+
+
+def test_forget_watch(tmpdir):
+    manager = UpdateFlagWatchManager(FakePushMonitor())
+    repo = create_repo(str(tmpdir), 'alice', 'hw1')
+
+    manager.add_repository('cs100', repo)
+    wd = manager._wds_by_path[repo.get_update_flag_path()]
+
+    manager.forget_watch(wd)
+    assert manager.get_repository(wd) is None
+    assert not manager.is_watched(repo.get_update_flag_path())
+
+    # unknown watch descriptors are ignored
+    manager.forget_watch(wd)
+
+    assert manager.add_repository('cs100', repo)
+
+
+def test_assignment_deleted_and_uploaded_again(tmpdir):
+    assignments_path = str(tmpdir.mkdir('assignments'))
+    trash_path = str(tmpdir.mkdir('trash'))
+
+    assignment_file_queue = Queue()
+    monitor = AssignmentMonitor(assignment_file_queue)
+    monitor.add_file(assignments_path)
+
+    try:
+        assignment_path = os.path.join(assignments_path, 'hw1')
+
+        os.mkdir(assignment_path)
+        os.rename(assignment_path, os.path.join(trash_path, 'hw1'))
+        os.mkdir(assignment_path)
+
+        events = [assignment_file_queue.get(timeout=5) for _ in range(3)]
+    finally:
+        monitor.stop()
+
+    assert [(assignment_path, False), (assignment_path, True),
+            (assignment_path, False)] == events